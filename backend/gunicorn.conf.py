@@ -0,0 +1,54 @@
+"""
+Gunicorn configuration for pre-fork serving
+
+    gunicorn -c gunicorn.conf.py main:app
+
+The app (and every model in TabularPredictor/ImagePredictor) is imported once
+in the master process and then forked into WEB_CONCURRENCY uvicorn workers.
+The NumPy arrays holding the model weights are shared copy-on-write with the
+workers instead of being loaded again by each of them.
+"""
+
+import gc
+import os
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', '1'))
+worker_class = 'uvicorn.workers.UvicornWorker'
+timeout = int(os.environ.get('WORKER_TIMEOUT', '120'))
+
+# Load the app in the master so the models are shared with the workers
+preload_app = True
+
+# Workers do not share memory for Python objects, so history has to go
+# through SQLite as soon as there is more than one of them
+if workers > 1:
+    os.environ.setdefault('HISTORY_BACKEND', 'sqlite')
+
+# TensorFlow/PyTorch are not fork-safe; load the GRU extractor per worker
+os.environ.setdefault('DEFER_FRAMEWORK_MODELS', '1')
+
+# Size the BLAS/OpenMP/framework thread pools for `workers` processes
+# before the app (and NumPy) is imported
+os.environ.setdefault('WEB_CONCURRENCY', str(workers))
+from utils.thread_limits import configure_thread_environment
+configure_thread_environment()
+
+# Collections in the master would touch every object header and turn the
+# shared pages into private copies. Keep the collector off while the models
+# load and freeze everything that exists at fork time.
+gc.disable()
+
+
+def pre_fork(server, worker):
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
+    from main import tabular_predictor
+    tabular_predictor.load_deferred_models()
@@ -3,22 +3,53 @@ Breast Cancer Diagnosis API
 FastAPI backend for tabular and image-based predictions
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
+# Thread limits have to be in the environment before NumPy loads its BLAS
+from utils.thread_limits import configure_thread_environment, thread_settings
+configure_thread_environment()
+
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
-from pydantic import BaseModel
+from fastapi.responses import FileResponse, JSONResponse, Response, ORJSONResponse, StreamingResponse
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, Field, ValidationError
 from typing import List, Dict, Optional
 import numpy as np
+import orjson
 import uuid
 from datetime import datetime
 import os
 import io
+import time
 import base64
+import asyncio
+import weakref
 
 # Import custom modules
-from utils.predictions import TabularPredictor, ImagePredictor
+from utils.predictions import TabularPredictor, ImagePredictor, FEATURE_NAMES, round_confidence
+from utils.binary_format import (
+    BINARY_CONTENT_TYPE, BinaryFormatError, decode_matrix, encode_matrix,
+    encode_batch_result, batch_result_columns
+)
 from utils.report_generator import generate_pdf_report
-from utils.metrics import get_model_metrics
+from utils.metrics import get_model_metrics, merge_live_metrics
+from utils.live_metrics import LiveMetricsStore, LIVE_METRICS_WINDOW_DAYS, LIVE_METRICS_MIN_CASES
+from utils.history import create_history_store
+from utils.history_stats import HistoryStats, STATS_BUCKET_SECONDS, STATS_MAX_BUCKETS
+from utils.monitoring import FeatureMonitor, VALIDATION_MODE
+from utils.dicom import DicomError
+from utils.similar_cases import create_similar_case_index, MAX_NEIGHBOURS
+from utils.jobs import JobQueue, WorkerPool, QueueFullError, JOB_POLL_INTERVAL
+from utils.load_control import LATENCY_SLO_MS
+from utils.admission import (
+    ADMITTED_PATH_PREFIXES, AdmissionRejected, create_admission_controller,
+    identify_client, request_lane
+)
+from utils.responses import json_response, wants_compact, compact_view
+from utils.single_flight import SingleFlight, content_key
+from utils.profiling import (
+    PROFILED_PATH_PREFIXES, is_profiling_requested, try_start_profile,
+    finish_profile, load_profile, list_profiles, PROFILING_ENABLED
+)
 
 app = FastAPI(
     title="Breast Cancer Diagnosis API",
@@ -26,7 +57,106 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# CORS middleware
+@app.middleware("http")
+async def profiling_middleware(request: Request, call_next):
+    """Profile a single prediction/report request when it opts in"""
+    if not request.url.path.startswith(PROFILED_PATH_PREFIXES) or \
+            not is_profiling_requested(request.headers, request.query_params):
+        return await call_next(request)
+
+    profiler = try_start_profile(request.url.path)
+    if profiler is None:
+        response = await call_next(request)
+        response.headers["X-Profile-Status"] = "busy"
+        return response
+
+    # Profiled requests compute on this thread, where the sampler looks
+    request.state.profiled = True
+    try:
+        response = await call_next(request)
+    finally:
+        summary = finish_profile(profiler)
+
+    response.headers["X-Profile-Id"] = summary['profile_id']
+    response.headers["X-Profile-Wall-Ms"] = str(summary['wall_ms'])
+    return response
+
+
+@app.middleware("http")
+async def load_tracking_middleware(request: Request, call_next):
+    """Feed single-case prediction latency and concurrency to the adaptive selectors"""
+    path = request.url.path
+    if not LATENCY_SLO_MS or path.endswith("/batch"):
+        return await call_next(request)
+    if path.startswith("/predict/tabular"):
+        selector = tabular_predictor.selector
+    elif path.startswith("/predict/image") and request.query_params.get("async") not in ("true", "1"):
+        selector = image_predictor.selector
+    else:
+        return await call_next(request)
+    # Streaming responses are counted until their headers are sent
+    with selector.track_request():
+        return await call_next(request)
+
+
+@app.middleware("http")
+async def admission_middleware(request: Request, call_next):
+    """Per-client quotas and interactive/bulk lanes for prediction and report routes"""
+    if admission is None or not request.url.path.startswith(ADMITTED_PATH_PREFIXES):
+        return await call_next(request)
+    lane = request_lane(request)
+    try:
+        await admission.acquire(identify_client(request), lane)
+    except AdmissionRejected as e:
+        return ORJSONResponse(
+            {"detail": e.reason, "lane": lane},
+            status_code=429,
+            headers={"Retry-After": str(max(1, int(np.ceil(e.retry_after))))}
+        )
+    try:
+        response = await call_next(request)
+    except BaseException:
+        admission.release(lane)
+        raise
+    # Streaming routes run their models while the body is sent, so the slot
+    # is held until the body is done rather than until the headers are
+    response.body_iterator = _release_after_body(response.body_iterator, lane)
+    response.headers["X-Admission-Lane"] = lane
+    return response
+
+
+def _release_after_body(body, lane: str):
+    loop = asyncio.get_running_loop()
+    released = False
+
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            admission.release(lane)
+
+    def release_soon():
+        # The body was dropped unsent (client gone before the first chunk)
+        try:
+            loop.call_soon_threadsafe(release)
+        except RuntimeError:
+            pass
+
+    async def body_then_release():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            release()
+
+    iterator = body_then_release()
+    weakref.finalize(iterator, release_soon)
+    return iterator
+
+
+# CORS is added last so it wraps every other layer: responses made by the
+# middleware above (429 from admission) get CORS headers too, and preflight
+# requests are answered before they reach admission
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -35,12 +165,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+# Quotas and priority lanes (see utils/admission.py)
+admission = create_admission_controller()
+
 # Initialize predictors
 tabular_predictor = TabularPredictor()
 image_predictor = ImagePredictor()
 
-# Store prediction history
-prediction_history = []
+# Identical concurrent requests share one computation (see utils/single_flight.py)
+single_flight = {kind: SingleFlight() for kind in ('tabular', 'batch', 'image', 'report')}
+
+# Store prediction history (shared between workers when HISTORY_BACKEND=sqlite)
+prediction_history = create_history_store()
+history_stats = HistoryStats(prediction_history)
+
+# Confirmed outcomes behind the live /metrics numbers
+live_metrics = LiveMetricsStore()
+
+# Nearest reference cases for ?similar=k
+similar_case_index = create_similar_case_index(tabular_predictor.scaler)
+
+# Range checks and drift statistics for tabular inputs
+feature_monitor = FeatureMonitor.from_csv() if VALIDATION_MODE != 'off' else None
+
+# Async image jobs; one API process per host supervises the worker pool
+job_queue = JobQueue()
+job_pool = WorkerPool(job_queue)
+
+# Longest long-poll accepted by GET /jobs/{id}, in seconds
+MAX_JOB_WAIT = 30
+
+
+@app.on_event("startup")
+async def start_job_workers():
+    job_pool.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    job_pool.stop()
 
 
 class TabularInput(BaseModel):
@@ -77,6 +241,77 @@ class TabularInput(BaseModel):
     fractal_dimension_worst: float
 
 
+class Feedback(BaseModel):
+    """Confirmed diagnosis (e.g. biopsy result) for a stored prediction"""
+    prediction_id: str
+    diagnosis: str
+
+
+class LabelledCase(TabularInput):
+    """A confirmed case added to the similar-cases index"""
+    diagnosis: str
+    # Stored as a CSV field (utils/similar_cases.py)
+    case_id: Optional[str] = Field(None, pattern=r'^[A-Za-z0-9._-]{1,64}$')
+
+
+class TabularBatchInput(BaseModel):
+    """Input schema for batch tabular predictions"""
+    rows: List[TabularInput]
+
+
+# Largest batch accepted by /predict/tabular/batch
+MAX_BATCH_ROWS = 100_000
+
+
+def _is_profiled(request: Request) -> bool:
+    """Profiled requests keep all their work on the thread the sampler watches"""
+    return getattr(request.state, 'profiled', False)
+
+
+async def _shared(request: Request, kind: str, key: str, fn, *args):
+    """fn(*args), run once for all identical requests of this kind in flight"""
+    return await single_flight[kind].run(key, fn, *args, inline=_is_profiled(request))
+
+
+def _request_body_schema(model) -> Dict:
+    """OpenAPI body for routes that accept JSON or the binary matrix format"""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": model.model_json_schema()},
+                BINARY_CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}}
+            }
+        }
+    }
+
+
+def _is_binary(request: Request) -> bool:
+    return request.headers.get("content-type", "").startswith(BINARY_CONTENT_TYPE)
+
+
+def _parse_json_body(model, body: bytes):
+    """Validate a JSON body the way FastAPI does for declared body parameters"""
+    try:
+        return model.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in e.errors()])
+
+
+def _decode_feature_matrix(body: bytes) -> np.ndarray:
+    """Zero-copy (rows, 30) float32 view over a binary request body"""
+    try:
+        matrix = decode_matrix(body)
+    except BinaryFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if matrix.shape[1] != len(FEATURE_NAMES):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Expected {len(FEATURE_NAMES)} feature columns, got {matrix.shape[1]}"
+        )
+    return matrix
+
+
 class PredictionResponse(BaseModel):
     """Response schema for predictions"""
     prediction_id: str
@@ -113,13 +348,28 @@ async def root():
     }
 
 
-@app.post("/predict/tabular", response_model=PredictionResponse)
-async def predict_tabular(data: TabularInput):
+@app.post(
+    "/predict/tabular",
+    response_model=PredictionResponse,
+    openapi_extra=_request_body_schema(TabularInput)
+)
+async def predict_tabular(request: Request, similar: int = Query(0, ge=0, le=MAX_NEIGHBOURS)):
     """
     Predict breast cancer from clinical tabular data
     Uses multiple models: GRU-SVM, Linear Regression, Softmax Regression, MLP, NN
+    Accepts JSON or a one-row application/x-float32-matrix body; binary
+    requests get a binary result (see utils/binary_format.py).
+    ?view=compact drops per-model detail and feature-importance values.
+    ?similar=k adds the k most similar reference cases (JSON only).
     """
-    try:
+    body = await request.body()
+    binary = _is_binary(request)
+    if binary:
+        features = _decode_feature_matrix(body)
+        if features.shape[0] != 1:
+            raise HTTPException(status_code=400, detail="Use /predict/tabular/batch for more than one row")
+    else:
+        data = _parse_json_body(TabularInput, body)
         # Convert input to array
         features = np.array([
             data.radius_mean, data.texture_mean, data.perimeter_mean, data.area_mean,
@@ -132,129 +382,489 @@ async def predict_tabular(data: TabularInput):
             data.smoothness_worst, data.compactness_worst, data.concavity_worst,
             data.concave_points_worst, data.symmetry_worst, data.fractal_dimension_worst
         ]).reshape(1, -1)
+    
+    input_warnings = _input_warnings(features)
+    skipped = tabular_predictor.selector.select(tabular_predictor.models)
+    
+    try:
+        # Get predictions from all models (fewer when degraded under overload)
+        predictions = await _shared(
+            request, 'tabular', content_key('tabular', features, sorted(skipped)),
+            tabular_predictor.predict, features, skipped, _is_profiled(request)
+        )
+        predictions = [dict(p) for p in predictions]
         
-        # Get predictions from all models
-        predictions = tabular_predictor.predict(features)
-        
-        # Generate prediction ID
-        prediction_id = str(uuid.uuid4())[:8]
-        timestamp = datetime.now().isoformat()
-        
-        # Calculate ensemble prediction
-        # Filter out error predictions
-        valid_predictions = [p for p in predictions if p['prediction'] != 'Error']
-        
-        if valid_predictions:
-            malignant_votes = sum(1 for p in valid_predictions if p['prediction'] == 'Malignant')
-            final_prediction = 'Malignant' if malignant_votes > len(valid_predictions) / 2 else 'Benign'
-            # Confidence is already in percentage (0-100), don't multiply by 100 again!
-            avg_confidence = np.mean([p['confidence'] for p in valid_predictions])
-            # Cap confidence at 100%
-            avg_confidence = min(100.0, max(0.0, avg_confidence))
-        else:
-            final_prediction = 'Unknown'
-            avg_confidence = 0.0
-        
-        # Get feature importance
-        feature_names = [
-            'radius_mean', 'texture_mean', 'perimeter_mean', 'area_mean',
-            'smoothness_mean', 'compactness_mean', 'concavity_mean',
-            'concave_points_mean', 'symmetry_mean', 'fractal_dimension_mean',
-            'radius_se', 'texture_se', 'perimeter_se', 'area_se',
-            'smoothness_se', 'compactness_se', 'concavity_se',
-            'concave_points_se', 'symmetry_se', 'fractal_dimension_se',
-            'radius_worst', 'texture_worst', 'perimeter_worst', 'area_worst',
-            'smoothness_worst', 'compactness_worst', 'concavity_worst',
-            'concave_points_worst', 'symmetry_worst', 'fractal_dimension_worst'
-        ]
-        feature_importance = tabular_predictor.get_feature_importance(features, feature_names)
-        
-        response = {
-            "prediction_id": prediction_id,
-            "final_prediction": final_prediction,
-            "confidence": round(avg_confidence, 2),  # Already in percentage (0-100)
-            "model_predictions": predictions,
-            "feature_importance": feature_importance,
-            "timestamp": timestamp
-        }
+        response = _tabular_response(
+            features, predictions, input_warnings,
+            similar_cases=_similar_cases(features, similar)[0] if similar and not binary else None,
+            skipped_models=skipped
+        )
         
-        # Store in history
-        prediction_history.append({
-            "type": "tabular",
-            **response
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if binary:
+        return _binary_prediction_response(response)
+    return json_response(request, response)
+
+
+def _check_features(features: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Validate a feature matrix and record it for drift monitoring
+    Returns the (rows, features) mask of out-of-range values (None when
+    monitoring is off); in 'reject' mode any such value is a 422.
+    """
+    if feature_monitor is None:
+        return None
+    invalid = feature_monitor.observe(features)
+    if VALIDATION_MODE == 'reject' and invalid.any():
+        rows = np.flatnonzero(invalid.any(axis=1))[:10]
+        raise HTTPException(status_code=422, detail={
+            "message": "Feature values outside the expected range",
+            "rows": {int(r): feature_monitor.warnings(features, invalid, r) for r in rows}
         })
-        
-        return response
-        
+    return invalid
+
+
+def _input_warnings(features: np.ndarray) -> List[Dict]:
+    """Out-of-range values of a single-row request"""
+    invalid = _check_features(features)
+    if invalid is None or not invalid.any():
+        return []
+    return feature_monitor.warnings(features, invalid)
+
+
+def _similar_cases(features: np.ndarray, k: int) -> List[List[Dict]]:
+    """k nearest reference cases per row"""
+    if similar_case_index is None:
+        raise HTTPException(status_code=503, detail="Similar-case index is unavailable")
+    return similar_case_index.query(features, k)
+
+
+def _tabular_response(
+    features: np.ndarray,
+    predictions: List[Dict],
+    input_warnings: List[Dict],
+    similar_cases: Optional[List[Dict]] = None,
+    skipped_models: Optional[List[str]] = None
+) -> Dict:
+    """Build the tabular prediction response from model output and store it in history"""
+    # Generate prediction ID
+    prediction_id = str(uuid.uuid4())[:8]
+    timestamp = datetime.now().isoformat()
+    
+    # The predictor's ensemble entry (calibrated soft vote or majority vote)
+    # is the final answer; a lone surviving model decides on its own
+    ensemble = next((p for p in predictions if p['model'].startswith('Ensemble')), None)
+    valid_predictions = [p for p in predictions if p['prediction'] != 'Error']
+    
+    if ensemble is not None:
+        final_prediction = ensemble['prediction']
+        avg_confidence = ensemble['confidence']
+    elif valid_predictions:
+        malignant_votes = sum(1 for p in valid_predictions if p['prediction'] == 'Malignant')
+        final_prediction = 'Malignant' if malignant_votes > len(valid_predictions) / 2 else 'Benign'
+        # Confidence is already in percentage (0-100), don't multiply by 100 again!
+        avg_confidence = np.mean([p['confidence'] for p in valid_predictions])
+        # Cap confidence at 100%
+        avg_confidence = min(100.0, max(0.0, avg_confidence))
+    else:
+        final_prediction = 'Unknown'
+        avg_confidence = 0.0
+    
+    # Get feature importance
+    feature_names = [
+        'radius_mean', 'texture_mean', 'perimeter_mean', 'area_mean',
+        'smoothness_mean', 'compactness_mean', 'concavity_mean',
+        'concave_points_mean', 'symmetry_mean', 'fractal_dimension_mean',
+        'radius_se', 'texture_se', 'perimeter_se', 'area_se',
+        'smoothness_se', 'compactness_se', 'concavity_se',
+        'concave_points_se', 'symmetry_se', 'fractal_dimension_se',
+        'radius_worst', 'texture_worst', 'perimeter_worst', 'area_worst',
+        'smoothness_worst', 'compactness_worst', 'concavity_worst',
+        'concave_points_worst', 'symmetry_worst', 'fractal_dimension_worst'
+    ]
+    feature_importance = tabular_predictor.get_feature_importance(features, feature_names)
+    
+    response = {
+        "prediction_id": prediction_id,
+        "final_prediction": final_prediction,
+        "confidence": float(round_confidence(avg_confidence)),  # Already in percentage (0-100)
+        "model_predictions": predictions,
+        "feature_importance": feature_importance,
+        "timestamp": timestamp
+    }
+    if input_warnings:
+        response["input_warnings"] = input_warnings
+    if similar_cases is not None:
+        response["similar_cases"] = similar_cases
+    _mark_degraded(response, skipped_models)
+    
+    # Store in history, with the inputs so tools.evaluate_models can replay it
+    prediction_history.append({
+        "type": "tabular",
+        **response,
+        "features": np.asarray(features[0], dtype=np.float64).tolist()
+    })
+    return response
+
+
+def _binary_prediction_response(response: Dict) -> Response:
+    """Encode a single tabular prediction as a one-row float32 matrix"""
+    models = [p['model'] for p in response['model_predictions']]
+    row = [1.0 if response['final_prediction'] == 'Malignant' else 0.0, response['confidence']]
+    for p in response['model_predictions']:
+        row += [{'Malignant': 1.0, 'Benign': 0.0}.get(p['prediction'], np.nan), p['confidence']]
+    return Response(
+        content=encode_matrix(np.array([row])),
+        media_type=BINARY_CONTENT_TYPE,
+        headers={
+            "X-Prediction-Id": response['prediction_id'],
+            "X-Columns": ",".join(batch_result_columns(models)),
+            "X-Input-Warnings": ",".join(w['feature'] for w in response.get('input_warnings', [])),
+            "X-Degraded": ",".join(response.get('skipped_models', []))
+        }
+    )
+
+
+def _mark_degraded(response: Dict, skipped_models: Optional[List[str]]):
+    """Flag a response built without the models skipped under overload"""
+    if skipped_models:
+        response["degraded"] = True
+        response["skipped_models"] = list(skipped_models)
+
+
+@app.post("/predict/tabular/batch", openapi_extra=_request_body_schema(TabularBatchInput))
+async def predict_tabular_batch(request: Request, similar: int = Query(0, ge=0, le=MAX_NEIGHBOURS)):
+    """
+    Predict many cases at once; every model scores the whole batch in one call
+    Accepts {"rows": [...]} JSON or an (n, 30) application/x-float32-matrix
+    body and answers in the same format. Batch results are not stored in the
+    prediction history. ?similar=k adds similar cases per row (JSON only).
+    """
+    body = await request.body()
+    binary = _is_binary(request)
+    if binary:
+        features = _decode_feature_matrix(body)
+    else:
+        batch = _parse_json_body(TabularBatchInput, body)
+        features = np.array(
+            [[getattr(row, name) for name in FEATURE_NAMES] for row in batch.rows],
+            dtype=np.float64
+        ).reshape(-1, len(FEATURE_NAMES))
+    
+    if features.shape[0] > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batches are limited to {MAX_BATCH_ROWS} rows")
+    
+    invalid = _check_features(features)
+    rows_out_of_range = [] if invalid is None else np.flatnonzero(invalid.any(axis=1)).tolist()
+    
+    try:
+        features = np.asarray(features, dtype=np.float64)
+        result = await _shared(request, 'batch', content_key('batch', features), tabular_predictor.predict_batch, features)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    if binary:
+        return Response(
+            content=encode_batch_result(result),
+            media_type=BINARY_CONTENT_TYPE,
+            headers={
+                "X-Columns": ",".join(batch_result_columns(result['models'])),
+                "X-Rows-Out-Of-Range": str(len(rows_out_of_range))
+            }
+        )
+    rows = _batch_rows_json(result)
+    if similar:
+        for row, cases in zip(rows, _similar_cases(features, similar)):
+            row["similar_cases"] = cases
+    if wants_compact(request):
+        rows = [compact_view(row) for row in rows]
+    return ORJSONResponse({
+        "models": result['models'],
+        "predictions": rows,
+        "rows_out_of_range": rows_out_of_range
+    })
+
+
+def _batch_rows_json(result: Dict) -> List[Dict]:
+    """Per-row JSON view of TabularPredictor.predict_batch output"""
+    labels = {1.0: 'Malignant', 0.0: 'Benign'}
+    model_labels = [[labels.get(v, 'Error') for v in row] for row in result['malignant'].tolist()]
+    # Same rounding as single predictions
+    model_confidence = round_confidence(result['confidence']).tolist()
+    final_confidence = round_confidence(result['final_confidence']).tolist()
+    
+    return [
+        {
+            "final_prediction": labels.get(final, 'Unknown'),
+            "confidence": confidence,
+            "model_predictions": [
+                {"model": name, "prediction": label, "confidence": conf}
+                for name, label, conf in zip(result['models'], row_labels, row_confidence)
+            ]
+        }
+        for final, confidence, row_labels, row_confidence in zip(
+            result['final_malignant'].tolist(), final_confidence, model_labels, model_confidence
+        )
+    ]
+
+
+def _image_response(
+    predictions: List[Dict],
+    heatmap_base64: Optional[str],
+    skipped_models: Optional[List[str]] = None
+) -> Dict:
+    """Build the image prediction response from model output and store it in history"""
+    # Generate prediction ID
+    prediction_id = str(uuid.uuid4())[:8]
+    timestamp = datetime.now().isoformat()
+    
+    # Calculate ensemble prediction (models that failed or timed out don't vote)
+    valid_predictions = [p for p in predictions if p['prediction'] != 'Error']
+    malignant_votes = sum(1 for p in valid_predictions if p['prediction'] == 'Malignant')
+    final_prediction = 'Malignant' if malignant_votes > len(valid_predictions) / 2 else 'Benign'
+    
+    # Get ensemble confidence
+    ensemble_pred = next((p for p in valid_predictions if p['model'] == 'Ensemble'), None)
+    if ensemble_pred:
+        confidence = ensemble_pred['confidence']
+    elif valid_predictions:
+        confidence = np.mean([p['confidence'] for p in valid_predictions])
+    else:
+        final_prediction, confidence = 'Unknown', 0.0
+    
+    explanation = "Highlighted red regions indicate areas most correlated with malignancy. " \
+                 "The ensemble model combines predictions from all vision models for improved accuracy."
+    
+    response = {
+        "prediction_id": prediction_id,
+        "final_prediction": final_prediction,
+        "confidence": round(float(confidence), 2),
+        "model_predictions": predictions,
+        "heatmap_base64": heatmap_base64,
+        "explanation": explanation,
+        "timestamp": timestamp
+    }
+    _mark_degraded(response, skipped_models)
+    
+    # Store in history
+    prediction_history.append({
+        "type": "image",
+        **response
+    })
+    return response
 
 
 @app.post("/predict/image", response_model=ImagePredictionResponse)
-async def predict_image(file: UploadFile = File(...)):
+async def predict_image(
+    request: Request,
+    file: UploadFile = File(...),
+    async_mode: bool = Query(False, alias="async"),
+    priority: int = 0
+):
     """
     Predict breast cancer from mammogram image
     Uses multiple vision models: DenseNet, ViT-B, Swin Transformer, EfficientNet, Ensemble
+    Accepts PNG/JPEG and uncompressed DICOM (compressed DICOM needs pydicom).
+    ?view=compact drops per-model detail and the heatmap.
+    ?async=true queues the image for the worker pool and returns 202 with a
+    job id to poll at GET /jobs/{id}; higher ?priority runs first.
     """
+    # Read image
+    contents = await file.read()
+
+    if async_mode:
+        if not job_pool.n_workers:
+            raise HTTPException(status_code=503, detail="Async image jobs are disabled")
+        try:
+            job_id = job_queue.enqueue('image', contents, priority=priority)
+        except QueueFullError:
+            raise HTTPException(status_code=503, detail="Job queue is full",
+                                headers={"Retry-After": "5"})
+        return ORJSONResponse(
+            {"job_id": job_id, "status": "queued", "poll": f"/jobs/{job_id}"},
+            status_code=202
+        )
+
+    skipped = _image_skipped_models()
     try:
-        # Read image
-        contents = await file.read()
-        
-        # Get predictions from all vision models
-        predictions, heatmap_base64 = image_predictor.predict(contents)
-        
-        # Generate prediction ID
-        prediction_id = str(uuid.uuid4())[:8]
-        timestamp = datetime.now().isoformat()
-        
-        # Calculate ensemble prediction
-        malignant_votes = sum(1 for p in predictions if p['prediction'] == 'Malignant')
-        final_prediction = 'Malignant' if malignant_votes > len(predictions) / 2 else 'Benign'
-        
-        # Get ensemble confidence
-        ensemble_pred = next((p for p in predictions if p['model'] == 'Ensemble'), None)
-        confidence = ensemble_pred['confidence'] if ensemble_pred else np.mean([p['confidence'] for p in predictions])
-        
-        explanation = "Highlighted red regions indicate areas most correlated with malignancy. " \
-                     "The ensemble model combines predictions from all vision models for improved accuracy."
-        
-        response = {
-            "prediction_id": prediction_id,
-            "final_prediction": final_prediction,
-            "confidence": round(confidence, 2),
-            "model_predictions": predictions,
-            "heatmap_base64": heatmap_base64,
-            "explanation": explanation,
-            "timestamp": timestamp
-        }
-        
-        # Store in history
-        prediction_history.append({
-            "type": "image",
-            **response
-        })
-        
-        return response
+        # Get predictions from all vision models (fewer when degraded under overload)
+        predictions, heatmap_base64 = await _shared(
+            request, 'image', content_key('image', contents, sorted(skipped)),
+            image_predictor.predict, contents, skipped, _is_profiled(request)
+        )
+        predictions = [dict(p) for p in predictions]
+        return json_response(request, _image_response(predictions, heatmap_base64, skipped))
         
+    except DicomError as e:
+        raise HTTPException(status_code=415, detail=f"Unreadable DICOM: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _image_skipped_models() -> List[str]:
+    """Vision models to leave out under overload; the Ensemble always runs"""
+    return image_predictor.selector.select(
+        [model['name'] for model in image_predictor.model_configs], protected=['Ensemble']
+    )
+
+
+def _sse(event: str, data) -> bytes:
+    """One server-sent event"""
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY) + b"\n\n"
+
+
+def _event_stream(events) -> StreamingResponse:
+    # Starlette iterates sync generators in its threadpool
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/predict/tabular/stream")
+async def predict_tabular_stream(data: TabularInput):
+    """
+    Streaming variant of /predict/tabular (server-sent events)
+    The models run concurrently; each result is sent as a 'model' event when
+    it is ready, then 'ensemble', then 'done' with the full response (which
+    is stored in history like a regular prediction). Failures end the stream
+    with an 'error' event.
+    """
+    features = np.array([[getattr(data, name) for name in FEATURE_NAMES]])
+    input_warnings = _input_warnings(features)
+    skipped = tabular_predictor.selector.select(tabular_predictor.models)
+
+    def events():
+        predictions = []
+        try:
+            for event, prediction in tabular_predictor.iter_predictions(features, skip=skipped):
+                predictions.append(prediction)
+                yield _sse(event, prediction)
+            response = _tabular_response(features, predictions, input_warnings, skipped_models=skipped)
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+        yield _sse("done", response)
+
+    return _event_stream(events())
+
+
+@app.post("/predict/image/stream")
+async def predict_image_stream(file: UploadFile = File(...)):
+    """
+    Streaming variant of /predict/image (server-sent events)
+    Sends a 'model' event per vision model as it finishes, then 'ensemble',
+    'heatmap' ({"heatmap_base64": ...}) and 'done' with the full response
+    minus the heatmap already sent.
+    """
+    contents = await file.read()
+    skipped = _image_skipped_models()
+
+    def events():
+        predictions, heatmap_base64 = [], None
+        try:
+            for event, payload in image_predictor.iter_predictions(contents, skip=skipped):
+                if event == "heatmap":
+                    heatmap_base64 = payload
+                    yield _sse(event, {"heatmap_base64": payload})
+                else:
+                    predictions.append(payload)
+                    yield _sse(event, payload)
+            response = _image_response(predictions, heatmap_base64, skipped)
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+        yield _sse("done", {k: v for k, v in response.items() if k != "heatmap_base64"})
+
+    return _event_stream(events())
+
+
+@app.get("/jobs")
+async def get_jobs():
+    """Job queue depth by status and the size of the worker pool"""
+    return {"counts": job_queue.counts(), "workers": job_pool.n_workers}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(request: Request, job_id: str, wait: float = Query(0, ge=0, le=MAX_JOB_WAIT)):
+    """
+    Get the status of an async image job
+    With ?wait=<seconds> the request long-polls until the job finishes or the
+    wait runs out. Finished jobs carry the usual image prediction response;
+    while another request is still building it the answer is 202 with
+    status 'finalizing'.
+    """
+    deadline = time.monotonic() + wait
+    job = job_queue.get(job_id)
+    while job is not None and job['status'] in ('queued', 'running') and time.monotonic() < deadline:
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+        job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if job['status'] == 'done' and job['response'] is None:
+        # The first poll after completion turns the raw output into a prediction
+        if job_queue.claim_finalization(job_id):
+            try:
+                response = _image_response(job['result']['predictions'], job['result']['heatmap_base64'])
+                job_queue.store_response(job_id, response)
+            except Exception:
+                job_queue.release_finalization(job_id)
+                raise
+            job['response'] = response
+        else:
+            while job['response'] is None and time.monotonic() < deadline:
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+                job = job_queue.get(job_id)
+            if job['response'] is None:
+                return ORJSONResponse({
+                    "job_id": job_id,
+                    "status": "finalizing",
+                    "priority": job['priority'],
+                    "attempts": job['attempts'],
+                    "error": None,
+                    "result": None
+                }, status_code=202)
+
+    result = job['response']
+    if result is not None and wants_compact(request):
+        result = compact_view(result)
+    return ORJSONResponse({
+        "job_id": job_id,
+        "status": job['status'],
+        "priority": job['priority'],
+        "attempts": job['attempts'],
+        "error": job['error'],
+        "result": result
+    })
+
+
 @app.get("/metrics")
-async def get_metrics():
+async def get_metrics(window_days: int = Query(LIVE_METRICS_WINDOW_DAYS, ge=0)):
     """
     Get performance metrics for all models
-    Returns accuracy, F1 score, ROC curves, and confusion matrices
+    Returns accuracy, F1 score, ROC curves, and confusion matrices. Models with
+    enough confirmed outcomes (POST /feedback) over the last window_days
+    (0 = all time) report live numbers instead of the reference ones.
     """
     try:
-        metrics = get_model_metrics()
-        return metrics
+        metrics = merge_live_metrics(
+            get_model_metrics(), live_metrics.summary(window_days), LIVE_METRICS_MIN_CASES
+        )
+        metrics['live_window_days'] = window_days
+        return ORJSONResponse(metrics)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/report/generate")
 async def generate_report(
+    request: Request,
     prediction_id: str,
     patient_id: Optional[str] = None
 ):
@@ -263,20 +873,18 @@ async def generate_report(
     """
     try:
         # Find prediction in history
-        prediction = next(
-            (p for p in prediction_history if p['prediction_id'] == prediction_id),
-            None
-        )
+        prediction = prediction_history.get(prediction_id)
         
         if not prediction:
             raise HTTPException(status_code=404, detail="Prediction not found")
         
-        # Generate patient ID if not provided
-        if not patient_id:
-            patient_id = f"PT-{uuid.uuid4().hex[:6].upper()}"
-        
-        # Generate PDF
-        pdf_path = generate_pdf_report(prediction, patient_id)
+        # Generate PDF (once for repeated requests while it renders; they
+        # share the generated patient ID too)
+        key = content_key('report', prediction_id, patient_id)
+        pdf_path = await _shared(
+            request, 'report', key,
+            generate_pdf_report, prediction, patient_id or f"PT-{uuid.uuid4().hex[:6].upper()}"
+        )
         
         return FileResponse(
             pdf_path,
@@ -291,15 +899,152 @@ async def generate_report(
 
 
 @app.get("/history")
-async def get_history():
-    """Get prediction history"""
-    return {"predictions": prediction_history}
+async def get_history(request: Request):
+    """Get prediction history (?view=compact leaves out heatmaps and per-model detail)"""
+    predictions = prediction_history.list()
+    if wants_compact(request):
+        predictions = [compact_view(p) for p in predictions]
+    return ORJSONResponse({"predictions": predictions})
+
+
+@app.get("/history/stats")
+async def get_history_stats(
+    buckets: int = Query(24, ge=1, le=STATS_MAX_BUCKETS),
+    hours: float = Query(24, gt=0)
+):
+    """
+    Dashboard aggregates of the prediction history
+    'buckets': counts, malignancy rate, confidence histogram and model
+    agreement for the last hourly buckets; 'window': totals and per-model
+    agreement over the last ?hours.
+    """
+    history_stats.refresh()
+    return ORJSONResponse({
+        "bucket_seconds": STATS_BUCKET_SECONDS,
+        "buckets": history_stats.bucket_stats(buckets),
+        "window_hours": hours,
+        "window": history_stats.window_stats(hours),
+        "models": list(history_stats.models)
+    })
+
+
+@app.post("/cases")
+async def add_case(case: LabelledCase):
+    """
+    Add a confirmed (labelled) case to the similar-cases index
+    Cases are appended to backend/var/labelled_cases.csv and become visible
+    to every worker process on its next similar-cases query.
+    """
+    if similar_case_index is None:
+        raise HTTPException(status_code=503, detail="Similar-case index is unavailable")
+    if case.diagnosis not in ('Malignant', 'Benign'):
+        raise HTTPException(status_code=422, detail="diagnosis must be 'Malignant' or 'Benign'")
+    case_id = case.case_id or f"CASE-{uuid.uuid4().hex[:8].upper()}"
+    features = np.array([[getattr(case, name) for name in FEATURE_NAMES]])
+    similar_case_index.add_case(features, case.diagnosis, case_id)
+    return {"case_id": case_id, "cases": similar_case_index.size}
+
+
+@app.post("/feedback")
+async def post_feedback(feedback: Feedback):
+    """
+    Attach a confirmed diagnosis to a stored prediction
+    Each model's answer is counted into the live metrics; sending a different
+    diagnosis later corrects it, the same one again changes nothing.
+    """
+    if feedback.diagnosis not in ('Malignant', 'Benign'):
+        raise HTTPException(status_code=422, detail="diagnosis must be 'Malignant' or 'Benign'")
+    record = prediction_history.get(feedback.prediction_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+    result = live_metrics.record(record, feedback.diagnosis)
+    return {
+        "prediction_id": feedback.prediction_id,
+        "diagnosis": feedback.diagnosis,
+        "predicted": record.get('final_prediction'),
+        **result
+    }
+
+
+@app.get("/monitoring/drift")
+async def get_drift():
+    """
+    Running statistics of the tabular inputs seen by this worker process,
+    next to the data.csv reference (PSI, mean shift, out-of-range counts)
+    """
+    if feature_monitor is None:
+        raise HTTPException(status_code=404, detail="Input monitoring is disabled")
+    return ORJSONResponse(feature_monitor.stats())
+
+
+@app.get("/monitoring/shadow")
+async def get_shadow():
+    """Agreement and latency of shadow candidate models in this worker process"""
+    if tabular_predictor.shadow is None:
+        raise HTTPException(status_code=404, detail="No shadow models configured (SHADOW_MODELS)")
+    return tabular_predictor.shadow.stats()
+
+
+@app.get("/system/threads")
+async def get_thread_settings():
+    """Intra-op thread limits of this worker process for BLAS/OpenMP, PyTorch and TensorFlow"""
+    return thread_settings()
+
+
+@app.get("/monitoring/admission")
+async def get_admission():
+    """Per-lane queue depth, admissions, rejections and queue wait of this worker process"""
+    if admission is None:
+        raise HTTPException(status_code=404, detail="Admission control is disabled")
+    return admission.stats()
+
+
+@app.get("/monitoring/load")
+async def get_load():
+    """Adaptive model selection state of this worker process (LATENCY_SLO_MS)"""
+    return {
+        "tabular": tabular_predictor.selector.stats(),
+        "image": image_predictor.selector.stats(),
+        "pid": os.getpid()
+    }
+
+
+@app.get("/monitoring/single-flight")
+async def get_single_flight():
+    """Requests served from an identical in-flight computation, per route, in this worker process"""
+    return {
+        **{kind: flight.stats() for kind, flight in single_flight.items()},
+        "pid": os.getpid()
+    }
+
+
+@app.get("/profiles")
+async def get_profiles():
+    """List stored request profiles"""
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    return {"profiles": list_profiles()}
+
+
+@app.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    """
+    Get a stored request profile
+    The 'folded' field can be fed to flamegraph.pl or speedscope as-is
+    """
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    profile = load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
 
 
 @app.delete("/history")
 async def clear_history():
     """Clear prediction history"""
     prediction_history.clear()
+    history_stats.reset()
     return {"message": "History cleared"}
 
 
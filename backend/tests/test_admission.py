@@ -0,0 +1,127 @@
+import asyncio
+import ipaddress
+from types import SimpleNamespace
+
+import pytest
+
+from utils import admission
+from utils.admission import (
+    AdmissionController, AdmissionRejected, TokenBucket, client_address, identify_client,
+    request_lane, BULK, INTERACTIVE
+)
+
+
+def _request(peer, headers=None):
+    return SimpleNamespace(client=SimpleNamespace(host=peer), headers=headers or {})
+
+
+def test_bucket_allows_the_burst_then_refills(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(admission.time, 'monotonic', lambda: clock[0])
+    bucket = TokenBucket(rate=2, burst=3)
+
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take() == pytest.approx(0.5)
+    clock[0] += 0.5
+    assert bucket.take() == 0.0
+    clock[0] += 60
+    assert [bucket.take() for _ in range(4)][-1] > 0  # refill stops at the burst
+
+
+def test_rate_limited_clients_do_not_affect_others(monkeypatch):
+    monkeypatch.setattr(admission, 'ADMISSION_RATE', 0.001)
+    monkeypatch.setattr(admission, 'ADMISSION_BURST', 1)
+    controller = AdmissionController(concurrency=4, bulk_concurrency=1)
+
+    async def run():
+        await controller.acquire('a', INTERACTIVE)
+        controller.release(INTERACTIVE)
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire('a', INTERACTIVE)
+        await controller.acquire('b', INTERACTIVE)
+        controller.release(INTERACTIVE)
+
+    asyncio.run(run())
+    assert controller.counters[INTERACTIVE]['rate_limited'] == 1
+    assert controller.running == {INTERACTIVE: 0, BULK: 0}
+
+
+def test_interactive_waiters_go_before_bulk_and_bulk_is_capped():
+    controller = AdmissionController(concurrency=2, bulk_concurrency=1)
+    order = []
+
+    async def request(client, lane):
+        await controller.acquire(client, lane)
+        order.append(client)
+
+    async def run():
+        await controller.acquire('bulk-1', BULK)
+        await controller.acquire('ui-1', INTERACTIVE)
+        # Both slots are taken: these wait, bulk-2 queued first
+        waiters = [asyncio.ensure_future(request('bulk-2', BULK)),
+                   asyncio.ensure_future(request('ui-2', INTERACTIVE))]
+        await asyncio.sleep(0)
+        controller.release(INTERACTIVE)  # ui-1 done
+        await asyncio.sleep(0)
+        # The free slot goes to ui-2; bulk-2 would exceed the bulk cap anyway
+        assert order == ['ui-2']
+        controller.release(BULK)  # bulk-1 done
+        await asyncio.gather(*waiters)
+
+    asyncio.run(run())
+    assert order == ['ui-2', 'bulk-2']
+    assert controller.running == {INTERACTIVE: 1, BULK: 1}
+
+
+def test_full_lane_queue_is_rejected(monkeypatch):
+    monkeypatch.setitem(admission.MAX_QUEUED, BULK, 1)
+    controller = AdmissionController(concurrency=1, bulk_concurrency=1)
+
+    async def run():
+        await controller.acquire('a', BULK)
+        waiter = asyncio.ensure_future(controller.acquire('b', BULK))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire('c', BULK)
+        assert rejected.value.retry_after == admission.QUEUE_RETRY_AFTER
+        controller.release(BULK)
+        await waiter
+
+    asyncio.run(run())
+    assert controller.counters[BULK]['queue_full'] == 1
+
+
+def test_forwarded_address_is_only_believed_from_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(admission, 'TRUSTED_PROXIES', [ipaddress.ip_network('172.16.0.0/12')])
+    headers = {'x-forwarded-for': '203.0.113.7, 172.18.0.5', 'x-real-ip': '172.18.0.5'}
+
+    assert client_address(_request('198.51.100.1', headers)) == '198.51.100.1'
+    # Right-most untrusted hop: a client-supplied first entry is ignored
+    assert client_address(_request('172.18.0.2', headers)) == '203.0.113.7'
+    spoofed = {'x-forwarded-for': '10.9.9.9, 203.0.113.7'}
+    assert client_address(_request('172.18.0.2', spoofed)) == '203.0.113.7'
+    assert client_address(_request('172.18.0.2', {'x-real-ip': '203.0.113.8'})) == '203.0.113.8'
+    assert client_address(_request('172.18.0.2')) == '172.18.0.2'
+
+
+def _routed(path, headers=None, peer='198.51.100.1'):
+    return SimpleNamespace(client=SimpleNamespace(host=peer), headers=headers or {},
+                           url=SimpleNamespace(path=path))
+
+
+def test_priority_header_can_only_demote():
+    assert request_lane(_routed('/predict/tabular/batch', {'x-priority': 'interactive'})) == BULK
+    assert request_lane(_routed('/predict/tabular', {'x-priority': 'bulk'})) == BULK
+    assert request_lane(_routed('/predict/tabular', {'x-priority': 'interactive'})) == INTERACTIVE
+    assert request_lane(_routed('/predict/tabular')) == INTERACTIVE
+
+
+def test_only_known_keys_become_client_identities(monkeypatch):
+    monkeypatch.setattr(admission, 'ADMISSION_CLIENT_KEYS', frozenset({'ward-3'}))
+    monkeypatch.setattr(admission, '_QUOTA_KEYS', frozenset({'nightly'}))
+
+    assert identify_client(_routed('/predict/tabular', {'x-api-key': 'ward-3'})) == 'ward-3'
+    assert identify_client(_routed('/predict/tabular', {'x-client-id': 'nightly'})) == 'nightly'
+    # A made-up key per request still lands in the address's bucket
+    for key in ('random-1', 'random-2'):
+        assert identify_client(_routed('/predict/tabular', {'x-api-key': key})) == '198.51.100.1'
@@ -0,0 +1,41 @@
+import numpy as np
+
+from utils.calibration import EnsembleCalibrator
+from utils.predictions import _format_calibrated
+
+
+def _calibrator():
+    return EnsembleCalibrator({
+        'GRU-SVM': {'method': 'platt', 'a': 1.0, 'b': 0.0, 'weight': 0.5, 'extractor': 'keras'},
+        'Random Forest': {'method': 'platt', 'a': 1.0, 'b': 0.0, 'weight': 0.25},
+        'SVM RBF': {'method': 'platt', 'a': 1.0, 'b': 0.0, 'weight': 0.25},
+    })
+
+
+def test_model_calibrated_on_another_extractor_is_excluded():
+    calibrator = _calibrator()
+    calibrator.use_extractor('GRU-SVM', 'pytorch')
+    names = ['GRU-SVM', 'Random Forest', 'SVM RBF']
+    assert not calibrator.covers(names)
+    assert calibrator.covers(names[1:])
+
+    probs = calibrator.probabilities(names, np.array([[5.0, 0.0, 0.0]]))
+    assert np.isnan(probs[0, 0])
+    # The excluded model carries no weight even with a probability
+    combined = calibrator.combine(names, np.array([[1.0, 0.2, 0.4]]))
+    assert np.allclose(combined, [0.3])
+
+
+def test_matching_extractor_is_used_again():
+    calibrator = _calibrator()
+    calibrator.use_extractor('GRU-SVM', None)
+    calibrator.use_extractor('GRU-SVM', 'keras')
+    assert calibrator.covers(['GRU-SVM', 'Random Forest'])
+
+
+def test_calibrated_entry_label_follows_its_probability():
+    for probability in (0.2, 0.4999, 0.5, 0.688):
+        entry = _format_calibrated('Random Forest', probability)
+        assert (entry['prediction'] == 'Malignant') == (probability >= 0.5)
+        assert entry['confidence'] == round(max(probability, 1 - probability) * 100, 1)
+        assert entry['probability'] == round(probability * 100, 1)
@@ -0,0 +1,62 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from utils import cam, predictions
+from utils.predictions import ImagePredictor
+
+MEMBERS = [
+    {'name': 'DenseNet', 'weight': 0.91},
+    {'name': 'ViT-B', 'weight': 0.89},
+    {'name': 'Swin Transformer', 'weight': 0.87},
+    {'name': 'EfficientNet', 'weight': 0.90},
+]
+
+
+def _image(seed=0):
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[:224, :224]
+    gray = 150 * np.clip(1 - ((yy - 110) ** 2 + (xx - 100) ** 2) / 90 ** 2, 0, 1)
+    gray += 100 * np.exp(-((yy - 80) ** 2 + (xx - 140) ** 2) / 50)
+    return np.clip(gray + rng.normal(0, 5, gray.shape), 0, 255)
+
+
+def test_cnn_scores_are_the_pooled_class_maps():
+    gray = _image()
+    scores, heatmap = cam.ensemble_forward(gray, MEMBERS)
+
+    features = cam.patch_features(gray)
+    class_maps = np.einsum('mc,chw->mhw', cam.head_weights(['DenseNet', 'EfficientNet']), features)
+    expected = 1 / (1 + np.exp(-cam.SCORE_GAIN * class_maps.mean(axis=(1, 2))))
+    assert np.allclose([scores['DenseNet'], scores['EfficientNet']], expected)
+    assert heatmap.shape == (224, 224)
+
+
+def test_ensemble_score_is_the_weighted_member_mean():
+    scores, _ = cam.ensemble_forward(_image(), MEMBERS)
+    weights = np.array([m['weight'] for m in MEMBERS])
+    members = np.array([scores[m['name']] for m in MEMBERS])
+    assert np.isclose(scores['Ensemble'], np.dot(weights, members) / weights.sum())
+    assert all(0 < score < 1 for score in scores.values())
+
+
+def test_skipped_members_leave_scores_and_map():
+    scores, _ = cam.ensemble_forward(_image(), MEMBERS[:1])
+    assert set(scores) == {'DenseNet', 'Ensemble'}
+    assert scores['Ensemble'] == scores['DenseNet']
+
+
+def test_cam_mode_predictions_come_from_the_forward_pass(monkeypatch):
+    monkeypatch.setattr(predictions, 'HEATMAP_MODE', 'cam')
+    monkeypatch.setattr(predictions, 'TILED_INFERENCE', False)
+    buffer = io.BytesIO()
+    Image.fromarray(_image().astype(np.uint8)).convert('RGB').save(buffer, format='PNG')
+    predictor = ImagePredictor()
+
+    first, _ = predictor.predict(buffer.getvalue(), sequential=True)
+    second, _ = predictor.predict(buffer.getvalue(), sequential=True)
+
+    assert first == second  # no per-request noise on top of the pass
+    by_name = {p['model']: p for p in first}
+    assert by_name['Ensemble']['prediction'] in ('Malignant', 'Benign')
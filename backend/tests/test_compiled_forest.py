@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from utils.compiled_forest import CompiledForest
+from utils.similar_cases import REFERENCE_DATA_PATH
+
+
+@pytest.fixture(scope='module')
+def data():
+    df = pd.read_csv(REFERENCE_DATA_PATH)
+    return df.iloc[:, 2:32].to_numpy(dtype=np.float64), (df['diagnosis'] == 'M').to_numpy()
+
+
+@pytest.fixture(scope='module')
+def forest(data):
+    X, y = data
+    return RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0, n_jobs=1).fit(X, y)
+
+
+def test_probabilities_match_sklearn_exactly(forest, data):
+    compiled = CompiledForest.from_sklearn(forest)
+    X = data[0]
+    assert np.array_equal(compiled.predict_proba(X), forest.predict_proba(X))
+    assert np.array_equal(compiled.predict_proba(X[:1]), forest.predict_proba(X[:1]))
+    labels, confidence = compiled.predict_with_confidence(X)
+    assert np.array_equal(labels, forest.predict(X))
+    assert np.array_equal(confidence, forest.predict_proba(X).max(axis=1))
+
+
+def test_saved_arrays_load_memory_mapped(forest, data, tmp_path):
+    CompiledForest.from_sklearn(forest).save(str(tmp_path))
+    loaded = CompiledForest.load(str(tmp_path))
+    assert np.array_equal(loaded.predict_proba(data[0]), forest.predict_proba(data[0]))
+
+
+@pytest.mark.filterwarnings('ignore:overflow encountered in cast:RuntimeWarning')
+@pytest.mark.parametrize('bad', [np.nan, np.inf, -np.inf, 1e300])
+def test_non_finite_rows_are_rejected(forest, data, bad):
+    compiled = CompiledForest.from_sklearn(forest)
+    X = data[0][:3].copy()
+    X[1, 0] = bad
+    with pytest.raises(ValueError):
+        compiled.predict_proba(X)
+    if not np.isnan(bad):
+        # sklearn rejects these too (1e300 overflows its float32 cast)
+        with pytest.raises(ValueError):
+            forest.predict_proba(X)
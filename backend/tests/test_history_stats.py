@@ -0,0 +1,75 @@
+from datetime import datetime
+
+from utils.history import InMemoryHistory, SQLiteHistory
+from utils.history_stats import HistoryStats
+
+
+def _record(prediction_id, final='Malignant'):
+    return {
+        'prediction_id': prediction_id,
+        'type': 'tabular',
+        'timestamp': datetime.now().isoformat(),
+        'final_prediction': final,
+        'confidence': 90.0,
+        'model_predictions': [{'model': 'SVM', 'prediction': final}],
+        'heatmap': 'x' * 1000
+    }
+
+
+def _count(stats):
+    return stats.window_stats(hours=1)['tabular']['count']
+
+
+def test_stats_fold_in_new_records_once():
+    store = InMemoryHistory()
+    stats = HistoryStats(store, capacity=8)
+    store.append(_record('a'))
+    stats.refresh()
+    store.append(_record('b', 'Benign'))
+    stats.refresh()
+    stats.refresh()
+
+    assert _count(stats) == 2
+    assert stats.bucket_stats()[-1]['tabular']['malignant'] == 1
+
+
+def test_clear_through_another_worker_resets_the_stats(tmp_path):
+    db_path = str(tmp_path / 'history.sqlite3')
+    # Two worker processes: each has its own store connection and stats
+    worker_a, worker_b = SQLiteHistory(db_path), SQLiteHistory(db_path)
+    stats_a, stats_b = HistoryStats(worker_a), HistoryStats(worker_b)
+    for i in range(3):
+        worker_a.append(_record(f"p{i}"))
+    stats_a.refresh()
+    stats_b.refresh()
+    assert _count(stats_a) == _count(stats_b) == 3
+
+    worker_a.clear()
+    stats_a.reset()
+    worker_b.append(_record('after'))
+    stats_a.refresh()
+    stats_b.refresh()
+
+    assert _count(stats_a) == _count(stats_b) == 1
+    assert sum(b['tabular']['count'] for b in stats_b.bucket_stats()) == 1
+
+
+def test_clear_between_generation_and_tail_read_is_caught(tmp_path):
+    store = SQLiteHistory(str(tmp_path / 'history.sqlite3'))
+    stats = HistoryStats(store)
+    store.append(_record('old'))
+    stats.refresh()
+
+    # Another worker clears and appends right after this worker read the generation
+    generation = store.generation
+    def racing_generation():
+        value = generation()
+        store.clear()
+        store.append(_record('new'))
+        return value
+    store.generation = racing_generation
+    stats.refresh()
+    store.generation = generation
+    stats.refresh()
+
+    assert _count(stats) == 1
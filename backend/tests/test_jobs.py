@@ -0,0 +1,52 @@
+import pytest
+
+from utils import jobs
+from utils.jobs import JobQueue, DONE
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / 'jobs.sqlite3'))
+
+
+def _finished_job(queue: JobQueue) -> str:
+    job_id = queue.enqueue('image', b'payload')
+    assert queue.claim(worker_pid=1)[0] == job_id
+    queue.complete(job_id, {'predictions': [], 'heatmap_base64': ''})
+    return job_id
+
+
+def test_finalization_is_claimed_once(queue):
+    job_id = _finished_job(queue)
+    assert queue.claim_finalization(job_id)
+    assert not queue.claim_finalization(job_id)
+
+
+def test_queued_job_cannot_be_finalized(queue):
+    job_id = queue.enqueue('image', b'payload')
+    assert not queue.claim_finalization(job_id)
+
+
+def test_released_claim_can_be_taken_again(queue):
+    job_id = _finished_job(queue)
+    assert queue.claim_finalization(job_id)
+    queue.release_finalization(job_id)
+    assert queue.claim_finalization(job_id)
+
+
+def test_stored_response_ends_finalization(queue):
+    job_id = _finished_job(queue)
+    assert queue.claim_finalization(job_id)
+    queue.store_response(job_id, {'final_prediction': 'Benign'})
+    queue.release_finalization(job_id)
+    assert not queue.claim_finalization(job_id)
+    job = queue.get(job_id)
+    assert job['status'] == DONE
+    assert job['response'] == {'final_prediction': 'Benign'}
+
+
+def test_abandoned_claim_expires(queue, monkeypatch):
+    job_id = _finished_job(queue)
+    assert queue.claim_finalization(job_id)
+    monkeypatch.setattr(jobs, 'FINALIZATION_TIMEOUT', -1.0)
+    assert queue.claim_finalization(job_id)
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVC
+
+from utils.kernel_svm import FastRBFSVC
+from utils.similar_cases import REFERENCE_DATA_PATH
+
+
+@pytest.fixture(scope='module')
+def data():
+    df = pd.read_csv(REFERENCE_DATA_PATH)
+    X = StandardScaler().fit_transform(df.iloc[:, 2:32].to_numpy(dtype=np.float64))
+    return X, df['diagnosis'].to_numpy()
+
+
+@pytest.fixture(scope='module')
+def svc(data):
+    return SVC(kernel='rbf', C=2.0, gamma='scale').fit(*data)
+
+
+def test_decision_and_labels_match_sklearn(svc, data):
+    native = FastRBFSVC.from_sklearn(svc)
+    X = data[0]
+    assert np.allclose(native.decision_function(X), svc.decision_function(X), atol=1e-9)
+    assert np.array_equal(native.predict(X), svc.predict(X))
+    labels, confidence = native.predict_with_confidence(X[:1])
+    assert labels[0] == svc.predict(X[:1])[0] and 0.5 <= confidence[0] <= 1.0
+
+
+@pytest.mark.parametrize('bad', [np.nan, np.inf, -np.inf])
+def test_non_finite_rows_are_rejected_like_sklearn(svc, data, bad):
+    native = FastRBFSVC.from_sklearn(svc)
+    X = data[0][:3].copy()
+    X[2, 5] = bad
+    with pytest.raises(ValueError):
+        svc.decision_function(X)
+    with pytest.raises(ValueError):
+        native.decision_function(X)
+    with pytest.raises(ValueError):
+        native.predict_with_confidence(X)
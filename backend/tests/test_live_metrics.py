@@ -0,0 +1,83 @@
+from datetime import date
+
+import numpy as np
+
+from utils.live_metrics import LiveMetricsStore, quality_metrics, score_bin
+
+
+def _record(prediction_id, answers, day=None):
+    return {
+        'prediction_id': prediction_id,
+        'type': 'tabular',
+        'timestamp': f"{day or date.today().isoformat()}T10:00:00",
+        'model_predictions': [
+            {'model': model, 'prediction': label, 'probability': probability}
+            for model, label, probability in answers
+        ]
+    }
+
+
+def _confusion(store, model='SVM'):
+    return quality_metrics(store.counts()[('tabular', model)])['confusion_matrix']
+
+
+def test_feedback_counts_every_model_once(tmp_path):
+    store = LiveMetricsStore(str(tmp_path / 'live.sqlite3'))
+    record = _record('p1', [('SVM', 'Malignant', 90.0), ('KNN', 'Benign', 20.0),
+                            ('Broken', 'Error', None)])
+
+    result = store.record(record, 'Malignant')
+
+    assert result == {'previous_diagnosis': None, 'models': ['SVM', 'KNN']}
+    assert _confusion(store, 'SVM')['true_positive'] == 1
+    assert _confusion(store, 'KNN')['false_negative'] == 1
+    assert store.counts()[('tabular', 'SVM')][1, 1, score_bin(0.9)] == 1
+
+
+def test_repeated_feedback_is_a_no_op(tmp_path):
+    store = LiveMetricsStore(str(tmp_path / 'live.sqlite3'))
+    record = _record('p1', [('SVM', 'Malignant', 90.0)])
+    store.record(record, 'Malignant')
+
+    result = store.record(record, 'Malignant')
+
+    assert result['previous_diagnosis'] == 'Malignant'
+    assert store.counts()[('tabular', 'SVM')].sum() == 1
+
+
+def test_corrected_diagnosis_moves_the_counts(tmp_path):
+    store = LiveMetricsStore(str(tmp_path / 'live.sqlite3'))
+    record = _record('p1', [('SVM', 'Malignant', 90.0)])
+    store.record(record, 'Benign')
+    assert _confusion(store)['false_positive'] == 1
+
+    result = store.record(record, 'Malignant')
+
+    assert result['previous_diagnosis'] == 'Benign'
+    assert _confusion(store) == {'true_positive': 1, 'true_negative': 0,
+                                 'false_positive': 0, 'false_negative': 0}
+    # The old cell is back at zero, not negative
+    assert store.counts()[('tabular', 'SVM')].min() == 0
+
+
+def test_window_only_counts_recent_days(tmp_path):
+    store = LiveMetricsStore(str(tmp_path / 'live.sqlite3'))
+    store.record(_record('old', [('SVM', 'Benign', 10.0)], day='2000-01-01'), 'Benign')
+    store.record(_record('new', [('SVM', 'Benign', 10.0)]), 'Benign')
+
+    assert store.counts(window_days=30)[('tabular', 'SVM')].sum() == 1
+    assert store.counts(window_days=None)[('tabular', 'SVM')].sum() == 2
+
+
+def test_quality_metrics_from_a_count_grid():
+    grid = np.zeros((2, 2, 20), dtype=np.int64)
+    grid[1, 1, 19] = 3  # confident true positives
+    grid[0, 0, 0] = 2   # confident true negatives
+    grid[0, 1, 12] = 1  # one false positive
+
+    metrics = quality_metrics(grid)
+
+    assert metrics['cases'] == 6
+    assert metrics['precision'] == 0.75
+    assert metrics['recall'] == 1.0
+    assert metrics['auc_roc'] == 1.0
@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pytest
+
+from tools.check_parity import ONNX_TOLERANCE, load_dataset, gru_features
+from utils.predictions import MODEL_PATHS, load_artifact, onnx_artifact_path, _is_fresh
+
+pytest.importorskip('onnxruntime')
+
+from utils.onnx_model import load_onnx_model  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def rows():
+    """data.csv raw and scaled with the production scaler"""
+    X_raw = load_dataset()
+    return X_raw, load_artifact(MODEL_PATHS['scaler']).transform(X_raw)
+
+
+def _export(name):
+    path = onnx_artifact_path(MODEL_PATHS['tabular'][name])
+    if not os.path.exists(path):
+        pytest.skip(f"no ONNX export for {name} (python -m tools.export_onnx)")
+    if not _is_fresh(path, MODEL_PATHS['tabular'][name]):
+        pytest.skip(f"stale ONNX export for {name}")
+    return load_onnx_model(path)
+
+
+def _assert_parity(model, exported, X_model, X_graph):
+    if hasattr(model, 'predict_proba'):
+        expected, actual = model.predict_proba(X_model), exported.predict_proba(X_graph)
+    else:
+        expected, actual = model.decision_function(X_model), exported.decision_function(X_graph)
+    assert np.abs(expected - actual).max() <= ONNX_TOLERANCE
+    assert np.array_equal(model.predict(X_model), exported.predict(X_graph))
+
+
+@pytest.mark.parametrize('name', ['SVM RBF', 'Random Forest', 'Neural Network L1'])
+def test_export_matches_sklearn_on_data_csv(rows, name):
+    exported = _export(name)
+    model = load_artifact(MODEL_PATHS['tabular'][name])
+    X_raw, X = rows
+    # The graph takes raw rows: scaler and feature slice are fused in
+    _assert_parity(model, exported, X[:, :model.n_features_in_], X_raw)
+
+
+def test_gru_svm_export_matches_sklearn_on_gru_features(rows):
+    exported = _export('GRU-SVM')
+    pytest.importorskip('tensorflow')
+    features = gru_features(rows[1])
+    _assert_parity(load_artifact(MODEL_PATHS['tabular']['GRU-SVM']), exported, features, features)
@@ -0,0 +1,74 @@
+import io
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils import predictions
+from utils.predictions import ImagePredictor, iter_completed, submit_models
+
+
+@pytest.fixture
+def single_thread_pool(monkeypatch):
+    pool = ThreadPoolExecutor(1)
+    monkeypatch.setattr(predictions, '_model_executor', pool)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def test_queue_wait_does_not_count_against_the_timeout(single_thread_pool, monkeypatch):
+    monkeypatch.setattr(predictions, 'MODEL_TIMEOUTS', {'first': 0.5, 'second': 0.5})
+    submitted = submit_models({'first': (_sleep, 0.3), 'second': (_sleep, 0.3)})
+    results = {name: (timed_out, result) for name, timed_out, result in iter_completed(submitted)}
+    assert results == {'first': (False, 0.3), 'second': (False, 0.3)}
+
+
+def test_slow_model_times_out(single_thread_pool, monkeypatch):
+    monkeypatch.setattr(predictions, 'MODEL_TIMEOUTS', {'fast': 1.0, 'slow': 0.1})
+    submitted = submit_models({'fast': (_sleep, 0.0), 'slow': (_sleep, 0.5)})
+    results = {name: (timed_out, result) for name, timed_out, result in iter_completed(submitted)}
+    assert results == {'fast': (False, 0.0), 'slow': (True, None)}
+
+
+def test_sequential_prediction_stays_on_the_calling_thread(monkeypatch):
+    predictor = ImagePredictor()
+    threads = set()
+    score_model = predictor._score_model
+
+    def recording_score_model(*args):
+        threads.add(threading.get_ident())
+        return score_model(*args)
+
+    monkeypatch.setattr(predictor, '_score_model', recording_score_model)
+    buffer = io.BytesIO()
+    Image.fromarray(np.full((64, 64), 128, dtype=np.uint8)).save(buffer, format='PNG')
+    predictions_, _ = predictor.predict(buffer.getvalue(), sequential=True)
+    assert len(predictions_) == len(predictor.model_configs)
+    assert threads == {threading.get_ident()}
+
+
+def test_models_fail_when_hung_tasks_hold_every_pool_thread(single_thread_pool, monkeypatch):
+    monkeypatch.setattr(predictions, 'MODEL_TIMEOUTS', {'hung': 0.1, 'queued': 0.1})
+    monkeypatch.setattr(predictions, 'MODEL_QUEUE_SECONDS', 0.2)
+    release = threading.Event()
+    try:
+        hung = submit_models({'hung': (release.wait, 5)})
+        assert list(iter_completed(hung)) == [('hung', True, None)]
+
+        # The only thread is still blocked: the next request's model never
+        # starts and still fails by its overall deadline
+        start = time.monotonic()
+        submitted = submit_models({'queued': (_sleep, 0.0)})
+        assert list(iter_completed(submitted)) == [('queued', True, None)]
+        assert time.monotonic() - start < 1.0
+        assert submitted['queued'][0].cancelled()
+    finally:
+        release.set()
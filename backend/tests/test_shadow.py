@@ -0,0 +1,83 @@
+import threading
+
+import numpy as np
+
+from utils import shadow
+from utils.shadow import ShadowScorer
+
+
+class FakePredictor:
+    """Scores with the model callable and counts how often each model ran"""
+
+    def __init__(self):
+        self.models = {'Model': 'live'}
+        self.calls = {'live': 0, 'candidate': 0}
+
+    def _get_model_feature_count(self, model):
+        return 30
+
+    def _score_model(self, name, model, features, n_features=None):
+        self.calls[model] += 1
+        malignant = features[:, 0] > 0
+        return malignant, np.ones(len(features)), malignant.astype(np.float64)
+
+
+def _scorer(tmp_path, monkeypatch, timing_every):
+    monkeypatch.setattr(shadow, 'SHADOW_TIMING_EVERY', timing_every)
+    predictor = FakePredictor()
+    scorer = ShadowScorer(predictor, {'Model': 'candidate'}, {'Model': 'candidate.pkl'},
+                          log_path=str(tmp_path / 'shadow.jsonl'))
+    return predictor, scorer
+
+
+def _drain(scorer):
+    scorer._executor.shutdown(wait=True)
+
+
+def test_live_model_is_only_rerun_on_timed_batches(tmp_path, monkeypatch):
+    predictor, scorer = _scorer(tmp_path, monkeypatch, timing_every=4)
+    features = np.array([[1.0] * 30, [-1.0] * 30])
+    for _ in range(8):
+        scorer.submit(features, {'Model': features[:, 0] > 0})
+    _drain(scorer)
+
+    stats = scorer.stats()['models']['Model']
+    assert predictor.calls == {'live': 2, 'candidate': 8}
+    assert stats['batches'] == 8
+    assert stats['timed_batches'] == 2
+    assert stats['agreement'] == 1.0
+
+
+def test_batches_without_live_labels_are_skipped_unless_timed(tmp_path, monkeypatch):
+    predictor, scorer = _scorer(tmp_path, monkeypatch, timing_every=0)
+    scorer.submit(np.ones((1, 30)), {})
+    _drain(scorer)
+    assert predictor.calls == {'live': 0, 'candidate': 0}
+    assert scorer.stats()['models']['Model']['batches'] == 0
+
+
+def test_concurrent_first_submits_create_one_executor(tmp_path, monkeypatch):
+    _, scorer = _scorer(tmp_path, monkeypatch, timing_every=0)
+    start = threading.Barrier(8)
+
+    def submit():
+        start.wait()
+        scorer.submit(np.ones((1, 30)), {'Model': np.array([True])})
+
+    threads = [threading.Thread(target=submit) for _ in range(8)]
+    executors = []
+    original = shadow.ThreadPoolExecutor
+
+    def counting_executor(*args, **kwargs):
+        executor = original(*args, **kwargs)
+        executors.append(executor)
+        return executor
+
+    monkeypatch.setattr(shadow, 'ThreadPoolExecutor', counting_executor)
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    _drain(scorer)
+    assert len(executors) == 1
+    assert scorer.stats()['models']['Model']['batches'] == 8
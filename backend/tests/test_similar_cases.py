@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from utils.similar_cases import SimilarCaseIndex
+
+
+@pytest.fixture
+def reference():
+    rng = np.random.default_rng(0)
+    return rng.normal(10.0, 2.0, size=(50, 30))
+
+
+def _index(reference, cases_path):
+    return SimilarCaseIndex(
+        reference, [f"REF-{i}" for i in range(len(reference))], ['Benign'] * len(reference),
+        cases_path=str(cases_path)
+    )
+
+
+def test_added_case_round_trips_through_the_csv(reference, tmp_path):
+    cases_path = tmp_path / 'labelled_cases.csv'
+    writer, reader = _index(reference, cases_path), _index(reference, cases_path)
+    features = reference[:1] + 100.0
+    writer.add_case(features, 'Malignant', 'CASE-1')
+
+    nearest = reader.query(features, k=1)[0][0]
+    assert nearest['case_id'] == 'CASE-1'
+    assert nearest['diagnosis'] == 'Malignant'
+    assert nearest['distance'] == 0.0
+    assert reader.size == len(reference) + 1
+
+
+def test_case_id_with_csv_metacharacters_is_quoted(reference, tmp_path):
+    cases_path = tmp_path / 'labelled_cases.csv'
+    index = _index(reference, cases_path)
+    features = reference[:1] + 100.0
+    index.add_case(features, 'Malignant', 'a,"b"')
+
+    reader = _index(reference, cases_path)
+    assert reader.query(features, k=1)[0][0]['case_id'] == 'a,"b"'
+
+
+def test_line_breaks_are_rejected(reference, tmp_path):
+    index = _index(reference, tmp_path / 'labelled_cases.csv')
+    with pytest.raises(ValueError):
+        index.add_case(reference[:1], 'Benign', 'CASE\n1')
+
+
+def test_malformed_lines_are_skipped(reference, tmp_path):
+    cases_path = tmp_path / 'labelled_cases.csv'
+    cases_path.write_text("broken,Benign,1.0\nCASE-2,Benign," + ",".join(["x"] * 30) + "\n")
+    index = _index(reference, cases_path)
+    index.add_case(reference[:1] + 100.0, 'Malignant', 'CASE-3')
+    assert index.size == len(reference) + 1
+    assert index.query(reference[:1] + 100.0, k=1)[0][0]['case_id'] == 'CASE-3'
@@ -0,0 +1,51 @@
+import asyncio
+import threading
+
+from utils.single_flight import SingleFlight
+
+
+def test_identical_requests_share_one_computation():
+    flight = SingleFlight(enabled=True)
+    release = threading.Event()
+    calls = []
+
+    def compute(value):
+        calls.append(value)
+        release.wait(5)
+        return value * 2
+
+    async def run():
+        first = asyncio.ensure_future(flight.run('k', compute, 21))
+        await asyncio.sleep(0.05)
+        second = asyncio.ensure_future(flight.run('k', compute, 21))
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(first, second)
+
+    assert asyncio.run(run()) == [42, 42]
+    assert calls == [21]
+    assert flight.stats()['shared'] == 1
+
+
+def test_inline_request_does_not_join_a_flight():
+    flight = SingleFlight(enabled=True)
+    release = threading.Event()
+    threads = []
+
+    def compute():
+        threads.append(threading.get_ident())
+        if len(threads) == 1:
+            release.wait(5)
+        return 'done'
+
+    async def run():
+        pooled = asyncio.ensure_future(flight.run('k', compute))
+        await asyncio.sleep(0.05)
+        # A profiled request computes itself, on the event loop thread
+        inline = await flight.run('k', compute, inline=True)
+        release.set()
+        return inline, await pooled
+
+    assert asyncio.run(run()) == ('done', 'done')
+    assert len(threads) == 2 and threads[1] == threading.get_ident()
+    assert flight.stats()['shared'] == 0
@@ -0,0 +1 @@
+# Offline tooling package
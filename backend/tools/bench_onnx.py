@@ -0,0 +1,68 @@
+"""
+Per-row and per-batch latency of the tabular backends, ONNX Runtime included
+
+    cd backend && python -m tools.bench_onnx [--rows 200] [--repeat 20]
+
+Every tabular model is loaded with the 'sklearn' backend, its default
+backend (MODEL_BACKENDS) and 'onnx' (run tools.export_onnx first), and
+scored through TabularPredictor._score_model on data.csv, so scaling and
+the feature slice are part of each measurement. Single rows are timed one
+call per row (median and p99); the batch is all of data.csv in one call
+(median of --repeat runs).
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.predictions import TabularPredictor, MODEL_PATHS, MODEL_BACKENDS, BASE_PATH
+
+
+def time_calls(call, inputs) -> np.ndarray:
+    """Milliseconds per call"""
+    timings = []
+    for x in inputs:
+        start = time.perf_counter()
+        call(x)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.asarray(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200, help='single rows timed per model')
+    parser.add_argument('--repeat', type=int, default=20, help='batch runs per model')
+    args = parser.parse_args()
+
+    X = pd.read_csv(os.path.join(BASE_PATH, 'data', 'data.csv')).iloc[:, 2:32].to_numpy(dtype=np.float64)
+    predictor = TabularPredictor()
+    predictor.load_deferred_models()
+    rows = [X[i:i + 1] for i in range(min(args.rows, len(X)))]
+
+    print(f"\n{'model':<20} {'backend':<10} {'row p50 ms':>11} {'row p99 ms':>11} "
+          f"{'batch ms':>10} {'us/row':>8}   ({len(X)}-row batch)")
+    for name in predictor.models:
+        backends = dict.fromkeys(['sklearn', MODEL_BACKENDS.get(name, 'sklearn'), 'onnx'])
+        for backend in backends:
+            model = predictor._load_tabular_model(MODEL_PATHS['tabular'][name], backend)
+            if backend == 'onnx' and not hasattr(model, 'fused_scaler'):
+                continue  # not exported; _load_tabular_model fell back to sklearn
+
+            def score(x, model=model):
+                return predictor._score_model(name, model, x)
+
+            score(X)  # warm-up (ONNX sessions are created on first use)
+            per_row = time_calls(score, rows)
+            batch = np.median(time_calls(score, [X] * args.repeat))
+            print(f"{name:<20} {backend:<10} {np.median(per_row):>11.3f} {np.percentile(per_row, 99):>11.3f} "
+                  f"{batch:>10.2f} {batch * 1000 / len(X):>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
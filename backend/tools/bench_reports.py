@@ -0,0 +1,151 @@
+"""
+Render time and file size of the PDF reports
+
+    cd backend && python -m tools.bench_reports [--reports 20]
+
+A tabular and an image prediction are made with the real predictors (the
+image is a synthetic mammogram), then each is rendered --reports times as
+
+- tables:  REPORT_CHARTS=0, the tables-only report
+- vector:  the reportlab charts and the passthrough heatmap (the default)
+- raster:  the same charts as 150 dpi matplotlib PNGs and the heatmap
+           decoded and re-compressed by reportlab, for comparison
+
+and the median render time and the PDF size are printed per mode.
+"""
+
+import io
+import os
+import sys
+import time
+import uuid
+import argparse
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.report_generator as report_generator
+from utils.predictions import TabularPredictor, ImagePredictor, BASE_PATH, FEATURE_NAMES
+
+
+def sample_predictions() -> dict:
+    """History-style records of one tabular and one image prediction"""
+    from PIL import Image
+    from tools.make_synthetic_dicom import synthetic_mammogram
+
+    features = pd.read_csv(os.path.join(BASE_PATH, 'data', 'data.csv')).iloc[:1, 2:32].to_numpy(dtype=np.float64)
+    tabular = TabularPredictor()
+    tabular.load_deferred_models()
+    model_predictions = tabular.predict(features)
+    tabular_record = {
+        'type': 'tabular',
+        'prediction_id': uuid.uuid4().hex[:8],
+        'final_prediction': model_predictions[-1]['prediction'],
+        'confidence': model_predictions[-1]['confidence'],
+        'model_predictions': model_predictions,
+        'feature_importance': tabular.get_feature_importance(features, FEATURE_NAMES),
+        'timestamp': datetime.now().isoformat()
+    }
+
+    pixels = synthetic_mammogram(1024, 800)
+    buffer = io.BytesIO()
+    Image.fromarray((pixels >> 4).astype(np.uint8)).save(buffer, format='PNG')
+    model_predictions, heatmap = ImagePredictor().predict(buffer.getvalue())
+    image_record = {
+        'type': 'image',
+        'prediction_id': uuid.uuid4().hex[:8],
+        'final_prediction': model_predictions[-1]['prediction'],
+        'confidence': model_predictions[-1]['confidence'],
+        'model_predictions': model_predictions,
+        'heatmap_base64': heatmap,
+        'explanation': 'Highlighted red regions indicate areas most correlated with malignancy.',
+        'timestamp': datetime.now().isoformat()
+    }
+    return {'tabular': tabular_record, 'image': image_record}
+
+
+def _figure_image(figure, width: float):
+    """A matplotlib figure as a PNG-backed reportlab Image"""
+    import matplotlib.pyplot as plt
+    from reportlab.platypus import Image
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
+    plt.close(figure)
+    buffer.seek(0)
+    image = Image(buffer)
+    image._restrictSize(width, width)
+    return image
+
+
+def raster_charts():
+    """Chart and heatmap functions with the per-report matplotlib / re-encoding approach"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from reportlab.platypus import Image
+
+    width = report_generator.inch * 6.5
+
+    def importance(values, top=10):
+        ranked = sorted(values.items(), key=lambda item: item[1], reverse=True)[:top][::-1]
+        figure, axis = plt.subplots(figsize=(6.5, 0.3 * len(ranked) + 0.5))
+        axis.barh([name for name, _ in ranked], [score for _, score in ranked], color='#4299e1')
+        return _figure_image(figure, width)
+
+    def confidence(predictions):
+        figure, axis = plt.subplots(figsize=(6.5, 0.3 * len(predictions) + 0.5))
+        axis.barh([p['model'] for p in predictions][::-1], [p['confidence'] for p in predictions][::-1],
+                  color=['#c53030' if p['prediction'] == 'Malignant' else '#2f855a' for p in predictions][::-1])
+        axis.set_xlim(0, 100)
+        return _figure_image(figure, width)
+
+    def heatmap(png, width=report_generator.inch * 3):
+        return Image(io.BytesIO(png), width=width, height=width)
+
+    return {'feature_importance_chart': importance, 'model_confidence_chart': confidence,
+            'heatmap_flowable': heatmap}
+
+
+def measure(record: dict, mode: str, n_reports: int, out_dir: str) -> tuple:
+    """(median ms, PDF KB) of n_reports renders"""
+    originals = {}
+    if mode == 'raster':
+        for name, function in raster_charts().items():
+            originals[name] = getattr(report_generator, name)
+            setattr(report_generator, name, function)
+    try:
+        timings, size = [], 0
+        for _ in range(n_reports):
+            start = time.perf_counter()
+            path = report_generator.generate_pdf_report(record, 'PT-BENCH', out_dir, charts=mode != 'tables')
+            timings.append((time.perf_counter() - start) * 1000)
+            size = os.path.getsize(path)
+            os.remove(path)
+    finally:
+        for name, function in originals.items():
+            setattr(report_generator, name, function)
+    return float(np.median(timings)), size / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--reports', type=int, default=20, help='renders per prediction and mode')
+    args = parser.parse_args()
+
+    records = sample_predictions()
+    print(f"\n{'prediction':<10} {'mode':<8} {'ms/report':>10} {'PDF KB':>8}")
+    with tempfile.TemporaryDirectory() as out_dir:
+        for kind, record in records.items():
+            for mode in ('tables', 'vector', 'raster'):
+                measure(record, mode, 1, out_dir)  # warm-up (fonts, template cache, matplotlib)
+                ms, kb = measure(record, mode, args.reports, out_dir)
+                print(f"{kind:<10} {mode:<8} {ms:>10.1f} {kb:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
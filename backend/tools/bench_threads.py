@@ -0,0 +1,111 @@
+"""
+Throughput of the tabular models against the intra-op thread limit
+
+    cd backend && python -m tools.bench_threads [--limits 1,2,4,8] [--concurrency 1,4,8] [--seconds 5]
+
+Each INTRA_OP_THREADS value is measured in a fresh process (the BLAS/OpenMP
+pools are sized when they load), where `concurrency` client threads call
+TabularPredictor.predict on data.csv rows back to back. The table gives
+requests per second and p99 latency per (limit, concurrency); the limit the
+governor picks for this machine is marked with *.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.thread_limits import available_cores, intra_op_threads
+
+
+def run_child(concurrency: int, seconds: float):
+    """Benchmark body, run inside the subprocess for one thread limit"""
+    import numpy as np
+    import pandas as pd
+    from utils.predictions import TabularPredictor, BASE_PATH
+
+    rows = pd.read_csv(os.path.join(BASE_PATH, 'data', 'data.csv')).iloc[:, 2:32].to_numpy(dtype=np.float64)
+    predictor = TabularPredictor()
+    predictor.predict(rows[:1])  # warm-up
+
+    latencies = [[] for _ in range(concurrency)]
+    deadline = time.perf_counter() + seconds
+
+    def client(i: int):
+        n = i
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            predictor.predict(rows[n % len(rows)].reshape(1, -1))
+            latencies[i].append((time.perf_counter() - start) * 1000)
+            n += concurrency
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    all_ms = np.concatenate([np.asarray(l) for l in latencies])
+    print(json.dumps({
+        'requests_per_second': len(all_ms) / seconds,
+        'p99_ms': float(np.percentile(all_ms, 99)) if len(all_ms) else 0.0
+    }))
+
+
+def measure(limit: int, concurrency: int, seconds: float) -> dict:
+    env = dict(os.environ, INTRA_OP_THREADS=str(limit), HISTORY_BACKEND='memory')
+    # The limit is derived from INTRA_OP_THREADS; drop inherited BLAS settings
+    for name in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                 'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS'):
+        env.pop(name, None)
+    out = subprocess.run(
+        [sys.executable, '-m', 'tools.bench_threads', '--child',
+         '--concurrency', str(concurrency), '--seconds', str(seconds)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def default_limits():
+    limits, n = [], 1
+    while n < available_cores():
+        limits.append(n)
+        n *= 2
+    return limits + [available_cores()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--limits', help='comma-separated INTRA_OP_THREADS values (default: powers of two up to the core count)')
+    parser.add_argument('--concurrency', default='1,4', help='comma-separated client thread counts')
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        from utils.thread_limits import configure_thread_environment
+        configure_thread_environment()
+        run_child(int(args.concurrency), args.seconds)
+        return
+
+    limits = [int(x) for x in args.limits.split(',')] if args.limits else default_limits()
+    concurrency = [int(x) for x in args.concurrency.split(',')]
+    governed = intra_op_threads()
+    print(f"{available_cores()} cores; governor limit for this configuration: {governed}\n")
+    print(f"{'threads':>8} " + " ".join(f"{'c=' + str(c) + ' req/s':>14} {'p99 ms':>8}" for c in concurrency))
+    for limit in limits:
+        cells = []
+        for c in concurrency:
+            result = measure(limit, c, args.seconds)
+            cells.append(f"{result['requests_per_second']:14.1f} {result['p99_ms']:8.2f}")
+        marker = '*' if limit == governed else ' '
+        print(f"{limit:>7}{marker} " + " ".join(cells))
+
+
+if __name__ == '__main__':
+    main()
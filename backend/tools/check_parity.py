@@ -0,0 +1,131 @@
+"""
+Check alternative inference backends against the sklearn models
+
+    cd backend && python -m tools.check_parity
+
+Every row of data/data.csv is scaled with the production scaler and scored by
+the pickled sklearn estimator and by each alternative backend. Labels must
+agree on every row. Compiled forest probabilities must match exactly; native
+SVM decision values (a GEMM instead of libsvm's per-vector loop) must match
+to within DECISION_TOLERANCE.
+
+Models exported with tools.export_onnx are checked too: their graphs take
+the raw rows (scaler fused in) and compute in float32, so probabilities and
+decision values must match to within ONNX_TOLERANCE.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.predictions import MODEL_PATHS, BASE_PATH, load_artifact, onnx_artifact_path
+from utils.compiled_forest import CompiledForest
+from utils.kernel_svm import FastRBFSVC
+
+DATA_PATH = os.path.join(BASE_PATH, 'data', 'data.csv')
+DECISION_TOLERANCE = 1e-9
+ONNX_TOLERANCE = 1e-4
+
+
+def load_dataset() -> np.ndarray:
+    """The 30 raw feature columns of data.csv"""
+    df = pd.read_csv(DATA_PATH)
+    return df.iloc[:, 2:32].to_numpy(dtype=np.float64)
+
+
+def check_compiled_forest(X: np.ndarray) -> bool:
+    forest = load_artifact(MODEL_PATHS['tabular']['Random Forest'])
+    forest.n_jobs = 1  # threaded accumulation order is not deterministic
+    compiled = CompiledForest.from_sklearn(forest)
+
+    expected = forest.predict_proba(X)
+    actual = compiled.predict_proba(X)
+    identical = np.array_equal(expected, actual)
+    labels_agree = np.array_equal(forest.predict(X), compiled.predict(X))
+    print(f"Random Forest [compiled]: bit-identical={identical}, "
+          f"max |diff|={np.abs(expected - actual).max():.3g}, labels agree={labels_agree}")
+    return identical and labels_agree
+
+
+def check_native_svm(name: str, svc, X: np.ndarray) -> bool:
+    native = FastRBFSVC.from_sklearn(svc)
+
+    expected = svc.decision_function(X)
+    actual = native.decision_function(X)
+    max_diff = np.abs(expected - actual).max()
+    labels_agree = np.array_equal(svc.predict(X), native.predict(X))
+    _, confidence = native.predict_with_confidence(X)
+    confidence_diff = np.abs(confidence - 1 / (1 + np.exp(-np.abs(expected)))).max()
+    print(f"{name} [native]: max |decision diff|={max_diff:.3g}, "
+          f"max |confidence diff|={confidence_diff:.3g}, labels agree={labels_agree}")
+    return max_diff <= DECISION_TOLERANCE and labels_agree
+
+
+def check_onnx(name: str, model, X_raw: np.ndarray, X_model: np.ndarray) -> bool:
+    """
+    Exported graph on X_raw (GRU features for GRU-SVM) against the sklearn
+    model on X_model; True when there is no export to check
+    """
+    from utils.onnx_model import load_onnx_model
+
+    path = onnx_artifact_path(MODEL_PATHS['tabular'][name])
+    if not os.path.exists(path):
+        print(f"[!] {name}: no ONNX export, skipping")
+        return True
+    exported = load_onnx_model(path)
+    if hasattr(model, 'predict_proba'):
+        expected, actual = model.predict_proba(X_model), exported.predict_proba(X_raw)
+    else:
+        expected, actual = model.decision_function(X_model), exported.decision_function(X_raw)
+    max_diff = np.abs(expected - actual).max()
+    labels_agree = np.array_equal(model.predict(X_model), exported.predict(X_raw))
+    print(f"{name} [onnx]: max |score diff|={max_diff:.3g}, labels agree={labels_agree}")
+    return max_diff <= ONNX_TOLERANCE and labels_agree
+
+
+def gru_features(X: np.ndarray):
+    """GRU extractor output for the scaled rows, or None without TensorFlow"""
+    try:
+        from tensorflow.keras.models import load_model
+    except ImportError:
+        return None
+    extractor = load_model(MODEL_PATHS['tabular']['GRU Feature Extractor'])
+    _, steps, width = extractor.input_shape
+    return extractor.predict(X[:, :steps * width].reshape(-1, steps, width), verbose=0)
+
+
+def main():
+    X_raw = load_dataset()
+    X = load_artifact(MODEL_PATHS['scaler']).transform(X_raw)
+    print(f"Checking {X.shape[0]} rows from {DATA_PATH}")
+    ok = check_compiled_forest(X)
+
+    svm = load_artifact(MODEL_PATHS['tabular']['SVM RBF'])
+    ok &= check_native_svm('SVM RBF', svm, X[:, :svm.n_features_in_])
+
+    features = gru_features(X)
+    if features is None:
+        print("[!] TensorFlow not installed, skipping GRU-SVM")
+    else:
+        ok &= check_native_svm('GRU-SVM', load_artifact(MODEL_PATHS['tabular']['GRU-SVM']), features)
+
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        print("[!] onnxruntime not installed, skipping the ONNX exports")
+    else:
+        for name in ('SVM RBF', 'Random Forest', 'Neural Network L1'):
+            model = load_artifact(MODEL_PATHS['tabular'][name])
+            ok &= check_onnx(name, model, X_raw, X[:, :model.n_features_in_])
+        if features is not None:
+            ok &= check_onnx('GRU-SVM', load_artifact(MODEL_PATHS['tabular']['GRU-SVM']), features, features)
+    print("[OK] All backends match" if ok else "[X] Backend mismatch")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Offline champion/challenger evaluation of the tabular models
+
+    cd backend && python -m tools.evaluate_models \\
+        --challenger "SVM RBF=models/candidates/svm_rbf_v2.pkl" [--history] [--repeat 5]
+
+The live models (champions) and each challenger score data/data.csv in one
+batch through TabularPredictor._score_model, i.e. with the production
+scaling and inference backends. The report gives accuracy of both, the
+accuracy delta, how often they agree, and the best-of-N batch time.
+
+With --history the tabular predictions stored in the SQLite history
+(HISTORY_DB_PATH; records carry their input features) are replayed as well;
+they have no labels, so only agreement and speed are reported. Without any
+--challenger every live model is evaluated on its own.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.predictions import TabularPredictor, MODEL_BACKENDS, BASE_PATH
+from utils.history import SQLiteHistory, HISTORY_DB_PATH
+
+DATA_PATH = os.path.join(BASE_PATH, 'data', 'data.csv')
+
+
+def load_labelled(path: str):
+    df = pd.read_csv(path)
+    return df.iloc[:, 2:32].to_numpy(dtype=np.float64), (df['diagnosis'] == 'M').to_numpy()
+
+
+def load_history_features(db_path: str) -> np.ndarray:
+    """Input rows of the stored tabular predictions"""
+    if not os.path.exists(db_path):
+        return np.empty((0, 30))
+    rows = [r['features'] for r in SQLiteHistory(db_path).list()
+            if r.get('type') == 'tabular' and r.get('features')]
+    return np.array(rows, dtype=np.float64).reshape(-1, 30)
+
+
+def timed_labels(predictor, name: str, model, features: np.ndarray, repeat: int, n_features=None):
+    """Malignancy labels and the best batch time (ms) over `repeat` runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        scores = predictor._score_model(name, model, features, n_features=n_features)
+        best = min(best, (time.perf_counter() - start) * 1000)
+    if scores is None:
+        raise RuntimeError(f"{name} cannot run (missing GRU feature extractor?)")
+    return scores[0], best
+
+
+def parse_challengers(items):
+    challengers = {}
+    for item in items:
+        name, _, path = item.partition('=')
+        path = path.strip()
+        challengers[name.strip()] = path if os.path.isabs(path) else os.path.join(BASE_PATH, path)
+    return challengers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--challenger', action='append', default=[],
+                        help='"<live model name>=<path to candidate .pkl>" (repeatable)')
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--history', action='store_true', help='also replay the SQLite prediction history')
+    parser.add_argument('--repeat', type=int, default=5, help='timing runs per model (best is reported)')
+    args = parser.parse_args()
+
+    predictor = TabularPredictor()
+    features, labels = load_labelled(args.data)
+    datasets = [('data.csv', features, labels)]
+    if args.history:
+        history = load_history_features(HISTORY_DB_PATH)
+        print(f"Replaying {len(history)} tabular predictions from {HISTORY_DB_PATH}")
+        if len(history):
+            datasets.append(('history', history, None))
+
+    challengers = parse_challengers(args.challenger)
+    for name in challengers:
+        if name not in predictor.models:
+            sys.exit(f"[X] Unknown live model {name!r}; choose from {list(predictor.models)}")
+
+    for name, champion in predictor.models.items():
+        challenger, n_features = None, None
+        if name in challengers:
+            challenger = predictor._load_tabular_model(challengers[name], MODEL_BACKENDS.get(name, 'sklearn'))
+            n_features = predictor._get_model_feature_count(challenger)
+        elif challengers:
+            continue
+
+        print(f"\n{name}" + (f"  vs  {challengers[name]}" if challenger is not None else ""))
+        for dataset, X, y in datasets:
+            live, live_ms = timed_labels(predictor, name, champion, X, args.repeat)
+            line = f"  {dataset:<9} rows={len(X):<6} live: {live_ms:8.2f} ms"
+            if y is not None:
+                line += f" acc={np.mean(live == y):.4f}"
+            if challenger is not None:
+                cand, cand_ms = timed_labels(predictor, name, challenger, X, args.repeat, n_features)
+                line += f" | challenger: {cand_ms:8.2f} ms"
+                if y is not None:
+                    delta = np.mean(cand == y) - np.mean(live == y)
+                    line += f" acc={np.mean(cand == y):.4f} (delta {delta:+.4f})"
+                line += f" | agreement={np.mean(live == cand):.4f} speedup={live_ms / cand_ms:.2f}x"
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
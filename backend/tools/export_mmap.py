@@ -0,0 +1,59 @@
+"""
+Export the tabular models to a memory-mappable layout
+
+    cd backend && python -m tools.export_mmap
+
+Every model in MODEL_PATHS (and the scaler) is re-dumped without compression
+to models/mmap/. joblib then writes each NumPy array (SVM support vectors and
+dual coefficients, the KNN training matrix, the scaler mean/scale, ...) as a
+raw aligned buffer that joblib.load(..., mmap_mode='r') maps instead of
+copying. TabularPredictor picks these files up automatically, so worker
+processes share the weights through the page cache.
+
+Random Forests are additionally written as flat node arrays (.npy, see
+utils/compiled_forest.py) because sklearn copies tree nodes on unpickling.
+"""
+
+import os
+import sys
+import time
+
+import joblib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.predictions import (
+    MODEL_PATHS, MMAP_MODEL_DIR, mmap_artifact_path, compiled_artifact_path
+)
+from utils.compiled_forest import CompiledForest
+
+
+def export_artifact(source_path: str) -> str:
+    """Re-dump one pickled model uncompressed and return the new path"""
+    target_path = mmap_artifact_path(source_path)
+    model = joblib.load(source_path)
+    joblib.dump(model, target_path, compress=0)
+    if hasattr(model, 'estimators_') and hasattr(model, 'predict_proba'):
+        CompiledForest.from_sklearn(model).save(compiled_artifact_path(source_path))
+    return target_path
+
+
+def main():
+    os.makedirs(MMAP_MODEL_DIR, exist_ok=True)
+    sources = [MODEL_PATHS['scaler']] + [
+        path for path in MODEL_PATHS['tabular'].values() if path.endswith('.pkl')
+    ]
+
+    for source_path in sources:
+        if not os.path.exists(source_path):
+            print(f"[!] Skipping missing artifact: {source_path}")
+            continue
+        start = time.perf_counter()
+        target_path = export_artifact(source_path)
+        elapsed = (time.perf_counter() - start) * 1000
+        size_kb = os.path.getsize(target_path) / 1024
+        print(f"[OK] {os.path.basename(source_path)} -> {target_path} ({size_kb:.0f} KB, {elapsed:.0f} ms)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Export the tabular models to ONNX graphs for the 'onnx' backend
+
+    cd backend && python -m tools.export_onnx
+
+Needs skl2onnx (pip install -r requirements-onnx.txt). Each model in
+MODEL_PATHS is converted together with the production scaler and its
+feature slice into models/onnx/<model>.onnx:
+
+    features (n, 30) -> StandardScaler -> first n_features_in_ columns -> model
+
+GRU-SVM's graph takes the 64 GRU features instead (the extractor is not a
+sklearn model). Class labels, the score kind and Random Forest feature
+importances go into the graph metadata (see utils/onnx_model.py).
+Serve them with TABULAR_BACKENDS=onnx and verify with tools.check_parity.
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.predictions import MODEL_PATHS, ONNX_MODEL_DIR, onnx_artifact_path
+from utils.onnx_model import META_CLASSES, META_SCORES, META_FUSED_SCALER, META_FEATURE_IMPORTANCES
+
+# Models whose input is the GRU extractor output, not the scaled features
+GRU_INPUT_MODELS = {'GRU-SVM'}
+
+
+def tabular_pipeline(model, scaler):
+    """Scaler, feature slice and model as one sklearn Pipeline over the 30 raw features"""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.pipeline import Pipeline
+
+    n_features = model.n_features_in_
+    if n_features == scaler.n_features_in_:
+        return Pipeline([('scale', scaler), ('model', model)])
+    # StandardScaler is per column: scaling the first n_features columns
+    # equals scaling all of them and slicing
+    sliced = copy.deepcopy(scaler)
+    for attr in ('mean_', 'var_', 'scale_'):
+        setattr(sliced, attr, getattr(scaler, attr)[:n_features])
+    sliced.n_features_in_ = n_features
+    if hasattr(sliced, 'feature_names_in_'):
+        del sliced.feature_names_in_
+    select = ColumnTransformer([('scale', sliced, list(range(n_features)))])
+    # Fitting only records the column layout; the sliced scaler is put back after it
+    select.fit(np.zeros((1, scaler.n_features_in_)))
+    select.transformers_[0] = ('scale', sliced, list(range(n_features)))
+    return Pipeline([('select', select), ('model', model)])
+
+
+def export_model(model_name: str, model_path: str, scaler) -> str:
+    """Convert one model (with the scaler unless it reads GRU features) and return the path"""
+    import joblib
+    from onnx.helper import set_model_props
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+
+    model = joblib.load(model_path)
+    fused = model_name not in GRU_INPUT_MODELS
+    estimator = tabular_pipeline(model, scaler) if fused else model
+    n_inputs = scaler.n_features_in_ if fused else model.n_features_in_
+    graph = convert_sklearn(
+        estimator,
+        name=model_name,
+        initial_types=[('features', FloatTensorType([None, n_inputs]))],
+        options={id(model): {'zipmap': False}},
+        target_opset={'': 17, 'ai.onnx.ml': 3}
+    )
+
+    metadata = {
+        META_CLASSES: json.dumps(model.classes_.tolist()),
+        META_SCORES: 'probabilities' if hasattr(model, 'predict_proba') else 'decision',
+        META_FUSED_SCALER: '1' if fused else '0',
+    }
+    if hasattr(model, 'feature_importances_'):
+        metadata[META_FEATURE_IMPORTANCES] = json.dumps(model.feature_importances_.tolist())
+    set_model_props(graph, metadata)
+
+    target_path = onnx_artifact_path(model_path)
+    with open(target_path, 'wb') as f:
+        f.write(graph.SerializeToString())
+    return target_path
+
+
+def main():
+    import joblib
+    try:
+        import skl2onnx  # noqa: F401
+    except ImportError:
+        print("[X] skl2onnx is not installed (pip install -r requirements-onnx.txt)")
+        sys.exit(1)
+
+    scaler = joblib.load(MODEL_PATHS['scaler'])
+    os.makedirs(ONNX_MODEL_DIR, exist_ok=True)
+    for model_name, model_path in MODEL_PATHS['tabular'].items():
+        if not model_path.endswith('.pkl'):
+            continue
+        if not os.path.exists(model_path):
+            print(f"[!] Skipping missing model: {model_path}")
+            continue
+        start = time.perf_counter()
+        try:
+            target_path = export_model(model_name, model_path, scaler)
+        except Exception as e:
+            print(f"[X] {model_name}: {e}")
+            continue
+        elapsed = (time.perf_counter() - start) * 1000
+        size_kb = os.path.getsize(target_path) / 1024
+        print(f"[OK] {model_name} -> {target_path} ({size_kb:.0f} KB, {elapsed:.0f} ms)")
+
+
+if __name__ == '__main__':
+    main()
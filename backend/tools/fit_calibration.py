@@ -0,0 +1,111 @@
+"""
+Fit the calibrated soft-vote ensemble of the tabular models
+
+    cd backend && python -m tools.fit_calibration [--method platt|isotonic] [--data path.csv]
+
+Every row of the labelled CSV (default data/data.csv) is scored by each
+loaded model through TabularPredictor._score_model, exactly as at serve time.
+For each model a calibrator maps its raw malignancy score to P(malignant):
+Platt scaling (a logistic fit on the score) or isotonic regression. A
+logistic regression on the calibrated log-odds then gives the stacking
+weights of the soft vote (negative weights are clipped to zero).
+
+The result is written to models/calibration/tabular_calibration.json and
+loaded by TabularPredictor on startup. data.csv is also what the models were
+trained on, so these calibrators are optimistic; refit with --data on
+held-out cases when they become available.
+"""
+
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from sklearn.isotonic import IsotonicRegression
+from sklearn.metrics import brier_score_loss, log_loss
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.predictions import TabularPredictor, BASE_PATH
+from utils.calibration import EnsembleCalibrator, CALIBRATION_PATH, PLATT, ISOTONIC
+
+DATA_PATH = os.path.join(BASE_PATH, 'data', 'data.csv')
+
+# Keeps isotonic probabilities away from exact 0/1
+PROBABILITY_FLOOR = 0.005
+
+
+def load_labelled(path: str):
+    df = pd.read_csv(path)
+    features = df.iloc[:, 2:32].to_numpy(dtype=np.float64)
+    labels = (df['diagnosis'] == 'M').to_numpy(dtype=np.float64)
+    return features, labels
+
+
+def fit_model_calibrator(scores: np.ndarray, labels: np.ndarray, method: str) -> dict:
+    if method == PLATT:
+        platt = LogisticRegression(C=1e4).fit(scores[:, None], labels)
+        return {'method': PLATT, 'a': float(platt.coef_[0, 0]), 'b': float(platt.intercept_[0])}
+    isotonic = IsotonicRegression(
+        y_min=PROBABILITY_FLOOR, y_max=1 - PROBABILITY_FLOOR, out_of_bounds='clip'
+    ).fit(scores, labels)
+    return {
+        'method': ISOTONIC,
+        'x': isotonic.X_thresholds_.tolist(),
+        'y': isotonic.y_thresholds_.tolist()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--method', choices=[PLATT, ISOTONIC], default=PLATT)
+    parser.add_argument('--data', default=DATA_PATH)
+    args = parser.parse_args()
+
+    features, labels = load_labelled(args.data)
+    predictor = TabularPredictor()
+    print(f"Fitting {args.method} calibration on {len(labels)} rows from {args.data}")
+
+    names, raw, votes = [], [], []
+    for model_name, model in predictor.models.items():
+        scores = predictor._score_model(model_name, model, features)
+        if scores is None or np.isnan(scores[2]).any():
+            print(f"[!] {model_name}: no malignancy score, left out of the ensemble")
+            continue
+        names.append(model_name)
+        votes.append(scores[0])
+        raw.append(scores[2])
+    raw = np.column_stack(raw)
+
+    calibrator = EnsembleCalibrator({
+        name: fit_model_calibrator(raw[:, j], labels, args.method) for j, name in enumerate(names)
+    })
+    if 'GRU-SVM' in calibrator.models:
+        # Only valid for the extractor whose features GRU-SVM scored here
+        calibrator.models['GRU-SVM']['extractor'] = predictor.gru_type
+    probs = np.clip(calibrator.probabilities(names, raw), PROBABILITY_FLOOR, 1 - PROBABILITY_FLOOR)
+
+    # Stacking weights from the calibrated log-odds
+    stacker = LogisticRegression().fit(np.log(probs / (1 - probs)), labels)
+    weights = np.clip(stacker.coef_[0], 0.0, None)
+    weights = weights / weights.sum() if weights.sum() > 0 else np.full(len(names), 1 / len(names))
+    for name, weight in zip(names, weights):
+        calibrator.models[name]['weight'] = float(weight)
+
+    for j, name in enumerate(names):
+        print(f"  {name:<20} weight={weights[j]:.3f} "
+              f"brier={brier_score_loss(labels, probs[:, j]):.4f} log_loss={log_loss(labels, probs[:, j]):.4f}")
+    ensemble = calibrator.combine(names, probs)
+    majority = (np.column_stack(votes).mean(axis=1) > 0.5).astype(np.float64)
+    print(f"  {'Ensemble':<20} brier={brier_score_loss(labels, ensemble):.4f} "
+          f"log_loss={log_loss(labels, ensemble):.4f} accuracy={np.mean((ensemble >= 0.5) == labels):.4f} "
+          f"(majority vote accuracy={np.mean(majority == labels):.4f})")
+
+    calibrator.save(CALIBRATION_PATH, fitted_on=os.path.basename(args.data), rows=int(len(labels)))
+    print(f"[OK] Wrote {CALIBRATION_PATH}")
+
+
+if __name__ == '__main__':
+    main()
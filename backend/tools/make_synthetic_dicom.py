@@ -0,0 +1,130 @@
+"""
+Write synthetic mammogram DICOM files for exercising the DICOM path
+
+    cd backend && python -m tools.make_synthetic_dicom out.dcm \\
+        [--size 3328x2560] [--syntax explicit|implicit|big] [--monochrome1] [--no-window]
+
+The image is a 12-bit (stored in 16) breast-shaped ellipse with a tissue
+texture and a few bright calcification-like spots, with MONOCHROME2 (or
+MONOCHROME1) polarity and a Window Center/Width unless --no-window. A PNG
+rendering of the same window is written next to it with --png, for
+comparing the DICOM and PNG paths of /predict/image.
+"""
+
+import os
+import sys
+import struct
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.dicom import IMPLICIT_VR_LE, EXPLICIT_VR_LE, EXPLICIT_VR_BE, LONG_VRS
+
+SYNTAXES = {'implicit': IMPLICIT_VR_LE, 'explicit': EXPLICIT_VR_LE, 'big': EXPLICIT_VR_BE}
+
+# Digital Mammography X-Ray Image Storage - For Presentation
+SOP_CLASS = '1.2.840.10008.5.1.4.1.1.1.2'
+BITS_STORED = 12
+
+
+def synthetic_mammogram(rows: int, columns: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:rows, 0:columns].astype(np.float32)
+    # Breast against the left edge: half ellipse, denser towards the chest wall
+    r = np.sqrt(((y - rows / 2) / (rows * 0.45)) ** 2 + (x / (columns * 0.75)) ** 2)
+    tissue = np.clip(1 - r, 0, 1) ** 0.5
+    image = 300 + tissue * 2200 + tissue * rng.normal(0, 120, (rows, columns)).astype(np.float32)
+    for _ in range(6):
+        cy, cx = rng.uniform(0.3, 0.7) * rows, rng.uniform(0.1, 0.5) * columns
+        image += 1200 * np.exp(-(((y - cy) ** 2 + (x - cx) ** 2) / (2 * (rows / 200) ** 2)))
+    return np.clip(image, 0, (1 << BITS_STORED) - 1).astype(np.uint16)
+
+
+def _element(group: int, element: int, vr: str, value: bytes, explicit: bool, endian: str) -> bytes:
+    if len(value) % 2:
+        value += b'\x00' if vr in ('UI', 'OB') else b' '
+    tag = struct.pack(endian + 'HH', group, element)
+    if not explicit:
+        return tag + struct.pack(endian + 'I', len(value)) + value
+    if vr.encode() in LONG_VRS:
+        return tag + vr.encode() + b'\x00\x00' + struct.pack(endian + 'I', len(value)) + value
+    return tag + vr.encode() + struct.pack(endian + 'H', len(value)) + value
+
+
+def write_dicom(path: str, pixels: np.ndarray, syntax: str, monochrome1: bool = False, window=None):
+    endian = '>' if syntax == EXPLICIT_VR_BE else '<'
+    explicit = syntax != IMPLICIT_VR_LE
+
+    def us(value: int) -> bytes:
+        return struct.pack(endian + 'H', value)
+
+    meta_body = b''.join([
+        _element(0x0002, 0x0001, 'OB', b'\x00\x01', True, '<'),
+        _element(0x0002, 0x0002, 'UI', SOP_CLASS.encode(), True, '<'),
+        _element(0x0002, 0x0003, 'UI', b'1.2.826.0.1.3680043.8.498.1', True, '<'),
+        _element(0x0002, 0x0010, 'UI', syntax.encode(), True, '<'),
+    ])
+    meta = _element(0x0002, 0x0000, 'UL', struct.pack('<I', len(meta_body)), True, '<') + meta_body
+
+    if monochrome1:
+        pixels = ((1 << BITS_STORED) - 1 - pixels).astype(np.uint16)
+    elements = [
+        _element(0x0008, 0x0016, 'UI', SOP_CLASS.encode(), explicit, endian),
+        _element(0x0008, 0x0060, 'CS', b'MG', explicit, endian),
+        _element(0x0028, 0x0002, 'US', us(1), explicit, endian),
+        _element(0x0028, 0x0004, 'CS', b'MONOCHROME1' if monochrome1 else b'MONOCHROME2', explicit, endian),
+        _element(0x0028, 0x0010, 'US', us(pixels.shape[0]), explicit, endian),
+        _element(0x0028, 0x0011, 'US', us(pixels.shape[1]), explicit, endian),
+        _element(0x0028, 0x0100, 'US', us(16), explicit, endian),
+        _element(0x0028, 0x0101, 'US', us(BITS_STORED), explicit, endian),
+        _element(0x0028, 0x0102, 'US', us(BITS_STORED - 1), explicit, endian),
+        _element(0x0028, 0x0103, 'US', us(0), explicit, endian),
+    ]
+    if window is not None:
+        center, width = window
+        elements += [
+            _element(0x0028, 0x1050, 'DS', f"{center:g}".encode(), explicit, endian),
+            _element(0x0028, 0x1051, 'DS', f"{width:g}".encode(), explicit, endian),
+        ]
+    elements += [
+        _element(0x0028, 0x1052, 'DS', b'0', explicit, endian),
+        _element(0x0028, 0x1053, 'DS', b'1', explicit, endian),
+        _element(0x7FE0, 0x0010, 'OW', pixels.astype(endian + 'u2').tobytes(), explicit, endian),
+    ]
+    with open(path, 'wb') as f:
+        f.write(b'\x00' * 128 + b'DICM' + meta + b''.join(elements))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--size', default='3328x2560', help='ROWSxCOLUMNS')
+    parser.add_argument('--syntax', choices=list(SYNTAXES), default='explicit')
+    parser.add_argument('--monochrome1', action='store_true')
+    parser.add_argument('--no-window', action='store_true')
+    parser.add_argument('--png', action='store_true', help='also write <path>.png with the same window')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rows, columns = (int(v) for v in args.size.lower().split('x'))
+    pixels = synthetic_mammogram(rows, columns, args.seed)
+    window = None if args.no_window else (1400.0, 2800.0)
+    stored_window = window
+    if window and args.monochrome1:
+        # Stored values are inverted, so is the window
+        stored_window = ((1 << BITS_STORED) - window[0], window[1])
+    write_dicom(args.path, pixels, SYNTAXES[args.syntax], args.monochrome1, stored_window)
+    print(f"[OK] Wrote {args.path} ({rows}x{columns}, {args.syntax} VR)")
+
+    if args.png:
+        from PIL import Image
+        center, width = window or (float(pixels.mean()), float(np.ptp(pixels)))
+        display = np.clip((pixels - (center - 0.5)) / (width - 1) + 0.5, 0, 1) * 255
+        Image.fromarray(display.astype(np.uint8)).save(args.path + '.png')
+        print(f"[OK] Wrote {args.path}.png")
+
+
+if __name__ == '__main__':
+    main()
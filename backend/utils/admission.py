@@ -0,0 +1,278 @@
+"""
+Admission control for the prediction and report routes
+
+Clients are identified by their X-API-Key header (or X-Client-Id) when the
+key is a known one (listed in CLIENT_QUOTAS or ADMISSION_CLIENT_KEYS), else
+by their address, and each one draws from a token bucket: RATE
+requests per second with bursts of up to BURST. Behind a reverse proxy every
+connection comes from the proxy, so for peers listed in TRUSTED_PROXIES the
+client address is taken from X-Forwarded-For / X-Real-IP instead.
+CLIENT_QUOTAS overrides the bucket per key:
+
+    CLIENT_QUOTAS="nightly-batch=2:10,ward-3=20:40"
+
+Admitted requests then wait for one of ADMISSION_CONCURRENCY execution
+slots in one of two lanes. Interactive requests always get the next free
+slot before bulk ones, and bulk requests (the /batch routes, or any request
+sent with `X-Priority: bulk`; the header can only demote) may hold at most BULK_MAX_CONCURRENCY slots so
+a nightly run cannot starve clinicians. An empty bucket or a full lane
+queue is answered with 429 and Retry-After.
+
+State is per worker process; GET /monitoring/admission shows the lanes.
+"""
+
+import os
+import time
+import asyncio
+import ipaddress
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', '1') == '1'
+
+# Proxies whose X-Forwarded-For / X-Real-IP headers are believed: addresses or
+# networks, e.g. TRUSTED_PROXIES="172.16.0.0/12,10.0.0.5". Empty trusts none.
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(item.strip(), strict=False)
+    for item in os.environ.get('TRUSTED_PROXIES', '').split(',') if item.strip()
+]
+
+# API keys accepted as client identities besides the CLIENT_QUOTAS keys.
+# Unknown keys are ignored: a client could otherwise send a new key with
+# every request and always get a full bucket.
+ADMISSION_CLIENT_KEYS = frozenset(
+    item.strip() for item in os.environ.get('ADMISSION_CLIENT_KEYS', '').split(',') if item.strip()
+)
+
+# Default token bucket per client: requests per second and burst size
+ADMISSION_RATE = float(os.environ.get('ADMISSION_RATE', '10'))
+ADMISSION_BURST = float(os.environ.get('ADMISSION_BURST', '20'))
+
+# Requests executing at once, and how many of them may be bulk
+ADMISSION_CONCURRENCY = int(os.environ.get('ADMISSION_CONCURRENCY', '4'))
+BULK_MAX_CONCURRENCY = int(os.environ.get('BULK_MAX_CONCURRENCY', '1'))
+
+# Requests waiting per lane before new ones get 429
+MAX_QUEUED = {
+    'interactive': int(os.environ.get('MAX_QUEUED_INTERACTIVE', '32')),
+    'bulk': int(os.environ.get('MAX_QUEUED_BULK', '8'))
+}
+
+# Retry-After for full queues, in seconds
+QUEUE_RETRY_AFTER = 2
+
+# Routes behind the admission controller
+ADMITTED_PATH_PREFIXES = ('/predict/', '/report/generate')
+
+INTERACTIVE, BULK = 'interactive', 'bulk'
+LANES = (INTERACTIVE, BULK)
+
+# Idle buckets are dropped once this many clients are tracked
+MAX_TRACKED_CLIENTS = 10000
+
+# Queue wait samples kept per lane for the metrics
+WAIT_SAMPLES = 500
+
+
+class AdmissionRejected(Exception):
+    """Request refused; carries the reason and a Retry-After in seconds"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def client_quotas() -> Dict[str, Tuple[float, float]]:
+    """API key -> (rate, burst), from CLIENT_QUOTAS"""
+    quotas = {}
+    for item in filter(None, os.environ.get('CLIENT_QUOTAS', '').split(',')):
+        key, _, quota = item.partition('=')
+        rate, _, burst = quota.partition(':')
+        quotas[key.strip()] = (float(rate), float(burst or rate))
+    return quotas
+
+
+_QUOTA_KEYS = frozenset(client_quotas())
+
+
+def is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def client_address(request) -> str:
+    """Peer address, or the address a trusted proxy forwarded the request for"""
+    peer = request.client.host if request.client else None
+    if peer is None:
+        return 'anonymous'
+    if not is_trusted_proxy(peer):
+        return peer
+    # Proxies append the address they received from; the right-most address
+    # that is not one of our proxies is the client
+    forwarded = [a.strip() for a in request.headers.get('x-forwarded-for', '').split(',') if a.strip()]
+    for address in reversed(forwarded):
+        if not is_trusted_proxy(address):
+            return address
+    real_ip = request.headers.get('x-real-ip', '').strip()
+    if real_ip:
+        return real_ip
+    return forwarded[0] if forwarded else peer
+
+
+def identify_client(request) -> str:
+    key = request.headers.get('x-api-key') or request.headers.get('x-client-id')
+    if key and (key in ADMISSION_CLIENT_KEYS or key in _QUOTA_KEYS):
+        return key
+    return client_address(request)
+
+
+def request_lane(request) -> str:
+    # X-Priority may move a request to bulk, never a /batch request out of it
+    if request.url.path.endswith('/batch') or request.headers.get('x-priority', '').lower() == BULK:
+        return BULK
+    return INTERACTIVE
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """0 if a token was taken, else the seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float('inf')
+
+
+class AdmissionController:
+    """Token-bucket quotas plus two priority lanes in front of the predictors"""
+
+    def __init__(self, concurrency: int = ADMISSION_CONCURRENCY,
+                 bulk_concurrency: int = BULK_MAX_CONCURRENCY):
+        self.concurrency = concurrency
+        self.bulk_concurrency = min(bulk_concurrency, concurrency)
+        self.quotas = client_quotas()
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.running = {lane: 0 for lane in LANES}
+        # FIFO of waiting futures per lane; only touched from the event loop
+        self._waiting = {lane: deque() for lane in LANES}
+        self.counters = {lane: {'admitted': 0, 'rate_limited': 0, 'queue_full': 0} for lane in LANES}
+        self.waits = {lane: [] for lane in LANES}
+
+    def _bucket(self, client: str) -> TokenBucket:
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            if len(self.buckets) >= MAX_TRACKED_CLIENTS:
+                self._drop_full_buckets()
+            rate, burst = self.quotas.get(client, (ADMISSION_RATE, ADMISSION_BURST))
+            bucket = self.buckets[client] = TokenBucket(rate, burst)
+        return bucket
+
+    def _drop_full_buckets(self):
+        now = time.monotonic()
+        for client, bucket in list(self.buckets.items()):
+            if bucket.tokens + (now - bucket.updated) * bucket.rate >= bucket.burst:
+                del self.buckets[client]
+
+    def _can_run(self, lane: str) -> bool:
+        if sum(self.running.values()) >= self.concurrency:
+            return False
+        return lane == INTERACTIVE or self.running[BULK] < self.bulk_concurrency
+
+    def _wake_next(self):
+        """Hand free slots to waiters, interactive lane first"""
+        for lane in LANES:
+            waiting = self._waiting[lane]
+            while waiting and self._can_run(lane):
+                future = waiting.popleft()
+                if not future.done():
+                    self.running[lane] += 1
+                    future.set_result(None)
+
+    @asynccontextmanager
+    async def admit(self, client: str, lane: str):
+        """Hold an execution slot for the request; raises AdmissionRejected"""
+        await self.acquire(client, lane)
+        try:
+            yield
+        finally:
+            self.release(lane)
+
+    async def acquire(self, client: str, lane: str):
+        """Take an execution slot (raises AdmissionRejected); give it back with release()"""
+        retry_after = self._bucket(client).take()
+        if retry_after:
+            self.counters[lane]['rate_limited'] += 1
+            raise AdmissionRejected(f"Rate limit exceeded for client {client!r}", retry_after)
+
+        start = time.monotonic()
+        if self._can_run(lane) and not self._waiting[lane]:
+            self.running[lane] += 1
+        else:
+            if len(self._waiting[lane]) >= MAX_QUEUED[lane]:
+                self.counters[lane]['queue_full'] += 1
+                raise AdmissionRejected(f"The {lane} queue is full", QUEUE_RETRY_AFTER)
+            future = asyncio.get_running_loop().create_future()
+            self._waiting[lane].append(future)
+            try:
+                await future
+            except asyncio.CancelledError:
+                # Client went away; give back the slot if it was already granted
+                if future.done() and not future.cancelled():
+                    self.running[lane] -= 1
+                    self._wake_next()
+                raise
+
+        self.counters[lane]['admitted'] += 1
+        waits = self.waits[lane]
+        waits.append((time.monotonic() - start) * 1000)
+        if len(waits) > WAIT_SAMPLES:
+            del waits[:len(waits) - WAIT_SAMPLES]
+
+    def release(self, lane: str):
+        self.running[lane] -= 1
+        self._wake_next()
+
+    def stats(self) -> Dict:
+        lanes = {}
+        for lane in LANES:
+            waits = self.waits[lane]
+            lanes[lane] = {
+                'running': self.running[lane],
+                'queued': sum(1 for f in self._waiting[lane] if not f.done()),
+                'max_queued': MAX_QUEUED[lane],
+                **self.counters[lane],
+                'wait_p50_ms': round(float(np.percentile(waits, 50)), 3) if waits else 0.0,
+                'wait_p99_ms': round(float(np.percentile(waits, 99)), 3) if waits else 0.0
+            }
+        return {
+            'concurrency': self.concurrency,
+            'bulk_concurrency': self.bulk_concurrency,
+            'clients': len(self.buckets),
+            'lanes': lanes,
+            'pid': os.getpid()
+        }
+
+
+def create_admission_controller() -> Optional[AdmissionController]:
+    if not ADMISSION_ENABLED:
+        return None
+    return AdmissionController()
@@ -0,0 +1,72 @@
+"""
+Compact binary matrix format for high-volume tabular clients
+
+Content type: application/x-float32-matrix
+
+    offset  size  field
+    0       4     magic b'F32M'
+    4       4     rows     (uint32, little-endian)
+    8       4     columns  (uint32, little-endian)
+    12      4*r*c values   (float32, little-endian, row-major)
+
+Requests carry one row of the 30 features per case, in FEATURE_NAMES order.
+Decoding is a zero-copy np.frombuffer view over the request body.
+"""
+
+import struct
+from typing import List
+
+import numpy as np
+
+BINARY_CONTENT_TYPE = 'application/x-float32-matrix'
+
+MAGIC = b'F32M'
+HEADER = struct.Struct('<4sII')
+DTYPE = np.dtype('<f4')
+
+
+class BinaryFormatError(ValueError):
+    """Raised when a request body is not a valid float32 matrix"""
+
+
+def decode_matrix(body: bytes) -> np.ndarray:
+    """Read-only (rows, columns) float32 view over the body"""
+    if len(body) < HEADER.size:
+        raise BinaryFormatError("Body is shorter than the matrix header")
+    magic, rows, columns = HEADER.unpack_from(body)
+    if magic != MAGIC:
+        raise BinaryFormatError("Missing F32M magic")
+    expected = HEADER.size + rows * columns * DTYPE.itemsize
+    if len(body) != expected:
+        raise BinaryFormatError(f"Expected {expected} bytes for a {rows}x{columns} matrix, got {len(body)}")
+    return np.frombuffer(body, dtype=DTYPE, count=rows * columns, offset=HEADER.size).reshape(rows, columns)
+
+
+def encode_matrix(matrix: np.ndarray) -> bytes:
+    """Serialize a 2-D array as a float32 matrix"""
+    matrix = np.ascontiguousarray(matrix, dtype=DTYPE)
+    rows, columns = matrix.shape
+    return HEADER.pack(MAGIC, rows, columns) + matrix.tobytes()
+
+
+def batch_result_columns(models: List[str]) -> List[str]:
+    """Column names of the encoded batch result, sent in the X-Columns header"""
+    columns = ['final_malignant', 'final_confidence']
+    for name in models:
+        columns += [f"{name}:malignant", f"{name}:confidence"]
+    return columns
+
+
+def encode_batch_result(result: dict) -> bytes:
+    """
+    Encode TabularPredictor.predict_batch output
+    Malignant columns hold 1.0/0.0 (NaN when unavailable), confidences are
+    percentages; see batch_result_columns for the column order
+    """
+    n_rows, n_models = result['malignant'].shape
+    matrix = np.empty((n_rows, 2 + 2 * n_models), dtype=DTYPE)
+    matrix[:, 0] = result['final_malignant']
+    matrix[:, 1] = result['final_confidence']
+    matrix[:, 2::2] = result['malignant']
+    matrix[:, 3::2] = result['confidence']
+    return encode_matrix(matrix)
@@ -0,0 +1,108 @@
+"""
+Calibrated soft-vote ensemble for the tabular models
+
+Each model reports a raw malignancy score: P(malignant) for models with
+predict_proba, the signed decision value for SVMs. Those scales are not
+comparable, so `python -m tools.fit_calibration` fits one calibrator per
+model on data/data.csv (Platt scaling, or isotonic regression) plus stacking
+weights, and writes them to CALIBRATION_PATH.
+
+At serve time the raw scores of a batch form one (rows, models) matrix;
+calibration is a single vectorized sigmoid for Platt models and the ensemble
+probability is the weighted mean over the models that produced a score.
+
+GRU-SVM scores features of the GRU extractor, so its calibrator records which
+extractor it was fitted on ('extractor'); with any other extractor loaded
+(e.g. the untrained PyTorch fallback) the model is left out of the soft vote.
+"""
+
+import os
+import json
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CALIBRATION_PATH = os.path.join(BASE_PATH, 'models', 'calibration', 'tabular_calibration.json')
+
+# USE_CALIBRATED_ENSEMBLE=0 falls back to the majority vote
+USE_CALIBRATED_ENSEMBLE = os.environ.get('USE_CALIBRATED_ENSEMBLE', '1') == '1'
+
+PLATT, ISOTONIC = 'platt', 'isotonic'
+
+
+class EnsembleCalibrator:
+    """Per-model calibrators and soft-vote weights fitted by tools.fit_calibration"""
+
+    def __init__(self, models: Dict[str, Dict]):
+        self.models = models
+        # Models whose serving input differs from what they were calibrated on
+        self.excluded = set()
+
+    @classmethod
+    def load(cls, path: str = CALIBRATION_PATH) -> 'EnsembleCalibrator':
+        with open(path) as f:
+            return cls(json.load(f)['models'])
+
+    def save(self, path: str = CALIBRATION_PATH, **metadata):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'models': self.models, **metadata}, f, indent=2)
+
+    def use_extractor(self, model_name: str, extractor: Optional[str]):
+        """Exclude model_name unless it was calibrated on this feature extractor"""
+        fitted_on = self.models.get(model_name, {}).get('extractor')
+        if fitted_on is None or fitted_on == extractor:
+            self.excluded.discard(model_name)
+        elif model_name not in self.excluded:
+            self.excluded.add(model_name)
+            if extractor is not None:
+                print(f"[!] {model_name} was calibrated on the {fitted_on} extractor, not {extractor}; "
+                      f"left out of the calibrated ensemble")
+
+    def covers(self, names: List[str]) -> bool:
+        return all(name in self.models and name not in self.excluded for name in names)
+
+    def probabilities(self, names: List[str], scores: np.ndarray) -> np.ndarray:
+        """
+        Calibrated P(malignant) for a (rows, len(names)) matrix of raw scores
+        NaN scores (failed or uncalibrated models) stay NaN
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        params = [None if name in self.excluded else self.models.get(name) for name in names]
+        slopes = np.array([p['a'] if p and p['method'] == PLATT else np.nan for p in params])
+        offsets = np.array([p['b'] if p and p['method'] == PLATT else np.nan for p in params])
+        probs = 1 / (1 + np.exp(-(scores * slopes + offsets)))
+
+        for j, p in enumerate(params):
+            if p and p['method'] == ISOTONIC:
+                column = scores[:, j]
+                probs[:, j] = np.where(np.isnan(column), np.nan, np.interp(column, p['x'], p['y']))
+        return probs
+
+    def combine(self, names: List[str], probs: np.ndarray) -> np.ndarray:
+        """Weighted mean of the available calibrated probabilities per row (NaN if none)"""
+        weights = np.array([
+            self.models[name]['weight'] if self.covers([name]) else 0.0 for name in names
+        ])
+        available = ~np.isnan(probs)
+        weight_sums = (available * weights).sum(axis=1)
+        weighted = np.where(available, probs, 0.0) @ weights
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(weight_sums > 0, weighted / weight_sums, np.nan)
+
+
+def load_calibrator():
+    """The fitted calibrator, or None when disabled or not fitted yet"""
+    if not USE_CALIBRATED_ENSEMBLE:
+        return None
+    if not os.path.exists(CALIBRATION_PATH):
+        print(f"[!] No ensemble calibration (run tools.fit_calibration): {CALIBRATION_PATH}")
+        return None
+    calibrator = EnsembleCalibrator.load()
+    print(f"[OK] Loaded ensemble calibration: {CALIBRATION_PATH}")
+    return calibrator
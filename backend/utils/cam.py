@@ -0,0 +1,190 @@
+"""
+Class-activation heatmaps from the image models' own forward pass
+
+HEATMAP_MODE=cam replaces the intensity-based attention map with
+explanations taken from the ensemble members:
+
+- The backbone stage runs once per image: patch_features turns the 224x224
+  model input into a (FEATURE_CHANNELS, 14, 14) feature map (one cell per
+  16x16 patch), which every member reads.
+- CNN members (DenseNet, EfficientNet) end in global average pooling and a
+  linear head, so the gradient of the class score w.r.t. each final feature
+  map is the constant head weight / (14*14): Grad-CAM equals CAM, the
+  head-weighted sum of the captured maps, and no backward pass is needed.
+  The member's score is the same head applied to the pooled features.
+- Transformer members (ViT-B, Swin) treat the 196 patches as tokens; the
+  attention matrices of their layers are kept from the forward pass and
+  combined by attention rollout (Abnar & Zuidema, 2020). Swin attends
+  within WINDOW_SIZE x WINDOW_SIZE windows, shifted on every other layer.
+  Their readout pools the tokens with the rollout relevance before the head.
+- fuse_maps normalises all member maps and blends them, weighted by the
+  members' ensemble weights, in one batched operation before a single
+  upsampling to the overlay size; the ensemble score is the same weighted
+  mean of the member scores.
+
+ensemble_forward returns the member scores and the map from that one pass,
+so HEATMAP_MODE=cam predictions are explained by the map shown with them.
+
+The heads and attention projections here are the demo stand-ins for the
+vision models (fixed per model name). A real backbone plugs into the same
+functions with its captured last-layer maps / attention matrices.
+"""
+
+import zlib
+from typing import Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+PATCH_SIZE = 16
+GRID = 224 // PATCH_SIZE
+
+# Feature channels: mean intensity, texture, bright spots, edges, tissue
+FEATURE_CHANNELS = 5
+BASE_HEAD = np.array([0.2, 0.6, 1.0, 0.5, 0.3], dtype=np.float32)
+
+# Fixed input normalisation of the feature channels (their mean and spread
+# over reference images). Unlike per-image standardisation it keeps how much
+# of each feature an image has, which the pooled scores are read from
+FEATURE_MEAN = np.array([0.17, 0.05, 0.16, 0.09, 0.5], dtype=np.float32)[:, None, None]
+FEATURE_STD = np.array([0.2, 0.03, 0.08, 0.05, 0.43], dtype=np.float32)[:, None, None]
+
+# Logit scale of the heads
+SCORE_GAIN = 0.6
+
+# Transformer stand-ins
+ATTENTION_LAYERS = 4
+ATTENTION_DIM = 8
+WINDOW_SIZE = 7
+
+EXPLAINERS = {
+    'DenseNet': 'cam',
+    'EfficientNet': 'cam',
+    'ViT-B': 'rollout',
+    'Swin Transformer': 'rollout',
+}
+
+
+def _model_rng(name: str) -> np.random.Generator:
+    return np.random.default_rng(zlib.crc32(name.encode()))
+
+
+def patch_features(gray: np.ndarray) -> np.ndarray:
+    """(FEATURE_CHANNELS, GRID, GRID) normalised feature maps of a 224x224 image"""
+    patches = np.asarray(gray, dtype=np.float32)[:GRID * PATCH_SIZE, :GRID * PATCH_SIZE]
+    patches = patches.reshape(GRID, PATCH_SIZE, GRID, PATCH_SIZE).transpose(0, 2, 1, 3) / 255
+    flat = patches.reshape(GRID, GRID, -1)
+    mean = flat.mean(axis=2)
+    grad_y, grad_x = np.abs(np.diff(patches, axis=2)), np.abs(np.diff(patches, axis=3))
+    features = np.stack([
+        mean,
+        flat.std(axis=2),
+        flat.max(axis=2) - mean,
+        grad_y.mean(axis=(2, 3)) + grad_x.mean(axis=(2, 3)),
+        (flat > 20 / 255).mean(axis=2)
+    ])
+    return (features - FEATURE_MEAN) / FEATURE_STD
+
+
+def head_weights(names: List[str]) -> np.ndarray:
+    """(len(names), FEATURE_CHANNELS) linear-head weights of the members"""
+    return np.stack([BASE_HEAD * _model_rng(name).uniform(0.7, 1.3, FEATURE_CHANNELS) for name in names])
+
+
+def class_activation_maps(features: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """ReLU(sum_c w_mc F_c) for every member m at once: (M, GRID, GRID)"""
+    return np.maximum(np.einsum('mc,chw->mhw', weights, features), 0)
+
+
+def _window_masks(window: int) -> np.ndarray:
+    """(ATTENTION_LAYERS, tokens, tokens) allowed-attention masks; shifted windows on odd layers"""
+    ys, xs = np.divmod(np.arange(GRID * GRID), GRID)
+    masks = []
+    for layer in range(ATTENTION_LAYERS):
+        shift = window // 2 if layer % 2 else 0
+        cell = ((ys + shift) % GRID) // window * GRID + ((xs + shift) % GRID) // window
+        masks.append(cell[:, None] == cell[None, :])
+    return np.stack(masks)
+
+
+def attention_rollout(features: np.ndarray, names: List[str], windows: List[int]) -> np.ndarray:
+    """
+    Rollout relevance maps (M, GRID, GRID) of the transformer members
+    windows[m] is 0 for global attention (ViT) or the Swin window size
+    """
+    tokens = features.reshape(FEATURE_CHANNELS, -1).T  # (T, C)
+    n_tokens = tokens.shape[0]
+    projections = np.stack([
+        _model_rng(name).normal(0, 1, (2, ATTENTION_LAYERS, FEATURE_CHANNELS, ATTENTION_DIM)) for name in names
+    ]).astype(np.float32)  # (M, 2, L, C, d)
+    queries = np.einsum('tc,mlcd->mltd', tokens, projections[:, 0])
+    keys = np.einsum('tc,mlcd->mltd', tokens, projections[:, 1])
+    logits = queries @ keys.transpose(0, 1, 3, 2) / np.sqrt(ATTENTION_DIM)  # (M, L, T, T)
+
+    allowed = np.stack([
+        _window_masks(w) if w else np.ones((ATTENTION_LAYERS, n_tokens, n_tokens), dtype=bool) for w in windows
+    ])
+    logits = np.where(allowed, logits, -np.inf)
+    attention = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    attention /= attention.sum(axis=-1, keepdims=True)
+
+    # Residual connections: A' = (A + I) / 2, rows renormalised, multiplied through the layers
+    identity = np.eye(n_tokens, dtype=np.float32)
+    rollout = np.broadcast_to(identity, (len(names), n_tokens, n_tokens)).copy()
+    for layer in range(ATTENTION_LAYERS):
+        mixed = 0.5 * attention[:, layer] + 0.5 * identity
+        mixed /= mixed.sum(axis=-1, keepdims=True)
+        rollout = mixed @ rollout
+    # Mean-pooled readout: how much each input patch flows into the pooled token
+    return rollout.mean(axis=1).reshape(len(names), GRID, GRID)
+
+
+def fuse_maps(maps: np.ndarray, weights: np.ndarray, size: int = 224) -> np.ndarray:
+    """Min-max normalise (M, GRID, GRID) maps, blend by weight, upsample once to size x size"""
+    low = maps.min(axis=(1, 2), keepdims=True)
+    span = maps.max(axis=(1, 2), keepdims=True) - low
+    normalised = np.divide(maps - low, span, out=np.zeros_like(maps), where=span > 0)
+    fused = np.tensordot(weights / weights.sum(), normalised, axes=1).astype(np.float32)
+    upsampled = np.asarray(Image.fromarray(fused).resize((size, size), Image.BILINEAR))
+    return np.clip(upsampled, 0, 1)
+
+
+def _probability(logits: np.ndarray) -> List[float]:
+    return (1 / (1 + np.exp(-SCORE_GAIN * logits))).tolist()
+
+
+def ensemble_forward(gray: np.ndarray, models: List[Dict]) -> Tuple[Dict[str, float], np.ndarray]:
+    """
+    P(malignant) of every explained member, plus 'Ensemble' (their weighted
+    mean), and the fused CAM / rollout map (224x224, 0-1) of those members
+    """
+    features = patch_features(gray)
+    cnn = [m['name'] for m in models if EXPLAINERS.get(m['name']) == 'cam']
+    transformers = [m['name'] for m in models if EXPLAINERS.get(m['name']) == 'rollout']
+    maps, scores = [], {}
+    if cnn:
+        heads = head_weights(cnn)
+        maps.append(class_activation_maps(features, heads))
+        # Global average pooling, then the head whose weights made the map
+        scores.update(zip(cnn, _probability(heads @ features.mean(axis=(1, 2)))))
+    if transformers:
+        relevance = attention_rollout(
+            features, transformers,
+            [WINDOW_SIZE if name.startswith('Swin') else 0 for name in transformers]
+        )
+        maps.append(relevance)
+        # Tokens pooled by their rollout relevance (each map sums to 1)
+        pooled = np.einsum('mhw,chw->mc', relevance, features)
+        scores.update(zip(transformers, _probability(np.einsum('mc,mc->m', head_weights(transformers), pooled))))
+    if not maps:
+        return {}, np.zeros((224, 224), dtype=np.float32)
+
+    weight = {m['name']: m['weight'] for m in models}
+    weights = np.array([weight[name] for name in cnn + transformers], dtype=np.float32)
+    member_scores = np.array([scores[name] for name in cnn + transformers])
+    scores['Ensemble'] = float(np.dot(weights, member_scores) / weights.sum())
+    return scores, fuse_maps(np.concatenate(maps), weights)
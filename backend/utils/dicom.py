@@ -0,0 +1,297 @@
+"""
+Native DICOM reading for the image predictor
+
+PACS exports arrive as DICOM Part 10 files. For the uncompressed transfer
+syntaxes (implicit/explicit VR little endian, explicit VR big endian) the
+header is walked once to find the handful of Image Pixel / VOI LUT
+attributes and the offset of Pixel Data; the pixels themselves are never
+copied: they are a NumPy view of the upload buffer, or an np.memmap when
+reading from a path. Downsampling (block means) and the rescale +
+window/level mapping to 8-bit display values then run vectorized on that
+16-bit array and hand a float32 grayscale image to the shared preprocessing.
+
+Compressed (encapsulated) Pixel Data needs pydicom with a decoder plugin;
+without it such files are rejected with UnsupportedDicomError.
+"""
+
+import io
+import mmap
+import struct
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+IMPLICIT_VR_LE = '1.2.840.10008.1.2'
+EXPLICIT_VR_LE = '1.2.840.10008.1.2.1'
+EXPLICIT_VR_BE = '1.2.840.10008.1.2.2'
+NATIVE_TRANSFER_SYNTAXES = (IMPLICIT_VR_LE, EXPLICIT_VR_LE, EXPLICIT_VR_BE)
+
+# Explicit VRs with a 2-byte reserved field and a 4-byte length
+LONG_VRS = {b'OB', b'OD', b'OF', b'OL', b'OV', b'OW', b'SQ', b'SV', b'UC', b'UN', b'UR', b'UT', b'UV'}
+
+UNDEFINED_LENGTH = 0xFFFFFFFF
+ITEM, ITEM_DELIMITER, SEQUENCE_DELIMITER = 0xFFFEE000, 0xFFFEE00D, 0xFFFEE0DD
+PIXEL_DATA = 0x7FE00010
+
+# Attributes read from the header, with their VR for implicit-VR files
+ATTRIBUTES = {
+    0x00020010: ('transfer_syntax', 'UI'),
+    0x00280002: ('samples_per_pixel', 'US'),
+    0x00280004: ('photometric', 'CS'),
+    0x00280008: ('frames', 'IS'),
+    0x00280010: ('rows', 'US'),
+    0x00280011: ('columns', 'US'),
+    0x00280100: ('bits_allocated', 'US'),
+    0x00280101: ('bits_stored', 'US'),
+    0x00280103: ('pixel_representation', 'US'),
+    0x00281050: ('window_center', 'DS'),
+    0x00281051: ('window_width', 'DS'),
+    0x00281052: ('rescale_intercept', 'DS'),
+    0x00281053: ('rescale_slope', 'DS'),
+}
+
+# Window used when the file carries none: this percentile range of the pixels
+AUTO_WINDOW_PERCENTILES = (0.5, 99.5)
+
+
+class DicomError(ValueError):
+    """Not a readable DICOM image"""
+
+
+class UnsupportedDicomError(DicomError):
+    """Valid DICOM this reader cannot decode (compressed, colour, ...)"""
+
+
+class CompressedDicomError(UnsupportedDicomError):
+    """Encapsulated Pixel Data; decodable with pydicom"""
+
+
+def is_dicom(data: bytes) -> bool:
+    """Part 10 files have a 128-byte preamble followed by 'DICM'"""
+    return len(data) >= 132 and data[128:132] == b'DICM'
+
+
+def _decode_value(raw: bytes, vr: str, endian: str):
+    if vr == 'US':
+        return struct.unpack(endian + 'H', raw[:2])[0]
+    text = raw.decode('ascii', errors='replace').strip('\x00 ')
+    if vr in ('DS', 'IS'):
+        # Multi-valued (e.g. several VOI windows): the first one is the default
+        first = text.split('\\')[0].strip()
+        return float(first) if first else None
+    return text
+
+
+class _Reader:
+    """Walks data elements of a DICOM byte buffer up to Pixel Data"""
+
+    def __init__(self, buffer: memoryview):
+        self.buffer = buffer
+        self.attributes: Dict[str, object] = {}
+
+    def _header(self, pos: int, explicit: bool, endian: str) -> Tuple[int, Optional[bytes], int, int]:
+        """(tag, VR, value length, value offset) of the element at pos"""
+        buf = self.buffer
+        if pos + 8 > len(buf):
+            raise DicomError("Truncated DICOM header")
+        group, element = struct.unpack_from(endian + 'HH', buf, pos)
+        tag = (group << 16) | element
+        if tag in (ITEM, ITEM_DELIMITER, SEQUENCE_DELIMITER):
+            return tag, None, struct.unpack_from(endian + 'I', buf, pos + 4)[0], pos + 8
+        if not explicit:
+            return tag, None, struct.unpack_from(endian + 'I', buf, pos + 4)[0], pos + 8
+        vr = bytes(buf[pos + 4:pos + 6])
+        if vr in LONG_VRS:
+            return tag, vr, struct.unpack_from(endian + 'I', buf, pos + 8)[0], pos + 12
+        return tag, vr, struct.unpack_from(endian + 'H', buf, pos + 6)[0], pos + 8
+
+    def _skip_undefined(self, pos: int, explicit: bool, endian: str, end_tag: int) -> int:
+        """Position after an undefined-length sequence or item ending in end_tag"""
+        while pos < len(self.buffer):
+            tag, vr, length, pos = self._header(pos, explicit, endian)
+            if tag == end_tag:
+                return pos
+            if tag == ITEM:
+                pos = self._skip_undefined(pos, explicit, endian, ITEM_DELIMITER) \
+                    if length == UNDEFINED_LENGTH else pos + length
+            elif length == UNDEFINED_LENGTH:
+                pos = self._skip_undefined(pos, explicit, endian, SEQUENCE_DELIMITER)
+            else:
+                pos += length
+        raise DicomError("Unterminated DICOM sequence")
+
+    def read(self, pos: int, explicit: bool, endian: str, stop_group: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Record ATTRIBUTES from pos on; returns (position, length) of Pixel
+        Data, or (position, -1) where the group changes away from stop_group
+        """
+        buf = self.buffer
+        while pos < len(buf):
+            group = struct.unpack_from(endian + 'H', buf, pos)[0]
+            if stop_group is not None and group != stop_group:
+                return pos, -1
+            tag, vr, length, value_pos = self._header(pos, explicit, endian)
+            if tag == PIXEL_DATA:
+                return value_pos, length
+            if length == UNDEFINED_LENGTH:
+                pos = self._skip_undefined(value_pos, explicit, endian, SEQUENCE_DELIMITER)
+                continue
+            if tag in ATTRIBUTES:
+                name, default_vr = ATTRIBUTES[tag]
+                vr_name = vr.decode('ascii') if vr else default_vr
+                self.attributes[name] = _decode_value(bytes(buf[value_pos:value_pos + length]), vr_name, endian)
+            pos = value_pos + length
+        raise DicomError("No Pixel Data in DICOM file")
+
+
+def read_header(data: Union[bytes, memoryview]) -> Dict[str, object]:
+    """Image attributes plus 'pixel_offset'/'pixel_length' of a Part 10 file"""
+    buffer = memoryview(data)
+    if not is_dicom(bytes(buffer[:132])):
+        raise DicomError("Missing DICM prefix")
+    reader = _Reader(buffer)
+    # File meta information (group 0002) is always explicit VR little endian
+    pos, _ = reader.read(132, explicit=True, endian='<', stop_group=0x0002)
+    syntax = reader.attributes.get('transfer_syntax', IMPLICIT_VR_LE)
+    if syntax not in NATIVE_TRANSFER_SYNTAXES:
+        raise CompressedDicomError(f"Compressed transfer syntax {syntax}")
+    endian = '>' if syntax == EXPLICIT_VR_BE else '<'
+    offset, length = reader.read(pos, explicit=syntax != IMPLICIT_VR_LE, endian=endian)
+    if length == UNDEFINED_LENGTH:
+        raise CompressedDicomError("Encapsulated Pixel Data")
+    header = dict(reader.attributes)
+    header.update(transfer_syntax=syntax, endian=endian, pixel_offset=offset, pixel_length=length)
+    return header
+
+
+def _pixel_dtype(header: Dict) -> np.dtype:
+    bits = header.get('bits_allocated', 16)
+    if bits not in (8, 16, 32):
+        raise UnsupportedDicomError(f"{bits}-bit pixels")
+    kind = 'i' if header.get('pixel_representation', 0) == 1 else 'u'
+    return np.dtype(f"{header['endian']}{kind}{bits // 8}")
+
+
+def read_pixels(source: Union[bytes, str]) -> Tuple[np.ndarray, Dict]:
+    """
+    (rows, columns) stored pixel values of the first frame, and the header
+    Bytes are viewed in place; a path is memory-mapped. Nothing is decoded
+    or copied until the caller touches the array.
+    """
+    if isinstance(source, str):
+        with open(source, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                header = read_header(view)
+            finally:
+                view.release()
+    else:
+        header = read_header(source)
+
+    if header.get('samples_per_pixel', 1) != 1:
+        raise UnsupportedDicomError("Only single-channel (grayscale) images are supported")
+    try:
+        rows, columns = int(header['rows']), int(header['columns'])
+    except KeyError:
+        raise DicomError("DICOM file has no Rows/Columns")
+    dtype = _pixel_dtype(header)
+    count = rows * columns
+    if header['pixel_length'] < count * dtype.itemsize:
+        raise DicomError("Pixel Data is shorter than Rows x Columns")
+
+    if isinstance(source, str):
+        pixels = np.memmap(source, dtype=dtype, mode='r', offset=header['pixel_offset'], shape=(rows, columns))
+    else:
+        pixels = np.frombuffer(source, dtype=dtype, count=count, offset=header['pixel_offset'])
+        pixels = pixels.reshape(rows, columns)
+    return pixels, header
+
+
+def _block_mean(pixels: np.ndarray, factor: int) -> np.ndarray:
+    """Mean over factor x factor blocks (edge rows/columns that don't fill a block are dropped)"""
+    if factor <= 1:
+        return pixels.astype(np.float32)
+    rows, columns = (pixels.shape[0] // factor) * factor, (pixels.shape[1] // factor) * factor
+    blocks = pixels[:rows, :columns].reshape(rows // factor, factor, columns // factor, factor)
+    return blocks.mean(axis=(1, 3), dtype=np.float32)
+
+
+def _stored_values(pixels: np.ndarray, header: Dict) -> np.ndarray:
+    """Drop the unused high bits when BitsStored < BitsAllocated"""
+    allocated = pixels.dtype.itemsize * 8
+    stored = int(header.get('bits_stored', allocated))
+    if stored >= allocated:
+        return pixels
+    if pixels.dtype.kind == 'u':
+        return pixels & np.array((1 << stored) - 1, dtype=pixels.dtype)
+    shift = allocated - stored
+    return (pixels << shift) >> shift
+
+
+def to_display(pixels: np.ndarray, header: Dict, max_side: Optional[int] = None) -> np.ndarray:
+    """
+    Float32 grayscale in 0..255 (MONOCHROME2 polarity)
+    With max_side the image is first reduced by an integer block mean so
+    its shorter side stays >= max_side; rescale slope/intercept and the
+    linear window/level of PS3.3 C.11.2.1.2 are then applied to the result.
+    """
+    factor = max(1, min(pixels.shape) // max_side) if max_side else 1
+    values = _block_mean(_stored_values(pixels, header), factor)
+
+    slope = header.get('rescale_slope') or 1.0
+    intercept = header.get('rescale_intercept') or 0.0
+    if slope != 1.0 or intercept != 0.0:
+        values = values * np.float32(slope) + np.float32(intercept)
+
+    center, width = header.get('window_center'), header.get('window_width')
+    if center is None or not width or width < 1:
+        low, high = np.percentile(values, AUTO_WINDOW_PERCENTILES)
+        center, width = (low + high) / 2 + 0.5, max(high - low, 1.0) + 1
+    display = np.clip((values - np.float32(center - 0.5)) / np.float32(width - 1) + np.float32(0.5), 0, 1)
+    display *= np.float32(255)
+
+    if header.get('photometric') == 'MONOCHROME1':
+        display = np.float32(255) - display
+    return display
+
+
+def _read_with_pydicom(data: bytes) -> Tuple[np.ndarray, Dict]:
+    """Compressed files, when pydicom (and a decoder) is installed"""
+    try:
+        import pydicom
+    except ImportError:
+        raise UnsupportedDicomError("Compressed DICOM requires pydicom")
+    dataset = pydicom.dcmread(io.BytesIO(data))
+    pixels = dataset.pixel_array
+    if pixels.ndim == 3:
+        pixels = pixels[0]
+    return pixels, {
+        'photometric': str(dataset.get('PhotometricInterpretation', 'MONOCHROME2')),
+        'bits_stored': pixels.dtype.itemsize * 8,
+        'rescale_slope': float(dataset.get('RescaleSlope', 1.0)),
+        'rescale_intercept': float(dataset.get('RescaleIntercept', 0.0)),
+        'window_center': _first_value(dataset.get('WindowCenter')),
+        'window_width': _first_value(dataset.get('WindowWidth')),
+    }
+
+
+def _first_value(value):
+    if value is None:
+        return None
+    try:
+        return float(value[0])
+    except TypeError:
+        return float(value)
+
+
+def load_dicom_gray(data: bytes, max_side: Optional[int] = None) -> np.ndarray:
+    """Windowed float32 grayscale (0..255) of a DICOM upload"""
+    try:
+        pixels, header = read_pixels(data)
+    except CompressedDicomError:
+        pixels, header = _read_with_pydicom(data)
+    return to_display(pixels, header, max_side)
@@ -0,0 +1,166 @@
+"""
+Prediction history storage
+
+The default in-memory store lives inside one process. When the API runs with
+several worker processes (see gunicorn.conf.py) every worker must see the same
+history, so a SQLite-backed store is used instead.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 'memory' (single process) or 'sqlite' (shared between worker processes)
+HISTORY_BACKEND = os.environ.get('HISTORY_BACKEND', 'memory')
+HISTORY_DB_PATH = os.environ.get('HISTORY_DB_PATH', os.path.join(BASE_PATH, 'var', 'history.sqlite3'))
+
+
+class InMemoryHistory:
+    """Prediction history held in a plain list (single process only)"""
+
+    def __init__(self):
+        self._records = []
+        self._generation = 0
+
+    def append(self, record: Dict):
+        self._records.append(record)
+
+    def get(self, prediction_id: str) -> Optional[Dict]:
+        return next(
+            (p for p in self._records if p['prediction_id'] == prediction_id),
+            None
+        )
+
+    def list(self) -> List[Dict]:
+        return list(self._records)
+
+    def since(self, seq: int, fields: Optional[List[str]] = None) -> Tuple[int, List[Dict]]:
+        """Records appended after position seq, and the new position (fields: ignored)"""
+        seq = min(seq, len(self._records))  # history was cleared
+        records = self._records[seq:]
+        return seq + len(records), records
+
+    def generation(self) -> int:
+        """Number of times the history was cleared"""
+        return self._generation
+
+    def clear(self):
+        self._records.clear()
+        self._generation += 1
+
+
+class SQLiteHistory:
+    """
+    Prediction history in a SQLite database shared by all worker processes
+    Records are stored as JSON; WAL mode lets readers and one writer overlap
+    """
+
+    def __init__(self, db_path: str = HISTORY_DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "prediction_id TEXT UNIQUE NOT NULL, "
+            "record TEXT NOT NULL)"
+        )
+        # Clear generation, so every worker notices a clear made by another
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS history_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread and per process; connections must not
+        # cross a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def append(self, record: Dict):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO predictions (prediction_id, record) VALUES (?, ?)",
+            (record['prediction_id'], _dumps(record))
+        )
+
+    def get(self, prediction_id: str) -> Optional[Dict]:
+        row = self._connect().execute(
+            "SELECT record FROM predictions WHERE prediction_id = ?",
+            (prediction_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list(self) -> List[Dict]:
+        rows = self._connect().execute("SELECT record FROM predictions ORDER BY seq").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def since(self, seq: int, fields: Optional[List[str]] = None) -> Tuple[int, List[Dict]]:
+        """
+        Records appended (by any worker) after seq, and the new position
+        With fields only those top-level fields are extracted, in SQLite, so
+        heatmaps are neither transferred nor parsed (needs SQLite >= 3.38).
+        """
+        column = "record"
+        if fields:
+            column = "json_object(" + ", ".join(f"'{f}', json(record -> '$.{f}')" for f in fields) + ")"
+        rows = self._connect().execute(
+            f"SELECT seq, {column} FROM predictions WHERE seq > ? ORDER BY seq", (seq,)
+        ).fetchall()
+        return (rows[-1][0] if rows else seq), [json.loads(row[1]) for row in rows]
+
+    def generation(self) -> int:
+        """Number of times the history was cleared (by any worker)"""
+        row = self._connect().execute(
+            "SELECT value FROM history_meta WHERE key = 'generation'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM predictions")
+            conn.execute(
+                "INSERT INTO history_meta (key, value) VALUES ('generation', 1) "
+                "ON CONFLICT (key) DO UPDATE SET value = value + 1"
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def _to_builtin(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _dumps(record: Dict) -> str:
+    return json.dumps(record, default=_to_builtin)
+
+
+def create_history_store(backend: str = HISTORY_BACKEND):
+    """Create the history store selected by HISTORY_BACKEND"""
+    if backend == 'sqlite':
+        print(f"[OK] Using SQLite prediction history: {HISTORY_DB_PATH}")
+        return SQLiteHistory(HISTORY_DB_PATH)
+    return InMemoryHistory()
@@ -0,0 +1,217 @@
+"""
+Dashboard aggregates over the prediction history
+
+The history store keeps whole responses (heatmaps included), so analytics
+over it would have to load and scan every record. HistoryStats instead keeps
+a columnar ring buffer of the last HISTORY_STATS_CAPACITY predictions:
+
+    timestamp (float64), type (uint8), final label (int8),
+    confidence (float32), per-model labels (int8, one column per model)
+
+and, per STATS_BUCKET_SECONDS time bucket and prediction type, running
+counts, malignant counts, a confidence histogram and model agreement. Each
+record is folded in once: a stats read first takes the records added since
+the previous one from the history store's `since(seq)` tail (only the
+fields below are extracted from SQLite), so with the SQLite history every
+worker sees the predictions of all workers. A clear made through any worker
+bumps the store's clear generation, and every worker starts over from the
+store on its next read. GET /history/stats then serves
+the bucket aggregates as they are; ad-hoc windows (?hours=) are one
+vectorized pass over the ring.
+"""
+
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+HISTORY_STATS_CAPACITY = 100_000
+
+# Aggregation bucket, and how many buckets are kept
+STATS_BUCKET_SECONDS = 3600
+STATS_MAX_BUCKETS = 24 * 90
+
+# Model columns in the ring buffer (tabular and image models share them)
+MAX_MODELS = 16
+
+# Confidence histogram bins (percent)
+CONFIDENCE_BINS = np.linspace(0, 100, 11)
+
+# History record fields the stats need
+RECORD_FIELDS = ['type', 'timestamp', 'final_prediction', 'confidence', 'model_predictions']
+
+TYPES = ('tabular', 'image')
+LABELS = {'Malignant': 1, 'Benign': 0}
+UNKNOWN = -1
+
+
+class _Bucket:
+    """Running aggregates of one time bucket, per prediction type"""
+
+    def __init__(self):
+        n_types = len(TYPES)
+        self.count = np.zeros(n_types, dtype=np.int64)
+        self.malignant = np.zeros(n_types, dtype=np.int64)
+        self.confidence_sum = np.zeros(n_types)
+        self.confidence_hist = np.zeros((n_types, len(CONFIDENCE_BINS) - 1), dtype=np.int64)
+        # Individual models agreeing with the final answer / models that answered
+        self.agreeing = np.zeros(n_types, dtype=np.int64)
+        self.answered = np.zeros(n_types, dtype=np.int64)
+        self.unanimous = np.zeros(n_types, dtype=np.int64)
+
+    def as_dict(self) -> Dict:
+        return {
+            kind: {
+                'count': int(self.count[t]),
+                'malignant': int(self.malignant[t]),
+                'malignancy_rate': round(self.malignant[t] / self.count[t], 4) if self.count[t] else None,
+                'mean_confidence': round(self.confidence_sum[t] / self.count[t], 2) if self.count[t] else None,
+                'confidence_histogram': self.confidence_hist[t].tolist(),
+                'model_agreement': round(self.agreeing[t] / self.answered[t], 4) if self.answered[t] else None,
+                'unanimous_rate': round(self.unanimous[t] / self.count[t], 4) if self.count[t] else None
+            }
+            for t, kind in enumerate(TYPES)
+        }
+
+
+class HistoryStats:
+    """Columnar ring buffer plus per-bucket aggregates of the prediction history"""
+
+    def __init__(self, store, capacity: int = HISTORY_STATS_CAPACITY):
+        self.store = store
+        self.capacity = capacity
+        self.timestamp = np.zeros(capacity)
+        self.type = np.zeros(capacity, dtype=np.uint8)
+        self.final = np.full(capacity, UNKNOWN, dtype=np.int8)
+        self.confidence = np.zeros(capacity, dtype=np.float32)
+        self.model_labels = np.full((capacity, MAX_MODELS), UNKNOWN, dtype=np.int8)
+        self.models: Dict[str, int] = {}
+        # Ensemble columns echo the final answer and are left out of agreement
+        self.voters = np.zeros(MAX_MODELS, dtype=bool)
+        self.size = 0
+        self.head = 0  # next slot to write
+        self.buckets: Dict[int, _Bucket] = {}
+        self._seq = 0
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Take in the records added to the history since the last call"""
+        with self._lock:
+            # Read before since(): a clear in between is caught next time
+            generation = self.store.generation()
+            if generation != self._generation:
+                self._forget()
+                self._generation = generation
+            self._seq, records = self.store.since(self._seq, RECORD_FIELDS)
+            for record in records:
+                self._observe(record)
+
+    def reset(self):
+        """Forget everything; the next refresh starts over from the store"""
+        with self._lock:
+            self._forget()
+            self._generation = None
+
+    def _forget(self):
+        self.size = self.head = 0
+        self.model_labels.fill(UNKNOWN)
+        self.buckets.clear()
+        self._seq = 0
+
+    def _model_column(self, name: str) -> Optional[int]:
+        column = self.models.get(name)
+        if column is None and len(self.models) < MAX_MODELS:
+            column = self.models[name] = len(self.models)
+            self.voters[column] = not name.startswith('Ensemble')
+        return column
+
+    def _observe(self, record: Dict):
+        kind = TYPES.index(record['type']) if record.get('type') in TYPES else 0
+        try:
+            ts = datetime.fromisoformat(record['timestamp']).timestamp()
+        except (KeyError, ValueError):
+            ts = datetime.now().timestamp()
+        final = LABELS.get(record.get('final_prediction'), UNKNOWN)
+        confidence = float(record.get('confidence', 0.0))
+
+        i = self.head
+        self.timestamp[i], self.type[i], self.final[i], self.confidence[i] = ts, kind, final, confidence
+        labels = self.model_labels[i]
+        labels.fill(UNKNOWN)
+        for prediction in record.get('model_predictions', []):
+            column = self._model_column(prediction['model'])
+            if column is not None:
+                labels[column] = LABELS.get(prediction.get('prediction'), UNKNOWN)
+        self.head = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+        bucket_start = int(ts // STATS_BUCKET_SECONDS) * STATS_BUCKET_SECONDS
+        bucket = self.buckets.get(bucket_start)
+        if bucket is None:
+            bucket = self.buckets[bucket_start] = _Bucket()
+            if len(self.buckets) > STATS_MAX_BUCKETS:
+                del self.buckets[min(self.buckets)]
+        answered = labels[self.voters & (labels != UNKNOWN)]
+        bucket.count[kind] += 1
+        bucket.malignant[kind] += final == 1
+        bucket.confidence_sum[kind] += confidence
+        bin_ = min(np.searchsorted(CONFIDENCE_BINS, confidence, side='right') - 1, len(CONFIDENCE_BINS) - 2)
+        bucket.confidence_hist[kind, max(bin_, 0)] += 1
+        if final != UNKNOWN and len(answered):
+            agreeing = int((answered == final).sum())
+            bucket.agreeing[kind] += agreeing
+            bucket.answered[kind] += len(answered)
+            bucket.unanimous[kind] += agreeing == len(answered)
+
+    def bucket_stats(self, limit: Optional[int] = None) -> List[Dict]:
+        with self._lock:
+            starts = sorted(self.buckets)[-limit:] if limit else sorted(self.buckets)
+            return [
+                {'start': datetime.fromtimestamp(start).isoformat(), **self.buckets[start].as_dict()}
+                for start in starts
+            ]
+
+    def window_stats(self, hours: float) -> Dict:
+        """Totals and per-model agreement over the last `hours`, from the ring buffer"""
+        with self._lock:
+            n = self.size
+            cutoff = datetime.now().timestamp() - hours * 3600
+            selected = self.timestamp[:n] >= cutoff
+            types, final = self.type[:n][selected], self.final[:n][selected]
+            confidence, labels = self.confidence[:n][selected], self.model_labels[:n][selected]
+            models = dict(self.models)
+
+        stats = {}
+        for t, kind in enumerate(TYPES):
+            mask = types == t
+            count = int(mask.sum())
+            kind_labels, kind_final = labels[mask], final[mask][:, None]
+            answered = (kind_labels != UNKNOWN) & (kind_final != UNKNOWN)
+            per_model = {}
+            for name, column in models.items():
+                n_answered = int(answered[:, column].sum())
+                if n_answered:
+                    per_model[name] = {
+                        'predictions': n_answered,
+                        'agreement_with_final': round(float(
+                            (kind_labels[:, column] == kind_final[:, 0])[answered[:, column]].mean()
+                        ), 4),
+                        'malignancy_rate': round(float((kind_labels[:, column] == 1)[answered[:, column]].mean()), 4)
+                    }
+            stats[kind] = {
+                'count': count,
+                'malignancy_rate': round(float((final[mask] == 1).mean()), 4) if count else None,
+                'confidence_percentiles': dict(zip(
+                    ('p10', 'p50', 'p90'),
+                    np.round(np.percentile(confidence[mask], [10, 50, 90]), 2).tolist()
+                )) if count else None,
+                'confidence_histogram': np.histogram(confidence[mask], CONFIDENCE_BINS)[0].tolist(),
+                'models': per_model
+            }
+        return stats
@@ -0,0 +1,325 @@
+"""
+Local job queue for asynchronous image inference
+
+POST /predict/image?async=true stores the upload in a SQLite table instead of
+running the models on the request. A pool of worker processes, each with its
+own ImagePredictor, claims queued jobs by priority and writes the raw model
+output back; GET /jobs/{id} turns it into the usual prediction response.
+
+No broker is needed: the queue is a file under backend/var/. A file lock makes
+sure only one API process per host supervises the pool, and the supervisor
+requeues the jobs of any worker that dies (up to JOB_MAX_ATTEMPTS).
+"""
+
+import os
+import json
+import time
+import uuid
+import fcntl
+import signal
+import sqlite3
+import threading
+import multiprocessing
+from typing import Dict, List, Optional, Tuple
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JOB_DB_PATH = os.environ.get('JOB_DB_PATH', os.path.join(BASE_PATH, 'var', 'jobs.sqlite3'))
+
+# Worker processes running ImagePredictor (0 disables async mode)
+IMAGE_JOB_WORKERS = int(os.environ.get('IMAGE_JOB_WORKERS', '2'))
+
+# Queued + running jobs accepted before new submissions are refused
+MAX_PENDING_JOBS = int(os.environ.get('MAX_PENDING_JOBS', '100'))
+
+# Attempts per job; a worker crash counts as a failed attempt
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+
+# A running job whose lease expires is assumed lost and requeued
+JOB_LEASE_SECONDS = float(os.environ.get('JOB_LEASE_SECONDS', '300'))
+
+# How often idle workers and long-polling clients look at the queue
+JOB_POLL_INTERVAL = 0.05
+SUPERVISOR_INTERVAL = 1.0
+
+# A finalization claim without a stored response after this many seconds is
+# assumed abandoned (its API process died) and can be claimed again
+FINALIZATION_TIMEOUT = 30.0
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+
+class QueueFullError(Exception):
+    """Raised when MAX_PENDING_JOBS jobs are already waiting or running"""
+
+
+class JobQueue:
+    """SQLite-backed priority queue shared by API processes and workers"""
+
+    def __init__(self, db_path: str = JOB_DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+            "priority INTEGER NOT NULL, payload BLOB, result TEXT, response TEXT, "
+            "error TEXT, attempts INTEGER NOT NULL DEFAULT 0, worker_pid INTEGER, "
+            "lease_until REAL, finalized INTEGER NOT NULL DEFAULT 0, "
+            "created REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_by_priority "
+            "ON jobs (status, priority DESC, created)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread and per process; connections must not
+        # cross a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def enqueue(self, kind: str, payload: bytes, priority: int = 0) -> str:
+        """Add a job; higher priority runs first, FIFO within a priority"""
+        conn = self._connect()
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            pending = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchone()[0]
+            if pending >= MAX_PENDING_JOBS:
+                raise QueueFullError(f"{pending} jobs pending")
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, priority, payload, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, priority, payload, now, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return job_id
+
+    def claim(self, worker_pid: int) -> Optional[Tuple[str, str, bytes]]:
+        """Atomically take the next queued job for a worker"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, kind, payload FROM jobs WHERE status = ? "
+                "ORDER BY priority DESC, created LIMIT 1",
+                (QUEUED,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, worker_pid = ?, "
+                    "lease_until = ?, updated = ? WHERE id = ?",
+                    (RUNNING, worker_pid, now + JOB_LEASE_SECONDS, now, row[0])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row
+
+    def complete(self, job_id: str, result: Dict):
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, payload = NULL, updated = ? WHERE id = ?",
+            (DONE, json.dumps(result), time.time(), job_id)
+        )
+
+    def fail(self, job_id: str, error: str):
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, error = ?, payload = NULL, updated = ? WHERE id = ?",
+            (FAILED, error, time.time(), job_id)
+        )
+
+    def requeue_running(self, worker_pid: Optional[int] = None) -> int:
+        """
+        Return lost running jobs to the queue: those held by worker_pid, or
+        (without a pid) those whose lease expired. Jobs out of attempts fail.
+        """
+        conn = self._connect()
+        now = time.time()
+        if worker_pid is not None:
+            where, args = "status = ? AND worker_pid = ?", (RUNNING, worker_pid)
+        else:
+            where, args = "status = ? AND lease_until < ?", (RUNNING, now)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                f"UPDATE jobs SET status = ?, error = 'worker lost', payload = NULL, updated = ? "
+                f"WHERE {where} AND attempts >= ?",
+                (FAILED, now, *args, JOB_MAX_ATTEMPTS)
+            )
+            requeued = conn.execute(
+                f"UPDATE jobs SET status = ?, worker_pid = NULL, lease_until = NULL, updated = ? "
+                f"WHERE {where}",
+                (QUEUED, now, *args)
+            ).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return requeued
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self._connect().execute(
+            "SELECT id, kind, status, priority, result, response, error, attempts, "
+            "finalized, created, updated FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ('job_id', 'kind', 'status', 'priority', 'result', 'response', 'error',
+                'attempts', 'finalized', 'created', 'updated')
+        job = dict(zip(keys, row))
+        for key in ('result', 'response'):
+            if job[key] is not None:
+                job[key] = json.loads(job[key])
+        return job
+
+    def claim_finalization(self, job_id: str) -> bool:
+        """True for exactly one caller once a job is done (or its claim was abandoned)"""
+        now = time.time()
+        return self._connect().execute(
+            "UPDATE jobs SET finalized = 1, updated = ? WHERE id = ? AND status = ? AND response IS NULL "
+            "AND (finalized = 0 OR updated < ?)",
+            (now, job_id, DONE, now - FINALIZATION_TIMEOUT)
+        ).rowcount == 1
+
+    def release_finalization(self, job_id: str):
+        """Give up a claim whose response could not be built, so a later poll retries"""
+        self._connect().execute(
+            "UPDATE jobs SET finalized = 0 WHERE id = ? AND response IS NULL", (job_id,)
+        )
+
+    def store_response(self, job_id: str, response: Dict):
+        self._connect().execute(
+            "UPDATE jobs SET response = ?, updated = ? WHERE id = ?",
+            (json.dumps(response), time.time(), job_id)
+        )
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)} | dict(rows)
+
+
+def _worker_main(db_path: str):
+    """Worker process: claim image jobs and run them through ImagePredictor"""
+    from utils.predictions import ImagePredictor
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+
+    queue = JobQueue(db_path)
+    predictor = ImagePredictor()
+    pid = os.getpid()
+    while not stopping.is_set():
+        job = queue.claim(pid)
+        if job is None:
+            time.sleep(JOB_POLL_INTERVAL)
+            continue
+        job_id, kind, payload = job
+        try:
+            predictions, heatmap_base64 = predictor.predict(payload)
+            queue.complete(job_id, {'predictions': predictions, 'heatmap_base64': heatmap_base64})
+        except Exception as e:
+            queue.fail(job_id, str(e))
+
+
+class WorkerPool:
+    """
+    Keeps IMAGE_JOB_WORKERS worker processes alive
+    Only the process holding the queue's lock file runs the pool; the others
+    retry the lock so the pool moves if that process exits.
+    """
+
+    def __init__(self, queue: JobQueue, n_workers: int = IMAGE_JOB_WORKERS):
+        self.queue = queue
+        self.n_workers = n_workers
+        self.workers: List[multiprocessing.Process] = []
+        self._lock_file = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._context = multiprocessing.get_context('spawn')
+
+    @property
+    def is_supervisor(self) -> bool:
+        return self._lock_file is not None
+
+    def start(self):
+        if self.n_workers <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._supervise, name='job-supervisor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        for process in self.workers:
+            process.terminate()
+        for process in self.workers:
+            process.join(timeout=5)
+        self.workers = []
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _try_lock(self) -> bool:
+        lock_file = open(self.queue.db_path + '.lock', 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _spawn(self) -> multiprocessing.Process:
+        process = self._context.Process(
+            target=_worker_main, args=(self.queue.db_path,), name='image-job-worker', daemon=True
+        )
+        process.start()
+        return process
+
+    def _supervise(self):
+        while not self._stop.is_set():
+            if not self.is_supervisor:
+                if not self._try_lock():
+                    self._stop.wait(SUPERVISOR_INTERVAL)
+                    continue
+                # Jobs still marked running belong to a previous supervisor's workers
+                for pid in self._orphaned_pids():
+                    self.queue.requeue_running(worker_pid=pid)
+                self.workers = [self._spawn() for _ in range(self.n_workers)]
+                print(f"[OK] Started {self.n_workers} image job workers")
+
+            for i, process in enumerate(self.workers):
+                if not process.is_alive():
+                    requeued = self.queue.requeue_running(worker_pid=process.pid)
+                    print(f"[!] Image job worker {process.pid} exited ({process.exitcode}), "
+                          f"requeued {requeued} job(s)")
+                    self.workers[i] = self._spawn()
+            self.queue.requeue_running(worker_pid=None)
+            self._stop.wait(SUPERVISOR_INTERVAL)
+
+    def _orphaned_pids(self) -> List[int]:
+        rows = self.queue._connect().execute(
+            "SELECT DISTINCT worker_pid FROM jobs WHERE status = ?", (RUNNING,)
+        ).fetchall()
+        return [pid for (pid,) in rows if pid is not None]
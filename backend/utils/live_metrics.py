@@ -0,0 +1,195 @@
+"""
+Live model quality from ground-truth feedback
+
+When a biopsy result comes in, POST /feedback attaches it to the stored
+prediction. Every model's answer in that record is then counted once into a
+fixed grid of SQLite counters keyed by
+
+    (kind, model, day of the prediction, true label, predicted label, score bin)
+
+where the score bin is P(malignant) cut into SCORE_BINS equal bins. A
+feedback is one upsert per model, whatever the history size. The confusion
+matrix is the sum over bins, the ROC curve the cumulative bin histograms of
+the two true labels; a rolling window only sums the days inside it, so
+/metrics reads at most models x days x 2 x 2 x SCORE_BINS rows and never
+rescans predictions. Counters are shared by all worker processes.
+
+A corrected diagnosis for the same prediction moves its counts to the new
+label; repeating the same one is a no-op.
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LIVE_METRICS_DB_PATH = os.environ.get(
+    'LIVE_METRICS_DB_PATH', os.path.join(BASE_PATH, 'var', 'live_metrics.sqlite3')
+)
+
+# Equal-width P(malignant) bins behind the ROC curve and AUC
+SCORE_BINS = 20
+
+# Default rolling window of /metrics, and the cases a model needs before its
+# live numbers replace the reference ones
+LIVE_METRICS_WINDOW_DAYS = int(os.environ.get('LIVE_METRICS_WINDOW_DAYS', '90'))
+LIVE_METRICS_MIN_CASES = int(os.environ.get('LIVE_METRICS_MIN_CASES', '30'))
+
+DIAGNOSES = ('Benign', 'Malignant')
+
+
+def malignancy_score(prediction: Dict) -> Optional[float]:
+    """P(malignant) of one model answer; None for failed models"""
+    if prediction.get('prediction') not in DIAGNOSES:
+        return None
+    if prediction.get('probability') is not None:
+        return float(prediction['probability']) / 100
+    confidence = float(prediction.get('confidence', 50.0)) / 100
+    return confidence if prediction['prediction'] == 'Malignant' else 1 - confidence
+
+
+def score_bin(score: float) -> int:
+    return min(int(score * SCORE_BINS), SCORE_BINS - 1)
+
+
+def _outcomes(record: Dict) -> List[Tuple[str, int, int]]:
+    """(model, predicted malignant, score bin) for every answer in a history record"""
+    outcomes = []
+    for prediction in record.get('model_predictions', []):
+        score = malignancy_score(prediction)
+        if score is not None:
+            outcomes.append((prediction['model'], int(prediction['prediction'] == 'Malignant'), score_bin(score)))
+    return outcomes
+
+
+class LiveMetricsStore:
+    """Per-model outcome counters in SQLite (shared between workers)"""
+
+    def __init__(self, db_path: str = LIVE_METRICS_DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS outcome_counts ("
+            "kind TEXT NOT NULL, model TEXT NOT NULL, day TEXT NOT NULL, "
+            "truth INTEGER NOT NULL, predicted INTEGER NOT NULL, bin INTEGER NOT NULL, "
+            "count INTEGER NOT NULL, "
+            "PRIMARY KEY (kind, model, day, truth, predicted, bin))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS feedback ("
+            "prediction_id TEXT PRIMARY KEY, diagnosis TEXT NOT NULL, received TEXT NOT NULL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread and per process; connections must not
+        # cross a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def record(self, record: Dict, diagnosis: str) -> Dict:
+        """Count a confirmed diagnosis for a history record"""
+        kind = record.get('type', 'tabular')
+        day = record.get('timestamp', datetime.now().isoformat())[:10]
+        outcomes = _outcomes(record)
+        truth = int(diagnosis == 'Malignant')
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT diagnosis FROM feedback WHERE prediction_id = ?", (record['prediction_id'],)
+            ).fetchone()
+            previous = row[0] if row else None
+            if previous != diagnosis:
+                if previous is not None:
+                    self._add(conn, kind, day, int(previous == 'Malignant'), outcomes, -1)
+                self._add(conn, kind, day, truth, outcomes, 1)
+                conn.execute(
+                    "INSERT OR REPLACE INTO feedback (prediction_id, diagnosis, received) VALUES (?, ?, ?)",
+                    (record['prediction_id'], diagnosis, datetime.now().isoformat())
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return {'previous_diagnosis': previous, 'models': [model for model, _, _ in outcomes]}
+
+    @staticmethod
+    def _add(conn: sqlite3.Connection, kind: str, day: str, truth: int, outcomes, delta: int):
+        conn.executemany(
+            "INSERT INTO outcome_counts (kind, model, day, truth, predicted, bin, count) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (kind, model, day, truth, predicted, bin) DO UPDATE SET count = count + excluded.count",
+            [(kind, model, day, truth, predicted, bin_, delta) for model, predicted, bin_ in outcomes]
+        )
+
+    def counts(self, window_days: Optional[int] = LIVE_METRICS_WINDOW_DAYS) -> Dict[Tuple[str, str], np.ndarray]:
+        """(kind, model) -> (truth, predicted, bin) count array over the window"""
+        query = "SELECT kind, model, truth, predicted, bin, SUM(count) FROM outcome_counts"
+        params = ()
+        if window_days:
+            query += " WHERE day >= ?"
+            params = ((date.today() - timedelta(days=window_days - 1)).isoformat(),)
+        query += " GROUP BY kind, model, truth, predicted, bin"
+
+        counts = {}
+        for kind, model, truth, predicted, bin_, count in self._connect().execute(query, params):
+            grid = counts.setdefault((kind, model), np.zeros((2, 2, SCORE_BINS), dtype=np.int64))
+            grid[truth, predicted, bin_] = count
+        return counts
+
+    def summary(self, window_days: Optional[int] = LIVE_METRICS_WINDOW_DAYS) -> Dict[str, Dict[str, Dict]]:
+        """{'tabular': {model: metrics}, 'image': {...}} over the window"""
+        summary = {'tabular': {}, 'image': {}}
+        for (kind, model), grid in self.counts(window_days).items():
+            if grid.sum() > 0:
+                summary.setdefault(kind, {})[model] = quality_metrics(grid)
+        return summary
+
+
+def quality_metrics(grid: np.ndarray) -> Dict:
+    """Accuracy, F1, confusion matrix and binned ROC/AUC from a (2, 2, SCORE_BINS) count grid"""
+    confusion = grid.sum(axis=2)
+    tn, fp, fn, tp = (int(v) for v in confusion.ravel())
+    n = tn + fp + fn + tp
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+    # Thresholds at the bin edges, from "everything malignant" down
+    negatives, positives = grid[0].sum(axis=0), grid[1].sum(axis=0)
+    tpr = np.concatenate([[0.0], np.cumsum(positives[::-1]) / max(positives.sum(), 1)])
+    fpr = np.concatenate([[0.0], np.cumsum(negatives[::-1]) / max(negatives.sum(), 1)])
+    auc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2)) if positives.sum() and negatives.sum() else None
+
+    return {
+        'accuracy': round((tp + tn) / n, 4) if n else 0.0,
+        'f1_score': round(f1, 4),
+        'precision': round(precision, 4),
+        'recall': round(recall, 4),
+        'auc_roc': round(auc, 4) if auc is not None else None,
+        'confusion_matrix': {
+            'true_positive': tp,
+            'true_negative': tn,
+            'false_positive': fp,
+            'false_negative': fn
+        },
+        'roc_curve': [{'fpr': round(f, 4), 'tpr': round(t, 4)} for f, t in zip(fpr.tolist(), tpr.tolist())],
+        'cases': n
+    }
@@ -0,0 +1,145 @@
+"""
+Latency-SLO-aware model selection under overload
+
+Each predictor owns an AdaptiveSelector that records how long every model
+takes and how long whole requests take (plus how many are in flight). With
+LATENCY_SLO_MS set, the selector raises a degradation level while the
+recent request p99 is above the target or too many requests are queued,
+and lowers it again once p99 is comfortably below the target. At level n
+the n slowest droppable models (by their own measured p99, e.g. the
+GRU extractor -> GRU-SVM chain) are skipped, always keeping MIN_MODELS.
+
+Responses built from a reduced model set carry "degraded": true and the
+"skipped_models". State is per worker process.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+# Target p99 request latency in ms; 0 disables adaptive selection
+LATENCY_SLO_MS = float(os.environ.get('LATENCY_SLO_MS', '0'))
+
+# Requests in flight (per process) treated as overload regardless of latency
+ADAPTIVE_MAX_INFLIGHT = int(os.environ.get('ADAPTIVE_MAX_INFLIGHT', '16'))
+
+# Latency samples kept per model and for requests, and how far back they count
+LATENCY_WINDOW = 200
+LATENCY_HORIZON_SECONDS = 10.0
+
+# The level changes at most once per interval; it steps down once p99 is
+# below RESTORE_RATIO * LATENCY_SLO_MS
+ADJUST_INTERVAL_SECONDS = 1.0
+RESTORE_RATIO = 0.6
+
+# Models always kept so the ensemble still has a vote
+MIN_MODELS = 2
+
+
+class LatencyWindow:
+    """Recent (timestamp, ms) samples with a p99 over the last horizon"""
+
+    def __init__(self, size: int = LATENCY_WINDOW):
+        self._samples = deque(maxlen=size)
+
+    def add(self, ms: float):
+        self._samples.append((time.monotonic(), ms))
+
+    def p99(self, horizon: float = LATENCY_HORIZON_SECONDS) -> float:
+        cutoff = time.monotonic() - horizon
+        recent = [ms for t, ms in list(self._samples) if t >= cutoff]
+        return float(np.percentile(recent, 99)) if recent else 0.0
+
+    def last_p99(self) -> float:
+        """p99 over all kept samples, however old (ranks models no longer run)"""
+        samples = [ms for _, ms in list(self._samples)]
+        return float(np.percentile(samples, 99)) if samples else 0.0
+
+
+class AdaptiveSelector:
+    """Chooses which models to skip for one predictor"""
+
+    def __init__(self, name: str, slo_ms: float = LATENCY_SLO_MS):
+        self.name = name
+        self.slo_ms = slo_ms
+        self.level = 0
+        self.inflight = 0
+        self.requests = LatencyWindow()
+        self.models: Dict[str, LatencyWindow] = {}
+        self._lock = threading.Lock()
+        self._last_adjust = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.slo_ms > 0
+
+    def record_model(self, model_name: str, ms: float):
+        window = self.models.get(model_name)
+        if window is None:
+            window = self.models.setdefault(model_name, LatencyWindow())
+        window.add(ms)
+
+    @contextmanager
+    def track_request(self):
+        """Count a request as in flight and record its latency"""
+        with self._lock:
+            self.inflight += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.requests.add((time.perf_counter() - start) * 1000)
+            with self._lock:
+                self.inflight -= 1
+
+    def _adjust(self, n_droppable: int):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_adjust < ADJUST_INTERVAL_SECONDS:
+                return
+            self._last_adjust = now
+            p99 = self.requests.p99()
+            overloaded = p99 > self.slo_ms or self.inflight > ADAPTIVE_MAX_INFLIGHT
+            if overloaded and self.level < n_droppable:
+                self.level += 1
+                print(f"[!] {self.name}: p99 {p99:.0f} ms, {self.inflight} in flight -> degradation level {self.level}")
+            elif not overloaded and p99 < RESTORE_RATIO * self.slo_ms and self.level > 0:
+                self.level -= 1
+                print(f"[OK] {self.name}: p99 {p99:.0f} ms -> degradation level {self.level}")
+
+    def select(self, model_names: Iterable[str], protected: Iterable[str] = ()) -> List[str]:
+        """Names of the models to skip for the next request (slowest first)"""
+        if not self.enabled:
+            return []
+        protected = set(protected)
+        droppable = [name for name in model_names if name not in protected]
+        n_droppable = max(0, len(droppable) + len(protected & set(model_names)) - MIN_MODELS)
+        n_droppable = min(n_droppable, len(droppable))
+        self._adjust(n_droppable)
+        if self.level == 0:
+            return []
+        slowest = sorted(
+            droppable,
+            key=lambda name: self.models[name].last_p99() if name in self.models else 0.0,
+            reverse=True
+        )
+        return slowest[:min(self.level, n_droppable)]
+
+    def stats(self) -> Dict:
+        return {
+            'slo_ms': self.slo_ms,
+            'enabled': self.enabled,
+            'level': self.level,
+            'inflight': self.inflight,
+            'request_p99_ms': round(self.requests.p99(), 3),
+            'model_p99_ms': {name: round(w.last_p99(), 3) for name, w in self.models.items()}
+        }
@@ -203,3 +203,36 @@ def get_model_metrics() -> Dict:
             }
         }
     }
+
+
+def merge_live_metrics(metrics: Dict, live: Dict[str, Dict[str, Dict]], min_cases: int) -> Dict:
+    """
+    Replace the reference numbers of models with at least min_cases confirmed
+    outcomes by their live ones (see utils/live_metrics.py)
+    Every model entry gets 'source' ('live' or 'reference') and 'live_cases'.
+    """
+    for kind in ('tabular', 'image'):
+        models = metrics[f'{kind}_models']
+        for model_name, entry in models.items():
+            live_entry = live.get(kind, {}).get(model_name)
+            cases = live_entry['cases'] if live_entry else 0
+            if cases >= min_cases:
+                entry.update({k: v for k, v in live_entry.items() if k != 'cases'})
+                entry['source'] = 'live'
+            else:
+                entry['source'] = 'reference'
+            entry['live_cases'] = cases
+        
+        accuracies = [m['accuracy'] for m in models.values()]
+        comparison = metrics['comparison'][kind]
+        comparison['accuracies'] = accuracies
+        comparison['f1_scores'] = [m['f1_score'] for m in models.values()]
+        comparison['best_model'] = list(models)[int(np.argmax(accuracies))]
+        comparison['best_accuracy'] = max(accuracies)
+    
+    # Live-only entries, e.g. the calibrated tabular ensemble
+    metrics['live_only'] = {
+        kind: {name: m for name, m in live.get(kind, {}).items() if name not in metrics[f'{kind}_models']}
+        for kind in ('tabular', 'image')
+    }
+    return metrics
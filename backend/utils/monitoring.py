@@ -0,0 +1,176 @@
+"""
+Input validation and drift monitoring for the tabular feature stream
+
+Reference statistics are computed once from data/data.csv: per-feature
+quantiles, mean and standard deviation, and decile bin edges. Every request
+(one row or a batch) is then checked and folded into running statistics with
+a few vectorized NumPy operations over the whole (rows, 30) matrix:
+
+- validation: values that are not finite, negative, or far outside the
+  training range (e.g. area_mean sent where radius_mean belongs)
+- drift: running mean/variance (Welford, merged batch-wise) and fixed-bin
+  histograms compared with the reference through the PSI
+
+Memory is constant regardless of traffic. Statistics are per process.
+"""
+
+import os
+import threading
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REFERENCE_DATA_PATH = os.path.join(BASE_PATH, 'data', 'data.csv')
+
+# 'warn' adds input_warnings to responses, 'reject' answers 422, 'off' skips
+# validation (drift statistics are still collected unless 'off')
+VALIDATION_MODE = os.environ.get('INPUT_VALIDATION', 'warn')
+
+# Accepted range: the training [min, max] widened by this fraction of its span
+RANGE_TOLERANCE = float(os.environ.get('INPUT_RANGE_TOLERANCE', '0.5'))
+
+# Reference quantiles reported next to the live statistics
+REFERENCE_QUANTILES = (0.01, 0.05, 0.5, 0.95, 0.99)
+
+# Histogram: reference deciles as inner edges, plus two open-ended bins
+HISTOGRAM_QUANTILES = np.linspace(0.1, 0.9, 9)
+
+# Avoids log(0) in the PSI for empty bins
+PSI_EPSILON = 1e-4
+
+
+class FeatureMonitor:
+    """Validates feature matrices and keeps running drift statistics"""
+
+    def __init__(self, reference: np.ndarray, feature_names: List[str]):
+        self.feature_names = list(feature_names)
+        n_features = reference.shape[1]
+
+        self.reference_mean = reference.mean(axis=0)
+        self.reference_std = reference.std(axis=0)
+        self.reference_quantiles = np.quantile(reference, REFERENCE_QUANTILES, axis=0)
+        span = reference.max(axis=0) - reference.min(axis=0)
+        self.lower = np.maximum(reference.min(axis=0) - RANGE_TOLERANCE * span, 0.0)
+        self.upper = reference.max(axis=0) + RANGE_TOLERANCE * span
+
+        # (features, 9) inner edges; bin i holds edges[i-1] < x <= edges[i]
+        self.edges = np.quantile(reference, HISTOGRAM_QUANTILES, axis=0).T.copy()
+        self.n_bins = self.edges.shape[1] + 1
+        self.reference_histogram = self._bin_counts(reference) / len(reference)
+
+        self._lock = threading.Lock()
+        self.count = 0
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+        self.histogram = np.zeros((n_features, self.n_bins), dtype=np.int64)
+        self.out_of_range = np.zeros(n_features, dtype=np.int64)
+        self.rows_out_of_range = 0
+
+    @classmethod
+    def from_csv(cls, path: str = REFERENCE_DATA_PATH) -> 'FeatureMonitor':
+        df = pd.read_csv(path)
+        reference = df.iloc[:, 2:32].to_numpy(dtype=np.float64)
+        # Same order as FEATURE_NAMES in utils/predictions.py
+        names = [c.replace('concave points', 'concave_points') for c in df.columns[2:32]]
+        return cls(reference, names)
+
+    def _bin_counts(self, X: np.ndarray) -> np.ndarray:
+        """(features, n_bins) histogram counts of X"""
+        bins = (X[:, :, None] > self.edges[None, :, :]).sum(axis=2)
+        flat = bins + np.arange(X.shape[1]) * self.n_bins
+        return np.bincount(flat.ravel(), minlength=X.shape[1] * self.n_bins).reshape(X.shape[1], self.n_bins)
+
+    def check(self, X: np.ndarray) -> np.ndarray:
+        """(rows, features) mask of invalid values"""
+        with np.errstate(invalid='ignore'):
+            return ~np.isfinite(X) | (X < self.lower) | (X > self.upper)
+
+    def observe(self, X: np.ndarray) -> np.ndarray:
+        """Check X and fold it into the drift statistics; returns check(X)"""
+        X = np.asarray(X, dtype=np.float64)
+        invalid = self.check(X)
+        valid_rows = ~invalid.any(axis=1)
+        clean = X[valid_rows]
+
+        # Only plausible rows update the moments and histograms, so a burst
+        # of broken requests shows up as out_of_range instead of drift
+        n_batch = len(clean)
+        if n_batch:
+            batch_mean = clean.mean(axis=0)
+            batch_m2 = ((clean - batch_mean) ** 2).sum(axis=0)
+            batch_hist = self._bin_counts(clean)
+
+        with self._lock:
+            self.out_of_range += invalid.sum(axis=0)
+            self.rows_out_of_range += int((~valid_rows).sum())
+            if n_batch:
+                # Chan et al. merge of two sets of running moments
+                total = self.count + n_batch
+                delta = batch_mean - self.mean
+                self.mean += delta * (n_batch / total)
+                self.m2 += batch_m2 + delta ** 2 * (self.count * n_batch / total)
+                self.count = total
+                self.histogram += batch_hist
+        return invalid
+
+    def warnings(self, X: np.ndarray, invalid: np.ndarray, row: int = 0) -> List[Dict]:
+        """Human-readable description of the invalid values of one row"""
+        return [
+            {
+                'feature': self.feature_names[j],
+                'value': float(X[row, j]),
+                'expected_range': [round(float(self.lower[j]), 6), round(float(self.upper[j]), 6)]
+            }
+            for j in np.flatnonzero(invalid[row])
+        ]
+
+    def stats(self) -> Dict:
+        """Running statistics next to the reference, with a PSI per feature"""
+        with self._lock:
+            count = self.count
+            mean = self.mean.copy()
+            m2 = self.m2.copy()
+            histogram = self.histogram.copy()
+            out_of_range = self.out_of_range.copy()
+            rows_out_of_range = self.rows_out_of_range
+
+        std = np.sqrt(m2 / count) if count else np.zeros_like(mean)
+        if count:
+            observed = np.maximum(histogram / count, PSI_EPSILON)
+            expected = np.maximum(self.reference_histogram, PSI_EPSILON)
+            psi = ((observed - expected) * np.log(observed / expected)).sum(axis=1)
+        else:
+            psi = np.zeros(len(mean))
+
+        features = {}
+        for j, name in enumerate(self.feature_names):
+            features[name] = {
+                'mean': round(float(mean[j]), 6),
+                'std': round(float(std[j]), 6),
+                'reference_mean': round(float(self.reference_mean[j]), 6),
+                'reference_std': round(float(self.reference_std[j]), 6),
+                'mean_shift_sd': round(float((mean[j] - self.reference_mean[j]) / self.reference_std[j]), 3) if count else 0.0,
+                'psi': round(float(psi[j]), 4),
+                'out_of_range': int(out_of_range[j]),
+                'reference_quantiles': dict(zip(
+                    (f"q{int(q * 100):02d}" for q in REFERENCE_QUANTILES),
+                    np.round(self.reference_quantiles[:, j], 6).tolist()
+                )),
+                'histogram': {
+                    'inner_edges': np.round(self.edges[j], 6).tolist(),
+                    'counts': histogram[j].tolist(),
+                    'reference_fraction': np.round(self.reference_histogram[j], 4).tolist()
+                }
+            }
+        return {
+            'rows_observed': count,
+            'rows_out_of_range': rows_out_of_range,
+            'pid': os.getpid(),
+            'features': features
+        }
@@ -0,0 +1,106 @@
+"""
+ONNX Runtime evaluator for the exported tabular models
+
+tools/export_onnx.py converts every tabular model into one ONNX graph with
+the production scaler and the model's feature slice fused in front of it:
+
+    raw 30 features -> StandardScaler -> first n_features -> classifier
+
+so a request is a single session.run() on the raw rows, for one row or a
+whole batch. GRU-SVM is the exception: its graph starts at the 64 GRU
+features, and the extractor in front of it stays in TensorFlow/PyTorch.
+
+The graphs carry their classes, score kind and (for forests) feature
+importances as metadata, so the wrappers below stand in for the sklearn
+estimators in TabularPredictor._score_model. ONNX Runtime computes in
+float32; tools/check_parity.py bounds the difference to sklearn.
+
+Sessions are created on first use in each process: an InferenceSession
+(and its thread pool) must not cross the gunicorn fork.
+"""
+
+import os
+import json
+import threading
+
+import numpy as np
+
+from utils.thread_limits import intra_op_threads
+
+# Metadata keys written by tools/export_onnx.py
+META_CLASSES = 'classes'
+META_SCORES = 'scores'  # 'probabilities' or 'decision'
+META_FUSED_SCALER = 'fused_scaler'
+META_FEATURE_IMPORTANCES = 'feature_importances'
+
+
+class OnnxClassifier:
+    """Exported binary classifier run through ONNX Runtime"""
+
+    def __init__(self, path: str, metadata: dict, n_features: int):
+        self.path = path
+        self.classes_ = np.asarray(json.loads(metadata[META_CLASSES]))
+        self.n_features_in_ = n_features
+        # Raw feature rows go straight in; the graph scales and slices them
+        self.fused_scaler = metadata.get(META_FUSED_SCALER) == '1'
+        if META_FEATURE_IMPORTANCES in metadata:
+            self.feature_importances_ = np.asarray(json.loads(metadata[META_FEATURE_IMPORTANCES]))
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _run(self, X) -> np.ndarray:
+        """Scores output of the graph for a (n, n_features) batch"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected input of shape (n, {self.n_features_in_}), got {X.shape}")
+        session = self.session()
+        return session.run([self._output], {self._input: X})[0]
+
+    def session(self):
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    import onnxruntime as ort
+                    options = ort.SessionOptions()
+                    options.intra_op_num_threads = intra_op_threads()
+                    options.inter_op_num_threads = 1
+                    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                    session = ort.InferenceSession(self.path, options, providers=['CPUExecutionProvider'])
+                    self._input = session.get_inputs()[0].name
+                    self._output = session.get_outputs()[1].name  # (label, scores)
+                    self._session, self._pid = session, os.getpid()
+        return self._session
+
+
+class OnnxProbabilisticClassifier(OnnxClassifier):
+    def predict_proba(self, X) -> np.ndarray:
+        return self._run(X).astype(np.float64)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+
+class OnnxDecisionClassifier(OnnxClassifier):
+    def decision_function(self, X) -> np.ndarray:
+        # skl2onnx emits binary SVC scores as [decision, -decision]
+        return self._run(X)[:, 0].astype(np.float64)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take((self.decision_function(X) > 0).astype(np.intp))
+
+
+def load_onnx_model(path: str) -> OnnxClassifier:
+    """Wrap an exported graph; raises ImportError without onnxruntime"""
+    import onnxruntime as ort
+    # Metadata only: a single-threaded session that is dropped right away,
+    # the serving session is created per process on first use
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = 1
+    probe = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+    metadata = probe.get_modelmeta().custom_metadata_map
+    n_features = probe.get_inputs()[0].shape[1]
+    del probe
+    if metadata.get(META_SCORES) == 'decision':
+        return OnnxDecisionClassifier(path, metadata, n_features)
+    return OnnxProbabilisticClassifier(path, metadata, n_features)
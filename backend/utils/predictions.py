@@ -15,15 +15,32 @@ from PIL import Image
 import io
 import base64
 import os
-from typing import List, Dict, Tuple, Optional
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Tuple, Optional, Iterator, Collection
 import joblib
 
+from utils.compiled_forest import CompiledForest
+from utils.kernel_svm import FastRBFSVC
+from utils.onnx_model import load_onnx_model
+from utils.calibration import load_calibrator
+from utils.shadow import load_shadow_scorer
+from utils.load_control import AdaptiveSelector
+from utils.thread_limits import apply_thread_limits, limit_estimator
+from utils.dicom import is_dicom, load_dicom_gray
+from utils.cam import ensemble_forward
+
 # ============================================
 # CONFIGURATION
 # ============================================
 
 USE_REAL_MODELS = True
 
+# Pre-fork serving (gunicorn.conf.py) loads the models once in the parent
+# process and shares their arrays with the workers. TensorFlow/PyTorch state is
+# not fork-safe, so the GRU extractor is then loaded in each worker instead.
+DEFER_FRAMEWORK_MODELS = os.environ.get('DEFER_FRAMEWORK_MODELS', '0') == '1'
+
 BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 MODEL_PATHS = {
@@ -37,6 +54,181 @@ MODEL_PATHS = {
     }
 }
 
+# Uncompressed copies written by `python -m tools.export_mmap`. When present
+# they are loaded with mmap_mode='r', so the weight arrays are mapped from the
+# page cache (and shared by every worker process) instead of being unpickled.
+MMAP_MODEL_DIR = os.path.join(BASE_PATH, 'models', 'mmap')
+USE_MMAP_MODELS = os.environ.get('USE_MMAP_MODELS', '1') == '1'
+
+# ONNX graphs (scaler and feature slice fused in) written by
+# `python -m tools.export_onnx` for the 'onnx' backend
+ONNX_MODEL_DIR = os.path.join(BASE_PATH, 'models', 'onnx')
+
+# Run the models of one request concurrently on a shared thread pool (the
+# GRU extractor -> GRU-SVM chain is one task). The streaming endpoints always
+# do; PARALLEL_MODELS=0 keeps the regular routes sequential.
+PARALLEL_MODELS = os.environ.get('PARALLEL_MODELS', '1') == '1'
+MODEL_THREADS = int(os.environ.get('MODEL_THREADS', '4'))
+
+# Seconds a model may take before it is reported as 'Error' and left out of
+# the vote. Per-model overrides: MODEL_TIMEOUTS="GRU-SVM=10,DenseNet=2".
+# A timed-out model keeps its pool thread until it actually returns.
+MODEL_TIMEOUT_SECONDS = float(os.environ.get('MODEL_TIMEOUT_SECONDS', '5'))
+MODEL_TIMEOUTS = {}
+for _item in filter(None, os.environ.get('MODEL_TIMEOUTS', '').split(',')):
+    _name, _, _seconds = _item.partition('=')
+    MODEL_TIMEOUTS[_name.strip()] = float(_seconds)
+# Seconds a model may wait for a pool thread on top of its timeout. Past
+# submission + this + its timeout a model is 'Error' whether it started or
+# not, so requests still fail fast when hung models hold every pool thread.
+MODEL_QUEUE_SECONDS = float(os.environ.get('MODEL_QUEUE_SECONDS', '5'))
+
+# Full-resolution tiled mammogram analysis (IMAGE_INFERENCE_MODE=tiled).
+# The breast region is cropped, tiles that are mostly background are
+# skipped, and the rest are scored in batches of TILE_BATCH_SIZE on
+# TILE_THREADS threads; tile scores are stitched into the attention map.
+TILED_INFERENCE = os.environ.get('IMAGE_INFERENCE_MODE', 'resize') == 'tiled'
+TILE_SIZE = int(os.environ.get('TILE_SIZE', '224'))
+TILE_STRIDE = int(os.environ.get('TILE_STRIDE', str(TILE_SIZE // 2)))
+TILE_BATCH_SIZE = int(os.environ.get('TILE_BATCH_SIZE', '32'))
+TILE_THREADS = int(os.environ.get('TILE_THREADS', '4'))
+# Tiles with less breast tissue than this fraction are not scored
+TILE_MIN_FOREGROUND = float(os.environ.get('TILE_MIN_FOREGROUND', '0.25'))
+# Pixels darker than this (0-255) are always background
+BACKGROUND_INTENSITY = 20
+
+# Heatmap source: 'saliency' (bright-region attention) or 'cam' (class
+# activation maps / attention rollout of the ensemble members, whose scores
+# then come from the same pass, utils/cam.py)
+HEATMAP_MODE = os.environ.get('HEATMAP_MODE', 'saliency')
+
+_model_executor = None
+_tile_executor = None
+
+
+def model_executor() -> ThreadPoolExecutor:
+    """Thread pool shared by both predictors, created on first use (after any fork)"""
+    global _model_executor
+    if _model_executor is None:
+        _model_executor = ThreadPoolExecutor(MODEL_THREADS, thread_name_prefix='model')
+    return _model_executor
+
+
+def tile_executor() -> ThreadPoolExecutor:
+    """Thread pool for tile batches; separate from the model pool it may run under"""
+    global _tile_executor
+    if _tile_executor is None:
+        _tile_executor = ThreadPoolExecutor(TILE_THREADS, thread_name_prefix='tile')
+    return _tile_executor
+
+
+class ModelTask:
+    """A model call for the pool that records when it was submitted and started"""
+
+    def __init__(self, fn, *args):
+        self.fn, self.args = fn, args
+        self.submitted = time.monotonic()
+        self.started: Optional[float] = None
+
+    def __call__(self):
+        self.started = time.monotonic()
+        return self.fn(*self.args)
+
+    def deadline(self, timeout: float) -> float:
+        """timeout after the start, but never later than the request's overall deadline"""
+        overall = self.submitted + MODEL_QUEUE_SECONDS + timeout
+        return overall if self.started is None else min(self.started + timeout, overall)
+
+
+def submit_models(calls: Dict[str, tuple]) -> Dict[str, Tuple[Future, ModelTask]]:
+    """Submit {model name: (fn, *args)} to the model pool, for iter_completed"""
+    executor = model_executor()
+    tasks = {name: ModelTask(*call) for name, call in calls.items()}
+    return {name: (executor.submit(task), task) for name, task in tasks.items()}
+
+
+def iter_completed(submitted: Dict[str, Tuple[Future, ModelTask]]) -> Iterator[Tuple[str, bool, object]]:
+    """
+    Yield (model name, timed_out, result) in completion order; a model
+    times out MODEL_TIMEOUTS.get(name, MODEL_TIMEOUT_SECONDS) after a pool
+    thread started it, so a short wait behind other requests is not counted
+    against it, and at the latest MODEL_QUEUE_SECONDS after that measured
+    from submission, started or not
+    """
+    timeouts = {name: MODEL_TIMEOUTS.get(name, MODEL_TIMEOUT_SECONDS) for name in submitted}
+    pending = dict(submitted)
+    while pending:
+        next_deadline = min(task.deadline(timeouts[name]) for name, (_, task) in pending.items())
+        done, _ = wait([future for future, _ in pending.values()],
+                       timeout=max(0.0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        now = time.monotonic()
+        for name, (future, task) in list(pending.items()):
+            if future in done:
+                del pending[name]
+                yield name, False, future.result()
+            elif now >= task.deadline(timeouts[name]):
+                del pending[name]
+                # A model still queued is dropped so it never takes a thread
+                if future.cancel():
+                    print(f"[!] {name} timed out waiting for a model thread")
+                else:
+                    print(f"[!] {name} timed out")
+                yield name, True, None
+
+
+def mmap_artifact_path(source_path: str) -> str:
+    """Location of the memory-mappable copy of a pickled model"""
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(MMAP_MODEL_DIR, name + '.joblib')
+
+
+def compiled_artifact_path(source_path: str) -> str:
+    """Location of the flat node arrays written for a compiled model"""
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(MMAP_MODEL_DIR, name + '.compiled')
+
+
+def onnx_artifact_path(source_path: str) -> str:
+    """Location of the ONNX graph exported for a pickled model"""
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(ONNX_MODEL_DIR, name + '.onnx')
+
+
+def _is_fresh(artifact_path: str, source_path: str) -> bool:
+    return os.path.getmtime(artifact_path) >= os.path.getmtime(source_path)
+
+
+def load_artifact(source_path: str):
+    """Load a pickled model, through its memory-mapped copy when available"""
+    mmap_path = mmap_artifact_path(source_path)
+    if USE_MMAP_MODELS and os.path.exists(mmap_path):
+        if _is_fresh(mmap_path, source_path):
+            return joblib.load(mmap_path, mmap_mode='r')
+        print(f"[!] Stale mmap copy ignored (re-run tools.export_mmap): {mmap_path}")
+    return joblib.load(source_path)
+
+
+# Inference backend per tabular model. 'sklearn' runs the pickled estimator;
+# 'compiled' evaluates the Random Forest from flat node arrays
+# (utils/compiled_forest.py) with bit-identical probabilities; 'native'
+# evaluates an RBF SVM with one NumPy GEMM (utils/kernel_svm.py); 'onnx'
+# runs the graph from tools/export_onnx.py in ONNX Runtime (utils/onnx_model.py).
+# Override with e.g. TABULAR_BACKENDS="Random Forest=sklearn,SVM RBF=sklearn";
+# a bare backend name (TABULAR_BACKENDS=onnx) applies to every model.
+TABULAR_MODEL_NAMES = ['GRU-SVM', 'SVM RBF', 'Random Forest', 'Neural Network L1']
+MODEL_BACKENDS = {
+    'GRU-SVM': 'native',
+    'SVM RBF': 'native',
+    'Random Forest': 'compiled',
+}
+for _item in filter(None, os.environ.get('TABULAR_BACKENDS', '').split(',')):
+    _name, _, _backend = _item.partition('=')
+    if not _backend:
+        MODEL_BACKENDS.update(dict.fromkeys(TABULAR_MODEL_NAMES, _name.strip()))
+        continue
+    MODEL_BACKENDS[_name.strip()] = _backend.strip()
+
+
 # The 10 MEAN features (indices 0-9 in the 30-feature array)
 MEAN_FEATURE_INDICES = list(range(10))  # First 10 features are the mean features
 
@@ -64,9 +256,15 @@ class TabularPredictor:
         self.scaler = None
         self.gru_extractor = None
         self.model_feature_counts = {}  # Track how many features each model needs
+        self.calibrator = None
+        self.shadow = None  # candidate models scored off the request path
+        self.selector = AdaptiveSelector('tabular')  # models to skip under overload
         
         if USE_REAL_MODELS:
             self._load_models()
+            self.calibrator = load_calibrator()
+            self._match_calibration()
+            self.shadow = load_shadow_scorer(self)
         else:
             self._setup_demo_models()
         
@@ -92,43 +290,31 @@ class TabularPredictor:
         # Load Scaler
         scaler_path = MODEL_PATHS['scaler']
         if os.path.exists(scaler_path):
-            self.scaler = joblib.load(scaler_path)
+            self.scaler = load_artifact(scaler_path)
             print(f"[OK] Loaded scaler: {scaler_path}")
         else:
             print(f"[X] Scaler not found: {scaler_path}")
         
         # Load GRU Feature Extractor (Keras/TensorFlow or PyTorch)
-        gru_path = MODEL_PATHS['tabular']['GRU Feature Extractor']
         self.gru_type = None
-        if os.path.exists(gru_path):
-            try:
-                from tensorflow.keras.models import load_model
-                self.gru_extractor = load_model(gru_path)
-                self.gru_type = 'keras'
-                print(f"[OK] Loaded GRU Feature Extractor (Keras): {gru_path}")
-            except ImportError:
-                print("[!] TensorFlow not installed, creating PyTorch GRU")
-                self._create_pytorch_gru()
-            except Exception as e:
-                print(f"[X] Error loading Keras GRU: {e}, trying PyTorch")
-                self._create_pytorch_gru()
+        if DEFER_FRAMEWORK_MODELS:
+            print("[!] GRU Feature Extractor deferred until after worker fork")
         else:
-            self._create_pytorch_gru()
+            self._load_gru_extractor()
         
         # Load sklearn models
-        sklearn_models = ['GRU-SVM', 'SVM RBF', 'Random Forest', 'Neural Network L1']
-        
-        for model_name in sklearn_models:
+        for model_name in TABULAR_MODEL_NAMES:
             model_path = MODEL_PATHS['tabular'].get(model_name)
             if model_path and os.path.exists(model_path):
                 try:
-                    model = joblib.load(model_path)
+                    backend = MODEL_BACKENDS.get(model_name, 'sklearn')
+                    model = self._load_tabular_model(model_path, backend)
                     self.models[model_name] = model
                     
                     # Detect number of features the model expects
                     n_features = self._get_model_feature_count(model)
                     self.model_feature_counts[model_name] = n_features
-                    print(f"[OK] Loaded {model_name} (expects {n_features} features)")
+                    print(f"[OK] Loaded {model_name} [{backend}] (expects {n_features} features)")
                 except Exception as e:
                     print(f"[X] Error loading {model_name}: {e}")
             else:
@@ -137,6 +323,63 @@ class TabularPredictor:
         print("="*50)
         print(f"Total models loaded: {len(self.models)}")
         print("="*50 + "\n")
+        apply_thread_limits()
+    
+    def _load_tabular_model(self, model_path: str, backend: str):
+        """Load one tabular model for the requested inference backend"""
+        if backend == 'compiled':
+            compiled_path = compiled_artifact_path(model_path)
+            if USE_MMAP_MODELS and os.path.isdir(compiled_path) and \
+                    _is_fresh(os.path.join(compiled_path, 'meta.json'), model_path):
+                return CompiledForest.load(compiled_path)
+            return CompiledForest.from_sklearn(load_artifact(model_path))
+        if backend == 'native':
+            return FastRBFSVC.from_sklearn(load_artifact(model_path))
+        if backend == 'onnx':
+            onnx_path = onnx_artifact_path(model_path)
+            if not os.path.exists(onnx_path):
+                print(f"[!] No ONNX export (run tools.export_onnx), using sklearn: {onnx_path}")
+            elif not (_is_fresh(onnx_path, model_path) and _is_fresh(onnx_path, MODEL_PATHS['scaler'])):
+                print(f"[!] Stale ONNX export ignored (re-run tools.export_onnx): {onnx_path}")
+            else:
+                try:
+                    return load_onnx_model(onnx_path)
+                except ImportError:
+                    print("[!] onnxruntime not installed, using sklearn")
+        return limit_estimator(load_artifact(model_path))
+    
+    def _load_gru_extractor(self):
+        """Load the Keras GRU, falling back to a PyTorch GRU"""
+        gru_path = MODEL_PATHS['tabular']['GRU Feature Extractor']
+        if os.path.exists(gru_path):
+            try:
+                import tensorflow  # noqa: F401
+                apply_thread_limits()  # must precede the TF runtime start
+                from tensorflow.keras.models import load_model
+                self.gru_extractor = load_model(gru_path)
+                self.gru_type = 'keras'
+                print(f"[OK] Loaded GRU Feature Extractor (Keras): {gru_path}")
+            except ImportError:
+                print("[!] TensorFlow not installed, creating PyTorch GRU")
+                self._create_pytorch_gru()
+            except Exception as e:
+                print(f"[X] Error loading Keras GRU: {e}, trying PyTorch")
+                self._create_pytorch_gru()
+        else:
+            self._create_pytorch_gru()
+        # TensorFlow/PyTorch size their pools on first use
+        apply_thread_limits()
+    
+    def load_deferred_models(self):
+        """Load the models skipped by DEFER_FRAMEWORK_MODELS (call after fork)"""
+        if USE_REAL_MODELS and self.gru_extractor is None:
+            self._load_gru_extractor()
+            self._match_calibration()
+    
+    def _match_calibration(self):
+        """GRU-SVM's calibration only holds for the extractor it was fitted with"""
+        if self.calibrator is not None:
+            self.calibrator.use_extractor('GRU-SVM', self.gru_type)
     
     def _create_pytorch_gru(self):
         """Create a PyTorch GRU to transform 30 features -> 64 features for GRU-SVM"""
@@ -203,107 +446,268 @@ class TabularPredictor:
             return features[:, :n_features]
         return features
     
-    def predict(self, features: np.ndarray) -> List[Dict]:
-        """Run prediction through all models"""
+    def predict(self, features: np.ndarray, skip: Collection[str] = (), sequential: bool = False) -> List[Dict]:
+        """
+        Run prediction through all models (except those in skip)
+        sequential=True runs them one after another on the calling thread
+        (profiled requests, whose sampler only watches that thread)
+        """
         if USE_REAL_MODELS and self.models:
-            return self._predict_with_real_models(features)
+            return self._predict_with_real_models(features, skip, sequential)
         else:
             return self._predict_demo(features)
     
-    def _predict_with_real_models(self, features: np.ndarray) -> List[Dict]:
+    def _predict_with_real_models(self, features: np.ndarray, skip: Collection[str] = (),
+                                  sequential: bool = False) -> List[Dict]:
         """Predict using your actual trained models"""
         predictions = []
+        models = self._active_models(skip)
+        live_malignant = {}  # raw labels for the shadow scorer
+        
+        if PARALLEL_MODELS and not sequential:
+            results = dict(self._run_concurrently(features, models, live_malignant))
+            outputs = (results[model_name] for model_name in models)
+        else:
+            outputs = (self._predict_one(model_name, model, features, live_malignant)
+                       for model_name, model in models.items())
+        for prediction in outputs:
+            if prediction is not None:
+                predictions.append(prediction)
+        if self.shadow is not None:
+            self.shadow.submit(features, live_malignant)
+        
+        # Add ensemble prediction if we have multiple successful predictions
+        ensemble = self._ensemble(predictions)
+        if ensemble is not None:
+            predictions.append(ensemble)
+        
+        return predictions
+    
+    def iter_predictions(self, features: np.ndarray, skip: Collection[str] = ()) -> Iterator[Tuple[str, Dict]]:
+        """
+        Yield ('model', prediction) for each model as soon as it finishes,
+        running the models concurrently, then ('ensemble', prediction)
+        """
+        if not (USE_REAL_MODELS and self.models):
+            for prediction in self._predict_demo(features):
+                yield 'model', prediction
+            return
+        
+        predictions = []
+        live_malignant = {}
+        for model_name, prediction in self._run_concurrently(features, self._active_models(skip), live_malignant):
+            if prediction is not None:
+                predictions.append(prediction)
+                yield 'model', prediction
+        if self.shadow is not None:
+            self.shadow.submit(features, live_malignant)
+        
+        ensemble = self._ensemble(predictions)
+        if ensemble is not None:
+            yield 'ensemble', ensemble
+    
+    def _active_models(self, skip: Collection[str]) -> Dict:
+        return {name: model for name, model in self.models.items() if name not in skip}
+    
+    def _run_concurrently(self, features: np.ndarray, models: Dict,
+                          live_malignant: Optional[Dict] = None) -> Iterator[Tuple[str, Optional[Dict]]]:
+        """(model name, prediction) in completion order; timeouts become 'Error'"""
+        submitted = submit_models({
+            model_name: (self._predict_one, model_name, model, features, live_malignant)
+            for model_name, model in models.items()
+        })
+        for model_name, timed_out, prediction in iter_completed(submitted):
+            if timed_out:
+                prediction = {'model': model_name, 'prediction': 'Error', 'confidence': 0}
+            yield model_name, prediction
+    
+    def _predict_one(self, model_name: str, model, features: np.ndarray,
+                     live_malignant: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Single-row prediction of one model; None for models that are skipped
+        The raw is-malignant array is stored in live_malignant[model_name]
+        """
+        try:
+            start = time.perf_counter()
+            scores = self._score_model(model_name, model, features)
+            self.selector.record_model(model_name, (time.perf_counter() - start) * 1000)
+            if scores is None:
+                return None
+            is_malignant, confidence, malignancy = scores
+            if live_malignant is not None:
+                live_malignant[model_name] = is_malignant
+            if self.calibrator is not None and self.calibrator.covers([model_name]):
+                probability = self.calibrator.probabilities([model_name], malignancy[:, None])[0, 0]
+                if not np.isnan(probability):
+                    # Label, confidence and probability from the same calibrated score
+                    return _format_calibrated(model_name, float(probability))
+            return _format_prediction(model_name, is_malignant[0], confidence[0])
+            
+        except Exception as e:
+            print(f"Error with {model_name}: {e}")
+            return {
+                'model': model_name,
+                'prediction': 'Error',
+                'confidence': 0
+            }
+    
+    def _ensemble(self, predictions: List[Dict]) -> Optional[Dict]:
+        """
+        Calibrated soft vote when every successful model has a calibrated
+        probability, otherwise the majority vote. Models the calibrator
+        excludes (GRU-SVM on another extractor) do not take part in the soft vote.
+        """
+        if self.calibrator is None:
+            return _ensemble_vote(predictions)
+        voters = [p for p in predictions
+                  if p['prediction'] != 'Error' and p['model'] not in self.calibrator.excluded]
+        if len(voters) < 2 or not all('probability' in p for p in voters):
+            return _ensemble_vote(predictions)
+        
+        names = [p['model'] for p in voters]
+        probs = np.array([[p['probability'] / 100 for p in voters]])
+        probability = float(self.calibrator.combine(names, probs)[0])
+        return _format_calibrated('Ensemble (Calibrated)', probability)
+    
+    def _score_model(self, model_name: str, model, features: np.ndarray,
+                     n_features: Optional[int] = None) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Score a batch of raw feature rows with one model
+        Returns (is_malignant, confidence in 0-1, malignancy score) arrays, or
+        None if the model cannot run (GRU-SVM without its feature extractor).
+        The malignancy score is P(malignant) for probabilistic models and the
+        decision value towards malignant for SVMs (NaN if neither exists);
+        tools.fit_calibration maps it to a calibrated probability.
+        n_features overrides the input width registered for model_name
+        (shadow candidates).
+        """
+        # Get number of features this model expects
+        if n_features is None:
+            n_features = self.model_feature_counts.get(model_name, 30)
+        
+        # Special handling for GRU-SVM (needs GRU feature extractor)
+        if model_name == 'GRU-SVM':
+            if self.gru_extractor is None:
+                # Skip GRU-SVM if no extractor available
+                return None
+            model_input = self._extract_gru_features(features)
+            default_confidence = 0.90
+        elif getattr(model, 'fused_scaler', False):
+            # ONNX graph: scaling and feature selection are part of the model
+            model_input = features
+            default_confidence = 0.85
+        else:
+            # Scale and select correct number of features
+            model_input = self.preprocess(features, n_features)
+            default_confidence = 0.85
         
+        # Labels and confidence are derived from the same single evaluation
+        # (predict_proba or decision_function) as the malignancy score
+        malignant_class = _malignant_mask(model.classes_)
+        if hasattr(model, 'predict_proba'):
+            proba = model.predict_proba(model_input)
+            pred = model.classes_.take(np.argmax(proba, axis=1))
+            confidence = proba.max(axis=1)
+            malignancy = proba[:, malignant_class].sum(axis=1)
+        elif hasattr(model, 'decision_function'):
+            decision = model.decision_function(model_input)
+            pred = model.classes_.take((decision > 0).astype(np.intp))
+            confidence = 1 / (1 + np.exp(-np.abs(decision)))
+            # Binary decision values point towards classes_[1]
+            malignancy = decision if malignant_class[1] else -decision
+        else:
+            pred = model.predict(model_input)
+            confidence = np.full(len(pred), default_confidence)
+            malignancy = np.full(len(pred), np.nan)
+        
+        return _malignant_mask(pred), np.asarray(confidence, dtype=np.float64), np.asarray(malignancy, dtype=np.float64)
+    
+    def _extract_gru_features(self, features: np.ndarray) -> np.ndarray:
+        """Run the GRU feature extractor on a batch (64 features per row)"""
+        scaled_30 = self.preprocess(features, 30)
+        # The Keras GRU turns NaN into finite features; fail like the other models
+        if not np.isfinite(scaled_30).all():
+            raise ValueError("Input contains NaN or infinity")
+        
+        if self.gru_type == 'keras':
+            # Keras GRU; shape the input the way the saved model
+            # declares it, e.g. (None, 10, 1) = mean features as a sequence
+            _, steps, width = self.gru_extractor.input_shape
+            gru_input = scaled_30[:, :steps * width].reshape(-1, steps, width)
+            return self.gru_extractor.predict(gru_input, verbose=0)
+        
+        # PyTorch GRU
+        import torch
+        gru_input = torch.FloatTensor(scaled_30).reshape(-1, 1, 30)
+        with torch.no_grad():
+            return self.gru_extractor(gru_input).numpy()
+    
+    def predict_batch(self, features: np.ndarray) -> Dict:
+        """
+        Vectorized prediction for a (n, 30) batch
+        Each model scores the whole batch in one call. Returns per-model
+        malignancy flags (1.0/0.0, NaN where the model failed) and confidences
+        in percent, plus the ensemble per row: the calibrated soft vote when
+        calibration is available, else the majority vote and mean confidence.
+        """
+        if not (USE_REAL_MODELS and self.models):
+            return self._predict_batch_demo(features)
+        
+        n_rows = features.shape[0]
+        names, flags, confidences, malignancies = [], [], [], []
+        live_malignant = {}
         for model_name, model in self.models.items():
             try:
-                # Get number of features this model expects
-                n_features = self.model_feature_counts.get(model_name, 30)
-                
-                # Special handling for GRU-SVM (needs GRU feature extractor)
-                if model_name == 'GRU-SVM':
-                    if self.gru_extractor is not None:
-                        # Use GRU to extract features
-                        scaled_30 = self.preprocess(features, 30)
-                        
-                        if self.gru_type == 'keras':
-                            # Keras GRU
-                            gru_input = scaled_30.reshape(1, 1, 30)
-                            gru_features = self.gru_extractor.predict(gru_input, verbose=0)
-                        else:
-                            # PyTorch GRU
-                            import torch
-                            gru_input = torch.FloatTensor(scaled_30).reshape(1, 1, 30)
-                            with torch.no_grad():
-                                gru_features = self.gru_extractor(gru_input).numpy()
-                        
-                        pred = model.predict(gru_features)[0]
-                        
-                        if hasattr(model, 'decision_function'):
-                            decision = model.decision_function(gru_features)[0]
-                            confidence = 1 / (1 + np.exp(-abs(decision)))
-                        else:
-                            confidence = 0.90
-                    else:
-                        # Skip GRU-SVM if no extractor available
-                        continue
-                else:
-                    # Scale and select correct number of features
-                    scaled_features = self.preprocess(features, n_features)
-                    
-                    # Predict
-                    pred = model.predict(scaled_features)[0]
-                    
-                    # Get confidence/probability
-                    if hasattr(model, 'predict_proba'):
-                        proba = model.predict_proba(scaled_features)[0]
-                        confidence = max(proba)
-                    elif hasattr(model, 'decision_function'):
-                        try:
-                            decision = model.decision_function(scaled_features)[0]
-                            confidence = 1 / (1 + np.exp(-abs(decision)))
-                        except:
-                            confidence = 0.85
-                    else:
-                        confidence = 0.85
-                
-                # Handle different label formats
-                if isinstance(pred, str):
-                    is_malignant = pred.upper() in ['M', 'MALIGNANT', '1']
-                else:
-                    is_malignant = int(pred) == 1
-                
-                # Ensure confidence is between 0-100%
-                conf_percent = min(100.0, max(0.0, float(confidence) * 100))
-                
-                predictions.append({
-                    'model': model_name,
-                    'prediction': 'Malignant' if is_malignant else 'Benign',
-                    'confidence': round(conf_percent, 1)
-                })
-                
+                scores = self._score_model(model_name, model, features)
+                if scores is None:
+                    continue
+                is_malignant, confidence, malignancy = scores
+                live_malignant[model_name] = is_malignant
+                flags.append(is_malignant.astype(np.float64))
+                confidences.append(np.clip(confidence * 100, 0.0, 100.0))
+                malignancies.append(malignancy)
             except Exception as e:
                 print(f"Error with {model_name}: {e}")
-                predictions.append({
-                    'model': model_name,
-                    'prediction': 'Error',
-                    'confidence': 0
-                })
+                flags.append(np.full(n_rows, np.nan))
+                confidences.append(np.zeros(n_rows))
+                malignancies.append(np.full(n_rows, np.nan))
+            names.append(model_name)
         
-        # Add ensemble prediction if we have multiple successful predictions
-        valid_preds = [p for p in predictions if p['prediction'] != 'Error']
-        if len(valid_preds) >= 2:
-            malignant_votes = sum(1 for p in valid_preds if p['prediction'] == 'Malignant')
-            ensemble_pred = 'Malignant' if malignant_votes > len(valid_preds) / 2 else 'Benign'
-            avg_conf = np.mean([p['confidence'] for p in valid_preds])
-            # Ensure ensemble confidence is between 0-100%
-            avg_conf = min(100.0, max(0.0, avg_conf))
-            predictions.append({
-                'model': 'Ensemble (Voting)',
-                'prediction': ensemble_pred,
-                'confidence': round(avg_conf, 1)
-            })
+        if self.shadow is not None:
+            self.shadow.submit(features, live_malignant)
         
-        return predictions
+        malignant = np.column_stack(flags) if flags else np.empty((n_rows, 0))
+        confidence = np.column_stack(confidences) if confidences else np.empty((n_rows, 0))
+        result = _batch_vote(names, malignant, confidence)
+        
+        voters = [name for name in names if self.calibrator is None or name not in self.calibrator.excluded]
+        if self.calibrator is not None and len(voters) >= 2 and self.calibrator.covers(voters):
+            # All calibrated probabilities as one matrix (NaN for excluded
+            # models), then the weighted soft vote
+            probs = self.calibrator.probabilities(names, np.column_stack(malignancies))
+            # Per-model labels and confidences from the calibrated scores, as
+            # in single predictions
+            calibrated = ~np.isnan(probs)
+            result['malignant'] = np.where(calibrated, (probs >= 0.5).astype(np.float64), result['malignant'])
+            result['confidence'] = np.where(
+                calibrated, round_confidence(np.maximum(probs, 1 - probs) * 100), result['confidence']
+            )
+            # The soft vote of single predictions sees their rounded probabilities
+            probability = self.calibrator.combine(names, round_confidence(probs * 100) / 100)
+            has_vote = ~np.isnan(probability)
+            result['final_malignant'] = np.where(has_vote, (probability >= 0.5).astype(np.float64), np.nan)
+            result['final_confidence'] = np.where(
+                has_vote, round_confidence(np.maximum(probability, 1 - probability) * 100), 0.0
+            )
+        return result
+    
+    def _predict_batch_demo(self, features: np.ndarray) -> Dict:
+        """Demo batch predictions (fallback), one row at a time"""
+        rows = [self._predict_demo(features[i:i + 1]) for i in range(features.shape[0])]
+        names = [p['model'] for p in rows[0]] if rows else [m['name'] for m in self.model_configs]
+        malignant = np.array([[p['prediction'] == 'Malignant' for p in row] for row in rows], dtype=np.float64)
+        confidence = np.array([[p['confidence'] for p in row] for row in rows], dtype=np.float64)
+        return _batch_vote(names, malignant.reshape(-1, len(names)), confidence.reshape(-1, len(names)))
     
     def _predict_demo(self, features: np.ndarray) -> List[Dict]:
         """Demo predictions (fallback)"""
@@ -387,6 +791,82 @@ class TabularPredictor:
         }
 
 
+def _malignant_mask(labels) -> np.ndarray:
+    """Map model labels (0/1 or 'M'/'Malignant'-style strings) to booleans"""
+    labels = np.asarray(labels)
+    if labels.dtype.kind in 'OUS':
+        return np.isin(np.char.upper(labels.astype(str)), ['M', 'MALIGNANT', '1'])
+    return labels.astype(int) == 1
+
+
+def round_confidence(percent):
+    """Confidences and probabilities (in percent) as reported by every route: 0.1 steps"""
+    return np.round(percent, 1)
+
+
+def _format_prediction(model_name: str, is_malignant: bool, confidence: float) -> Dict:
+    """Per-model prediction entry as returned by the API"""
+    # Ensure confidence is between 0-100%
+    conf_percent = min(100.0, max(0.0, float(confidence) * 100))
+    
+    return {
+        'model': model_name,
+        'prediction': 'Malignant' if is_malignant else 'Benign',
+        'confidence': float(round_confidence(conf_percent))
+    }
+
+
+def _ensemble_vote(predictions: List[Dict]) -> Optional[Dict]:
+    """'Ensemble (Voting)' entry over the successful predictions (needs two)"""
+    valid_preds = [p for p in predictions if p['prediction'] != 'Error']
+    if len(valid_preds) < 2:
+        return None
+    malignant_votes = sum(1 for p in valid_preds if p['prediction'] == 'Malignant')
+    ensemble_pred = 'Malignant' if malignant_votes > len(valid_preds) / 2 else 'Benign'
+    avg_conf = np.mean([p['confidence'] for p in valid_preds])
+    # Ensure ensemble confidence is between 0-100%
+    avg_conf = min(100.0, max(0.0, avg_conf))
+    return {
+        'model': 'Ensemble (Voting)',
+        'prediction': ensemble_pred,
+        'confidence': float(round_confidence(avg_conf))
+    }
+
+
+def _format_calibrated(model_name: str, probability: float) -> Dict:
+    """Entry whose label and confidence follow from a calibrated P(malignant)"""
+    is_malignant = probability >= 0.5
+    confidence = probability if is_malignant else 1 - probability
+    return {
+        'model': model_name,
+        'prediction': 'Malignant' if is_malignant else 'Benign',
+        'confidence': float(round_confidence(confidence * 100)),
+        'probability': float(round_confidence(probability * 100))
+    }
+
+
+def _batch_vote(names: List[str], malignant: np.ndarray, confidence: np.ndarray) -> Dict:
+    """Majority vote and mean confidence per row, ignoring failed models"""
+    valid = ~np.isnan(malignant)
+    n_valid = valid.sum(axis=1)
+    votes = np.where(valid, malignant, 0.0).sum(axis=1)
+    has_votes = n_valid > 0
+    
+    final_malignant = np.where(has_votes, (votes > n_valid / 2).astype(np.float64), np.nan)
+    final_confidence = np.where(
+        has_votes,
+        np.where(valid, confidence, 0.0).sum(axis=1) / np.maximum(n_valid, 1),
+        0.0
+    )
+    return {
+        'models': names,
+        'malignant': malignant,
+        'confidence': confidence,
+        'final_malignant': final_malignant,
+        'final_confidence': final_confidence
+    }
+
+
 # ============================================
 # IMAGE PREDICTOR CLASS
 # ============================================
@@ -403,52 +883,207 @@ class ImagePredictor:
             {'name': 'EfficientNet', 'weight': 0.90},
             {'name': 'Ensemble', 'weight': 0.94}
         ]
+        self.selector = AdaptiveSelector('image')  # models to skip under overload
     
-    def predict(self, image_bytes: bytes) -> Tuple[List[Dict], str]:
-        """Predict from mammogram image"""
-        base_score, attention_map = self._analyze_image(image_bytes)
-        predictions = []
+    def predict(self, image_bytes: bytes, skip: Collection[str] = (),
+                sequential: bool = False) -> Tuple[List[Dict], str]:
+        """
+        Predict from mammogram image (models in skip are left out)
+        sequential=True keeps all work on the calling thread (profiled requests)
+        """
+        models = [model for model in self.model_configs if model['name'] not in skip]
+        base_score, attention_map, member_scores = self._analyze_image(image_bytes, models, sequential)
+        if not PARALLEL_MODELS or sequential:
+            predictions = [self._score_model(model, base_score, member_scores) for model in models]
+            return predictions, self._create_heatmap_overlay(image_bytes, attention_map)
         
-        for model in self.model_configs:
-            if model['name'] == 'Ensemble':
-                model_score = base_score
-            else:
-                variance = np.random.uniform(-0.15, 0.15)
-                model_score = base_score + variance * (1 - model['weight'])
-            
-            model_score = max(0.1, min(0.98, model_score))
-            is_malignant = model_score > 0.5
-            confidence = model_score if is_malignant else (1 - model_score)
-            confidence = max(0.52, min(0.98, confidence))
-            
-            predictions.append({
-                'model': model['name'],
-                'prediction': 'Malignant' if is_malignant else 'Benign',
-                'confidence': round(confidence * 100, 1)
-            })
+        # The heatmap is rendered while the models run
+        heatmap = model_executor().submit(self._create_heatmap_overlay, image_bytes, attention_map)
+        results = dict(self._run_concurrently(models, base_score, member_scores))
+        predictions = [results[model['name']] for model in models]
+        return predictions, heatmap.result()
+    
+    def iter_predictions(self, image_bytes: bytes, skip: Collection[str] = ()) -> Iterator[Tuple[str, object]]:
+        """
+        Yield ('model', prediction) per vision model as soon as it finishes,
+        running the models concurrently, then ('ensemble', prediction) and
+        finally ('heatmap', base64 PNG)
+        """
+        ensemble = next((m for m in self.model_configs if m['name'] == 'Ensemble'), None)
+        models = [model for model in self.model_configs if model is not ensemble and model['name'] not in skip]
+        base_score, attention_map, member_scores = self._analyze_image(image_bytes, models)
+        for _, prediction in self._run_concurrently(models, base_score, member_scores):
+            yield 'model', prediction
         
-        heatmap_base64 = self._create_heatmap_overlay(image_bytes, attention_map)
-        return predictions, heatmap_base64
+        if ensemble is not None:
+            yield 'ensemble', self._score_model(ensemble, base_score, member_scores)
+        yield 'heatmap', self._create_heatmap_overlay(image_bytes, attention_map)
+    
+    def _run_concurrently(self, models: List[Dict], base_score: float,
+                          member_scores: Optional[Dict[str, float]] = None) -> Iterator[Tuple[str, Dict]]:
+        """(model name, prediction) in completion order; timeouts become 'Error'"""
+        submitted = submit_models({
+            model['name']: (self._score_model, model, base_score, member_scores) for model in models
+        })
+        for model_name, timed_out, prediction in iter_completed(submitted):
+            if timed_out:
+                prediction = {'model': model_name, 'prediction': 'Error', 'confidence': 0}
+            yield model_name, prediction
+    
+    def _score_model(self, model: Dict, base_score: float,
+                     member_scores: Optional[Dict[str, float]] = None) -> Dict:
+        """Prediction of one vision model from the shared image analysis"""
+        start = time.perf_counter()
+        prediction = self._predict_model(model, base_score, member_scores)
+        self.selector.record_model(model['name'], (time.perf_counter() - start) * 1000)
+        return prediction
     
-    def _analyze_image(self, image_bytes: bytes) -> Tuple[float, np.ndarray]:
-        """Analyze image"""
+    def _predict_model(self, model: Dict, base_score: float,
+                       member_scores: Optional[Dict[str, float]] = None) -> Dict:
+        if member_scores and model['name'] in member_scores:
+            # HEATMAP_MODE=cam: from the same pass as the heatmap
+            model_score = member_scores[model['name']]
+        elif model['name'] == 'Ensemble':
+            model_score = base_score
+        else:
+            variance = np.random.uniform(-0.15, 0.15)
+            model_score = base_score + variance * (1 - model['weight'])
+        
+        model_score = max(0.1, min(0.98, model_score))
+        is_malignant = model_score > 0.5
+        confidence = model_score if is_malignant else (1 - model_score)
+        confidence = max(0.52, min(0.98, confidence))
+        
+        return {
+            'model': model['name'],
+            'prediction': 'Malignant' if is_malignant else 'Benign',
+            'confidence': round(confidence * 100, 1)
+        }
+    
+    def _load_gray(self, image_bytes: bytes, full_resolution: bool = False) -> np.ndarray:
+        """
+        Grayscale image (0-255) for the analysis and the heatmap overlay:
+        224x224, or as stored with full_resolution. DICOM uploads are windowed
+        and downsampled on their 16-bit pixel data (utils/dicom.py).
+        """
+        if is_dicom(image_bytes):
+            if full_resolution:
+                return load_dicom_gray(image_bytes)
+            gray = load_dicom_gray(image_bytes, max_side=224)
+            return np.asarray(Image.fromarray(gray).resize((224, 224), Image.BILINEAR))
+        image = Image.open(io.BytesIO(image_bytes))
+        if full_resolution:
+            return np.asarray(image.convert('L'), dtype=np.float32)
+        return np.mean(np.array(image.convert('RGB').resize((224, 224))), axis=2)
+    
+    def _analyze_image(self, image_bytes: bytes, models: Optional[List[Dict]] = None,
+                       sequential: bool = False) -> Tuple[float, np.ndarray, Dict[str, float]]:
+        """
+        Analyze image: (base score, attention map, member scores)
+        With HEATMAP_MODE=cam the given models are scored by the forward pass
+        that explains them (member scores); otherwise member scores is empty
+        """
+        # Malformed or unsupported DICOM is an error, not a random guess
+        dicom = is_dicom(image_bytes)
+        if TILED_INFERENCE:
+            try:
+                gray = self._load_gray(image_bytes, full_resolution=True)
+                if min(gray.shape) >= TILE_SIZE:
+                    return (*self._analyze_tiled(gray, sequential), {})
+            except Exception:
+                if dicom:
+                    raise
+                return 0.5, np.random.rand(224, 224), {}
+        
         try:
-            image = Image.open(io.BytesIO(image_bytes))
-            image = image.convert('RGB')
-            image = image.resize((224, 224))
-            img_array = np.array(image)
-            
-            gray = np.mean(img_array, axis=2)
+            gray = self._load_gray(image_bytes)
             std_intensity = np.std(gray)
             
             score = 0.5 + (std_intensity / 255) * 0.3 + np.random.uniform(-0.2, 0.2)
             score = max(0.1, min(0.95, score))
             
-            attention_map = self._generate_attention_map(gray)
-            return score, attention_map
+            if HEATMAP_MODE == 'cam':
+                member_scores, attention_map = ensemble_forward(
+                    gray, self.model_configs if models is None else models
+                )
+                return score, attention_map, member_scores
+            return score, self._generate_attention_map(gray), {}
             
         except Exception:
-            return 0.5, np.random.rand(224, 224)
+            if dicom:
+                raise
+            return 0.5, np.random.rand(224, 224), {}
+    
+    def _analyze_tiled(self, gray: np.ndarray, sequential: bool = False) -> Tuple[float, np.ndarray]:
+        """
+        Score a full-resolution grayscale mammogram tile by tile
+        Returns the image score and an attention map of the image's size
+        (sequential=True scores the batches on the calling thread)
+        """
+        foreground = gray > _foreground_threshold(gray)
+        attention = np.zeros(gray.shape, dtype=np.float32)
+        if not foreground.any():
+            return 0.5, attention
+        
+        # Crop to the breast region
+        rows, cols = np.flatnonzero(foreground.any(axis=1)), np.flatnonzero(foreground.any(axis=0))
+        top, bottom = rows[0], max(rows[-1] + 1, rows[0] + TILE_SIZE)
+        left, right = cols[0], max(cols[-1] + 1, cols[0] + TILE_SIZE)
+        top, left = min(top, gray.shape[0] - TILE_SIZE), min(left, gray.shape[1] - TILE_SIZE)
+        crop, crop_mask = gray[top:bottom, left:right], foreground[top:bottom, left:right]
+        
+        # Tissue fraction of every tile from one summed-area table
+        tile_area = TILE_SIZE * TILE_SIZE
+        ys = _tile_starts(crop.shape[0])
+        xs = _tile_starts(crop.shape[1])
+        sat = np.pad(crop_mask.cumsum(0).cumsum(1), ((1, 0), (1, 0)))
+        y0, x0 = np.meshgrid(ys, xs, indexing='ij')
+        y1, x1 = y0 + TILE_SIZE, x0 + TILE_SIZE
+        tissue = (sat[y1, x1] - sat[y0, x1] - sat[y1, x0] + sat[y0, x0]) / tile_area
+        keep = tissue >= TILE_MIN_FOREGROUND
+        origins = np.stack([y0[keep], x0[keep]], axis=1)
+        if len(origins) == 0:
+            return 0.5, attention
+        
+        # Score the remaining tiles in batches
+        batches = [origins[i:i + TILE_BATCH_SIZE] for i in range(0, len(origins), TILE_BATCH_SIZE)]
+        batch_map = map if sequential else tile_executor().map
+        scores = np.concatenate(list(batch_map(
+            lambda batch: self._score_tiles(_gather_tiles(crop, batch), _gather_tiles(crop_mask, batch)),
+            batches
+        )))
+        
+        # Stitch: average the scores of the tiles overlapping each pixel
+        total = np.zeros(crop.shape, dtype=np.float32)
+        count = np.zeros(crop.shape, dtype=np.float32)
+        for (y, x), score in zip(origins, scores):
+            total[y:y + TILE_SIZE, x:x + TILE_SIZE] += score
+            count[y:y + TILE_SIZE, x:x + TILE_SIZE] += 1
+        stitched = np.divide(total, count, out=np.zeros_like(total), where=count > 0)
+        stitched *= crop_mask
+        if stitched.max() > 0:
+            stitched /= stitched.max()
+        attention[top:bottom, left:right] = stitched
+        
+        # The most suspicious tiles drive the image score
+        suspicion = float(np.percentile(scores, 90))
+        score = 0.5 + suspicion * 0.3 + np.random.uniform(-0.2, 0.2)
+        score = max(0.1, min(0.95, score))
+        return score, attention
+    
+    def _score_tiles(self, tiles: np.ndarray, masks: np.ndarray) -> np.ndarray:
+        """
+        Suspicion score in [0, 1] for a (batch, TILE_SIZE, TILE_SIZE) stack
+        Local contrast plus small bright spots (microcalcification-like),
+        measured over the tissue pixels given by masks only
+        """
+        flat = tiles.reshape(len(tiles), -1)
+        weights = masks.reshape(len(masks), -1).astype(np.float32)
+        n_tissue = np.maximum(weights.sum(axis=1), 1.0)
+        mean = (flat * weights).sum(axis=1) / n_tissue
+        contrast = np.sqrt(((flat - mean[:, None]) ** 2 * weights).sum(axis=1) / n_tissue) / 255
+        bright_spots = (np.where(weights > 0, flat, 0.0).max(axis=1) - mean) / 255
+        return np.clip(0.5 * contrast + 0.5 * bright_spots, 0.0, 1.0)
     
     def _generate_attention_map(self, gray_image: np.ndarray) -> np.ndarray:
         """Generate attention heatmap"""
@@ -480,10 +1115,20 @@ class ImagePredictor:
             matplotlib.use('Agg')
             import matplotlib.cm as cm
             
-            image = Image.open(io.BytesIO(image_bytes))
-            image = image.convert('RGB')
-            image = image.resize((224, 224))
-            img_array = np.array(image)
+            if is_dicom(image_bytes):
+                gray = self._load_gray(image_bytes).astype(np.uint8)
+                img_array = np.repeat(gray[:, :, None], 3, axis=2)
+            else:
+                image = Image.open(io.BytesIO(image_bytes))
+                image = image.convert('RGB')
+                image = image.resize((224, 224))
+                img_array = np.array(image)
+            
+            if attention_map.shape != img_array.shape[:2]:
+                # Full-resolution maps from tiled inference
+                attention_map = np.asarray(
+                    Image.fromarray(attention_map.astype(np.float32)).resize((224, 224), Image.BILINEAR)
+                )
             
             heatmap = cm.jet(attention_map)[:, :, :3]
             heatmap = (heatmap * 255).astype(np.uint8)
@@ -500,3 +1145,25 @@ class ImagePredictor:
             
         except Exception:
             return ""
+
+
+def _foreground_threshold(gray: np.ndarray) -> float:
+    """
+    Intensity separating breast tissue from background
+    Same percentile idea as _generate_attention_map, at the low end of the
+    histogram, with a floor for mostly-tissue images
+    """
+    return max(BACKGROUND_INTENSITY, float(np.percentile(gray, 30)) * 0.5)
+
+
+def _tile_starts(length: int) -> np.ndarray:
+    """Tile origins covering [0, length), the last tile flush with the edge"""
+    starts = np.arange(0, length - TILE_SIZE + 1, TILE_STRIDE)
+    if starts[-1] != length - TILE_SIZE:
+        starts = np.append(starts, length - TILE_SIZE)
+    return starts
+
+
+def _gather_tiles(image: np.ndarray, origins: np.ndarray) -> np.ndarray:
+    """(len(origins), TILE_SIZE, TILE_SIZE) stack of tiles cut from image"""
+    return np.stack([image[y:y + TILE_SIZE, x:x + TILE_SIZE] for y, x in origins])
@@ -0,0 +1,233 @@
+"""
+On-demand request profiling
+
+Profiles a single live request when the caller asks for it (header
+`X-Profile: 1` or query `?profile=1`) and the server allows it
+(PROFILING_ENABLED=1). Two things are recorded:
+- a sampled call stack in collapsed ("folded") format, which flamegraph.pl,
+  speedscope and inferno read directly
+- tracemalloc allocation statistics for the backend code paths
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '0') == '1'
+
+# Optional shared secret; when set, callers must send it in X-Profile-Token
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN')
+
+# Seconds between stack samples. The sampled thread only yields the GIL every
+# sys.getswitchinterval() seconds, so values below that add no resolution.
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', '0.005'))
+
+# Routes that may be profiled
+PROFILED_PATH_PREFIXES = ('/predict/', '/report/generate')
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILES_DIR = os.path.join(BASE_PATH, 'profiles')
+MAX_STORED_PROFILES = 50
+
+# Stack depth kept per allocation. Allocations made inside numpy/sklearn are
+# attributed to the innermost backend frame, so this must reach past the
+# library frames. Tracing slows the profiled request down; 0 disables it.
+PROFILE_TRACEMALLOC_FRAMES = int(os.environ.get('PROFILE_TRACEMALLOC_FRAMES', '16'))
+
+# Allocation statistics are limited to the predictor and report code
+ALLOCATION_FILTERS = [
+    tracemalloc.Filter(True, os.path.join(BASE_PATH, 'utils', '*'), all_frames=True),
+    tracemalloc.Filter(True, os.path.join(BASE_PATH, 'main.py'), all_frames=True),
+    tracemalloc.Filter(False, __file__),
+]
+BACKEND_SOURCES = (os.path.join(BASE_PATH, 'utils') + os.sep, os.path.join(BASE_PATH, 'main.py'))
+TOP_ALLOCATIONS = 25
+
+# Only one request is profiled at a time so samples are not mixed
+_profile_lock = threading.Lock()
+
+
+def is_profiling_requested(headers, query_params) -> bool:
+    """Check whether a request opted in and is allowed to be profiled"""
+    if not PROFILING_ENABLED:
+        return False
+    flag = headers.get('x-profile') or query_params.get('profile')
+    if flag not in ('1', 'true', 'yes'):
+        return False
+    if PROFILING_TOKEN and headers.get('x-profile-token') != PROFILING_TOKEN:
+        return False
+    return True
+
+
+class StackSampler:
+    """Periodically samples the Python stack of one thread"""
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            # Folded format lists the root frame first
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+
+class RequestProfiler:
+    """
+    Profiles the work done on the calling thread between start() and stop()
+    Results are written to PROFILES_DIR/<profile_id>.folded and .json
+    """
+
+    def __init__(self, label: str):
+        self.label = label
+        self.profile_id = uuid.uuid4().hex[:12]
+        self.sampler = StackSampler(threading.get_ident())
+        self._started_tracemalloc = False
+        self._start_time = 0.0
+
+    def start(self):
+        if PROFILE_TRACEMALLOC_FRAMES > 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+            self._started_tracemalloc = True
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        self._start_time = time.perf_counter()
+        self.sampler.start()
+
+    def stop(self) -> Dict:
+        stacks = self.sampler.stop()
+        wall_ms = (time.perf_counter() - self._start_time) * 1000
+        allocations, peak = [], 0
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces(ALLOCATION_FILTERS)
+            _, peak = tracemalloc.get_traced_memory()
+            allocations = _group_by_backend_line(snapshot)
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+        summary = {
+            'profile_id': self.profile_id,
+            'label': self.label,
+            'wall_ms': round(wall_ms, 2),
+            'samples': self.sampler.samples,
+            'sample_interval_ms': self.sampler.interval * 1000,
+            'peak_traced_kb': round(peak / 1024, 2),
+            'allocations': allocations
+        }
+        self._save(stacks, summary)
+        return summary
+
+    def _save(self, stacks: Counter, summary: Dict):
+        os.makedirs(PROFILES_DIR, exist_ok=True)
+        base = os.path.join(PROFILES_DIR, self.profile_id)
+        with open(base + '.folded', 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(base + '.json', 'w') as f:
+            json.dump(summary, f, indent=2)
+        _prune_profiles()
+
+
+def _group_by_backend_line(snapshot: tracemalloc.Snapshot) -> List[Dict]:
+    """
+    Attribute allocations still alive at the end of the request to the
+    innermost backend source line (transient ones only show in the peak)
+    """
+    totals = {}
+    for stat in snapshot.statistics('traceback'):
+        frame = next(
+            (f for f in stat.traceback if f.filename.startswith(BACKEND_SOURCES)),
+            stat.traceback[0]
+        )
+        key = f"{os.path.relpath(frame.filename, BASE_PATH)}:{frame.lineno}"
+        size, count = totals.get(key, (0, 0))
+        totals[key] = (size + stat.size, count + stat.count)
+
+    ranked = sorted(totals.items(), key=lambda item: item[1][0], reverse=True)
+    return [
+        {'location': location, 'size_kb': round(size / 1024, 2), 'count': count}
+        for location, (size, count) in ranked[:TOP_ALLOCATIONS]
+    ]
+
+
+def try_start_profile(label: str) -> Optional[RequestProfiler]:
+    """Start a profile unless another request is already being profiled"""
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    profiler = RequestProfiler(label)
+    try:
+        profiler.start()
+    except Exception:
+        _profile_lock.release()
+        raise
+    return profiler
+
+
+def finish_profile(profiler: RequestProfiler) -> Dict:
+    """Stop a profile started with try_start_profile and persist it"""
+    try:
+        return profiler.stop()
+    finally:
+        _profile_lock.release()
+
+
+def load_profile(profile_id: str) -> Optional[Dict]:
+    """Load a stored profile summary together with its folded stacks"""
+    if not profile_id.isalnum():
+        return None
+    base = os.path.join(PROFILES_DIR, profile_id)
+    if not os.path.exists(base + '.json'):
+        return None
+    with open(base + '.json') as f:
+        summary = json.load(f)
+    with open(base + '.folded') as f:
+        summary['folded'] = f.read()
+    return summary
+
+
+def list_profiles() -> List[str]:
+    """Stored profile IDs, newest first"""
+    if not os.path.isdir(PROFILES_DIR):
+        return []
+    files = [f for f in os.listdir(PROFILES_DIR) if f.endswith('.json')]
+    files.sort(key=lambda f: os.path.getmtime(os.path.join(PROFILES_DIR, f)), reverse=True)
+    return [f[:-len('.json')] for f in files]
+
+
+def _prune_profiles():
+    for profile_id in list_profiles()[MAX_STORED_PROFILES:]:
+        for ext in ('.json', '.folded'):
+            path = os.path.join(PROFILES_DIR, profile_id + ext)
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,235 @@
+"""
+Vector charts and the heatmap for the PDF reports
+
+The charts are drawn with reportlab's own graphics shapes, so they end up
+in the PDF as a few hundred bytes of path operators instead of a rasterised
+matplotlib figure per report:
+
+- feature_importance_chart: the top features as horizontal bars
+- model_confidence_chart: each model's confidence, coloured by its answer
+
+Everything that does not depend on the report (row bands, grid lines, tick
+labels, the 50% reference line) is built once per chart layout (number of
+rows, axis range) and cached; a report only adds its bars and labels on top
+of the shared template group.
+
+heatmap_flowable embeds the stored PNG overlay without decoding it: the
+IDAT stream of an 8-bit, non-interlaced PNG already is zlib data with PNG
+row filters, which PDF's FlateDecode reads directly with /Predictor 15.
+Other PNGs go through reportlab's regular image path.
+"""
+
+import struct
+import hashlib
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+from reportlab.graphics.shapes import Drawing, Group, Line, Rect, String
+from reportlab.pdfbase import pdfdoc
+from reportlab.platypus import Flowable, Image
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+CHART_WIDTH = 6.5 * inch
+LABEL_WIDTH = 140
+VALUE_WIDTH = 90
+ROW_HEIGHT = 18
+BAR_HEIGHT = 11
+AXIS_HEIGHT = 18
+PLOT_WIDTH = CHART_WIDTH - LABEL_WIDTH - VALUE_WIDTH
+TICKS = 4
+FONT = 'Helvetica'
+FONT_SIZE = 9
+
+GRID_COLOR = colors.HexColor('#e2e8f0')
+BAND_COLOR = colors.HexColor('#f7fafc')
+TEXT_COLOR = colors.HexColor('#4a5568')
+IMPORTANCE_COLOR = colors.HexColor('#4299e1')
+PREDICTION_COLORS = {
+    'Malignant': colors.HexColor('#c53030'),
+    'Benign': colors.HexColor('#2f855a'),
+}
+ERROR_COLOR = colors.HexColor('#a0aec0')
+
+# Importance axis ranges; a report uses the smallest one that fits
+IMPORTANCE_AXES = (0.05, 0.1, 0.2, 0.25, 0.5, 1.0)
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_COLOR_SPACES = {0: ('DeviceGray', 1), 2: ('DeviceRGB', 3)}
+
+
+def _row_y(row: int, n_rows: int) -> float:
+    """Bottom of the bar in row `row`, counted from the top"""
+    return AXIS_HEIGHT + (n_rows - 1 - row) * ROW_HEIGHT + (ROW_HEIGHT - BAR_HEIGHT) / 2
+
+
+@lru_cache(maxsize=64)
+def _bar_chart_template(n_rows: int, axis_max: float, percent: bool) -> Group:
+    """Row bands, grid, tick labels and (for percentages) the 50% line"""
+    group = Group()
+    top = AXIS_HEIGHT + n_rows * ROW_HEIGHT
+    left, width = LABEL_WIDTH, PLOT_WIDTH
+    for row in range(0, n_rows, 2):
+        y = AXIS_HEIGHT + (n_rows - 1 - row) * ROW_HEIGHT
+        group.add(Rect(0, y, CHART_WIDTH, ROW_HEIGHT, fillColor=BAND_COLOR, strokeColor=None))
+    for tick in range(TICKS + 1):
+        x = left + width * tick / TICKS
+        value = axis_max * tick / TICKS
+        group.add(Line(x, AXIS_HEIGHT, x, top, strokeColor=GRID_COLOR, strokeWidth=0.5))
+        group.add(String(x, AXIS_HEIGHT - 11, f"{value:.0f}%" if percent else f"{value:g}",
+                         fontName=FONT, fontSize=FONT_SIZE - 1, fillColor=TEXT_COLOR, textAnchor='middle'))
+    group.add(Line(left, AXIS_HEIGHT, left + width, AXIS_HEIGHT, strokeColor=TEXT_COLOR, strokeWidth=0.5))
+    if percent:
+        x = left + width * 50 / axis_max
+        group.add(Line(x, AXIS_HEIGHT, x, top, strokeColor=TEXT_COLOR, strokeWidth=0.75,
+                       strokeDashArray=[2, 2]))
+    return group
+
+
+def _bar_chart(rows: List[tuple], axis_max: float, percent: bool) -> Drawing:
+    """rows: (label, value, value text, colour) from the top down"""
+    n_rows = len(rows)
+    drawing = Drawing(CHART_WIDTH, AXIS_HEIGHT + n_rows * ROW_HEIGHT)
+    drawing.add(_bar_chart_template(n_rows, axis_max, percent))
+    left, width = LABEL_WIDTH, PLOT_WIDTH
+    for row, (label, value, text, color) in enumerate(rows):
+        y = _row_y(row, n_rows)
+        length = width * min(max(value, 0.0), axis_max) / axis_max
+        drawing.add(Rect(left, y, length, BAR_HEIGHT, fillColor=color, strokeColor=None))
+        drawing.add(String(left - 6, y + 2, label, fontName=FONT, fontSize=FONT_SIZE,
+                           fillColor=TEXT_COLOR, textAnchor='end'))
+        drawing.add(String(left + length + 4, y + 2, text, fontName=FONT, fontSize=FONT_SIZE,
+                           fillColor=TEXT_COLOR))
+    return drawing
+
+
+def feature_importance_chart(values: Dict[str, float], top: int = 10) -> Optional[Drawing]:
+    """Horizontal bars of the `top` largest importances (values sorted or not)"""
+    ranked = sorted(values.items(), key=lambda item: item[1], reverse=True)[:top]
+    if not ranked:
+        return None
+    largest = ranked[0][1]
+    axis_max = next((axis for axis in IMPORTANCE_AXES if largest <= axis), IMPORTANCE_AXES[-1])
+    rows = [
+        (name.replace('_', ' ').title(), float(score), f"{score:.4f}", IMPORTANCE_COLOR)
+        for name, score in ranked
+    ]
+    return _bar_chart(rows, axis_max, percent=False)
+
+
+def model_confidence_chart(predictions: List[Dict]) -> Optional[Drawing]:
+    """Confidence bar per model, coloured by its prediction"""
+    if not predictions:
+        return None
+    rows = [
+        (
+            p['model'],
+            float(p.get('confidence', 0.0)),
+            f"{p['prediction']} {p.get('confidence', 0.0)}%",
+            PREDICTION_COLORS.get(p['prediction'], ERROR_COLOR)
+        )
+        for p in predictions
+    ]
+    return _bar_chart(rows, 100.0, percent=True)
+
+
+class _PNGImageXObject(pdfdoc.PDFImageXObject):
+    """Image XObject whose stream is a PNG's IDAT data, decoded by the PDF viewer"""
+
+    def __init__(self, name: str, width: int, height: int, color_space: str, colors_: int, idat: bytes):
+        self.name = name
+        self.width, self.height = width, height
+        self.bitsPerComponent = 8
+        self.colorSpace = color_space
+        self.colors = colors_
+        self.streamContent = idat
+        self._filters = ('FlateDecode',)
+        self.mask = None
+
+    def format(self, document):
+        stream = pdfdoc.PDFStream(content=self.streamContent)
+        d = stream.dictionary
+        d['Type'] = pdfdoc.PDFName('XObject')
+        d['Subtype'] = pdfdoc.PDFName('Image')
+        d['Width'] = self.width
+        d['Height'] = self.height
+        d['BitsPerComponent'] = self.bitsPerComponent
+        d['ColorSpace'] = pdfdoc.PDFName(self.colorSpace)
+        d['Filter'] = pdfdoc.PDFArray([pdfdoc.PDFName(f) for f in self._filters])
+        # One parameter dictionary per filter (Filter is an array)
+        d['DecodeParms'] = pdfdoc.PDFArray([pdfdoc.PDFDictionary({
+            'Predictor': 15, 'Colors': self.colors, 'BitsPerComponent': 8, 'Columns': self.width
+        })])
+        d['Length'] = len(self.streamContent)
+        return stream.format(document)
+
+
+def _png_stream(png: bytes) -> Optional[tuple]:
+    """(width, height, colour space, components, IDAT data) for PNGs PDF can take as is"""
+    if not png.startswith(PNG_SIGNATURE):
+        return None
+    offset, header, idat = len(PNG_SIGNATURE), None, []
+    while offset + 8 <= len(png):
+        length, kind = struct.unpack('>I4s', png[offset:offset + 8])
+        data = png[offset + 8:offset + 8 + length]
+        if kind == b'IHDR':
+            header = struct.unpack('>IIBBBBB', data)
+        elif kind == b'IDAT':
+            idat.append(data)
+        elif kind == b'IEND':
+            break
+        offset += 12 + length
+    if header is None or not idat:
+        return None
+    width, height, bit_depth, color_type, _, _, interlace = header
+    if bit_depth != 8 or interlace or color_type not in PNG_COLOR_SPACES:
+        return None
+    color_space, components = PNG_COLOR_SPACES[color_type]
+    return width, height, color_space, components, b''.join(idat)
+
+
+class PNGPassthrough(Flowable):
+    """The PNG's compressed pixel data placed in the PDF without re-encoding"""
+
+    def __init__(self, width: int, height: int, color_space: str, components: int, idat: bytes,
+                 draw_width: float, draw_height: float):
+        super().__init__()
+        self.pixel_size = (width, height)
+        self.color_space, self.components, self.idat = color_space, components, idat
+        self.drawWidth, self.drawHeight = draw_width, draw_height
+        self.hAlign = 'CENTER'
+
+    def wrap(self, availWidth, availHeight):
+        return self.drawWidth, self.drawHeight
+
+    def draw(self):
+        canvas = self.canv
+        doc = canvas._doc
+        name = hashlib.md5(self.idat).hexdigest()
+        reg_name = doc.getXObjectName(name)
+        if not doc.idToObject.get(reg_name):
+            image = _PNGImageXObject(name, *self.pixel_size, self.color_space, self.components, self.idat)
+            canvas._setXObjects(image)
+            doc.Reference(image, reg_name)
+            doc.addForm(name, image)
+        canvas.saveState()
+        canvas.scale(self.drawWidth, self.drawHeight)
+        canvas._code.append(f"/{reg_name} Do")
+        canvas.restoreState()
+        canvas._formsinuse.append(name)
+        canvas._currentPageHasImages = 1
+
+
+def heatmap_flowable(png: bytes, width: float = 3 * inch) -> Flowable:
+    """Heatmap `width` wide from stored PNG bytes"""
+    stream = _png_stream(png)
+    if stream is None:
+        import io
+        image = Image(io.BytesIO(png))
+        image._restrictSize(width, width * 2)
+        return image
+    return PNGPassthrough(*stream, draw_width=width, draw_height=width * stream[1] / stream[0])
@@ -14,13 +14,28 @@ import base64
 from datetime import datetime
 from typing import Dict, Optional
 
+from utils.report_charts import feature_importance_chart, model_confidence_chart, heatmap_flowable
 
-def generate_pdf_report(prediction: Dict, patient_id: str) -> str:
+# ============================================
+# CONFIGURATION
+# ============================================
+
+REPORTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'reports')
+
+# Vector charts (model confidence, feature importance) and the heatmap;
+# REPORT_CHARTS=0 gives the tables-only report
+REPORT_CHARTS = os.environ.get('REPORT_CHARTS', '1') == '1'
+
+
+def generate_pdf_report(prediction: Dict, patient_id: str, reports_dir: Optional[str] = None,
+                        charts: Optional[bool] = None) -> str:
     """
     Generate a medical-style PDF diagnosis report
     """
+    if charts is None:
+        charts = REPORT_CHARTS
     # Create reports directory if it doesn't exist
-    reports_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'reports')
+    reports_dir = reports_dir or REPORTS_DIR
     os.makedirs(reports_dir, exist_ok=True)
     
     # Generate filename
@@ -160,6 +175,11 @@ def generate_pdf_report(prediction: Dict, patient_id: str) -> str:
         ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f7fafc')]),
     ]))
     content.append(model_table)
+    content.append(Spacer(1, 12))
+    if charts:
+        confidence_chart = model_confidence_chart(prediction.get('model_predictions', []))
+        if confidence_chart is not None:
+            content.append(confidence_chart)
     content.append(Spacer(1, 20))
     
     # Feature Importance (for tabular predictions)
@@ -169,6 +189,11 @@ def generate_pdf_report(prediction: Dict, patient_id: str) -> str:
         fi = prediction['feature_importance']
         content.append(Paragraph(fi.get('summary', ''), normal_style))
         content.append(Spacer(1, 10))
+        if charts:
+            importance_chart = feature_importance_chart(fi.get('values', {}))
+            if importance_chart is not None:
+                content.append(importance_chart)
+                content.append(Spacer(1, 12))
         
         # Top features table
         fi_header = ['Feature', 'Importance Score']
@@ -199,6 +224,12 @@ def generate_pdf_report(prediction: Dict, patient_id: str) -> str:
         content.append(Paragraph(prediction['explanation'], normal_style))
         content.append(Spacer(1, 20))
     
+    # Heatmap overlay, embedded from the stored PNG
+    if charts and prediction.get('type') == 'image' and prediction.get('heatmap_base64'):
+        content.append(Paragraph("ATTENTION HEATMAP", header_style))
+        content.append(heatmap_flowable(base64.b64decode(prediction['heatmap_base64'])))
+        content.append(Spacer(1, 20))
+    
     # Disclaimer
     content.append(Spacer(1, 30))
     
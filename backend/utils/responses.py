@@ -0,0 +1,43 @@
+"""
+Response shaping for the prediction, history and metrics routes
+
+Responses are serialized with orjson (ORJSONResponse) directly from the
+handler's dict, skipping FastAPI's jsonable_encoder pass and the pydantic
+response_model validation. Clients can ask for a compact view with
+`?view=compact` or the `X-Response-View: compact` header; the default view
+is unchanged.
+"""
+
+from typing import Dict
+
+from fastapi import Request
+from fastapi.responses import ORJSONResponse
+
+COMPACT_VIEW = 'compact'
+
+# Heavy fields removed from compact responses (and history entries)
+COMPACT_DROPPED_FIELDS = ('model_predictions', 'heatmap_base64', 'features')
+
+
+def wants_compact(request: Request) -> bool:
+    view = request.query_params.get('view') or request.headers.get('x-response-view')
+    return view == COMPACT_VIEW
+
+
+def compact_view(payload: Dict) -> Dict:
+    """
+    Drop per-model detail, heatmaps and feature-importance values
+    The feature-importance summary and top features are kept
+    """
+    compact = {k: v for k, v in payload.items() if k not in COMPACT_DROPPED_FIELDS}
+    importance = payload.get('feature_importance')
+    if importance:
+        compact['feature_importance'] = {k: v for k, v in importance.items() if k != 'values'}
+    return compact
+
+
+def json_response(request: Request, payload: Dict, status_code: int = 200) -> ORJSONResponse:
+    """Serialize a single prediction-like payload in the requested view"""
+    if wants_compact(request):
+        payload = compact_view(payload)
+    return ORJSONResponse(payload, status_code=status_code)
@@ -0,0 +1,204 @@
+"""
+Shadow scoring of candidate tabular models
+
+A candidate (e.g. a retrained svm_rbf_optimized.pkl) is registered against the
+live model it would replace:
+
+    SHADOW_MODELS="SVM RBF=models/candidates/svm_rbf_v2.pkl"
+
+Every tabular request then hands a copy of its feature batch, together with
+the live models' labels it already computed, to one background thread. That
+thread scores the batch with the candidate through
+TabularPredictor._score_model (same scaling and feature selection) and
+appends the comparison to SHADOW_LOG_PATH. The live model is run again only
+on every SHADOW_TIMING_EVERY-th batch, to measure both latencies side by
+side. Responses never wait for or depend on the candidate; when the thread
+falls behind by SHADOW_MAX_PENDING batches, new batches are dropped and
+counted.
+
+GET /monitoring/shadow summarises agreement and latency per candidate;
+tools/evaluate_models.py compares the same models offline.
+"""
+
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHADOW_LOG_PATH = os.environ.get('SHADOW_LOG_PATH', os.path.join(BASE_PATH, 'var', 'shadow', 'shadow_log.jsonl'))
+
+# Batches waiting for the shadow thread before new ones are dropped
+SHADOW_MAX_PENDING = int(os.environ.get('SHADOW_MAX_PENDING', '64'))
+
+# Per-row labels are logged for batches up to this size
+SHADOW_LOG_ROWS = 32
+
+# Every n-th batch also re-runs the live model to compare latencies
+SHADOW_TIMING_EVERY = int(os.environ.get('SHADOW_TIMING_EVERY', '20'))
+
+
+def shadow_candidates() -> Dict[str, str]:
+    """Live model name -> candidate path, from SHADOW_MODELS"""
+    candidates = {}
+    for item in filter(None, os.environ.get('SHADOW_MODELS', '').split(',')):
+        name, _, path = item.partition('=')
+        path = path.strip()
+        candidates[name.strip()] = path if os.path.isabs(path) else os.path.join(BASE_PATH, path)
+    return candidates
+
+
+class ShadowScorer:
+    """Scores candidate models next to the live ones, off the request path"""
+
+    def __init__(self, predictor, candidates: Dict[str, object], candidate_paths: Dict[str, str],
+                 log_path: str = SHADOW_LOG_PATH):
+        self.predictor = predictor
+        self.candidates = candidates
+        self.candidate_paths = candidate_paths
+        self.feature_counts = {name: predictor._get_model_feature_count(m) for name, m in candidates.items()}
+        self.log_path = log_path
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._submitted = 0
+        self.dropped = 0
+        self.totals = {
+            name: {'batches': 0, 'rows': 0, 'agreements': 0, 'errors': 0,
+                   'timed_batches': 0, 'live_ms': 0.0, 'candidate_ms': 0.0}
+            for name in candidates
+        }
+
+    def submit(self, features: np.ndarray, live_malignant: Dict[str, np.ndarray]):
+        """
+        Queue a copy of a request's feature batch and the live models'
+        is-malignant arrays (raw model labels, by model name); never blocks
+        """
+        with self._lock:
+            if self._pending >= SHADOW_MAX_PENDING:
+                self.dropped += 1
+                return
+            self._pending += 1
+            timed = SHADOW_TIMING_EVERY > 0 and self._submitted % SHADOW_TIMING_EVERY == 0
+            self._submitted += 1
+            if self._executor is None:
+                # Created on first use, i.e. after any fork
+                self._executor = ThreadPoolExecutor(1, thread_name_prefix='shadow')
+        self._executor.submit(self._score, np.array(features, dtype=np.float64), dict(live_malignant), timed)
+
+    def _score(self, features: np.ndarray, live_malignant: Dict[str, np.ndarray], timed: bool):
+        try:
+            for name, candidate in self.candidates.items():
+                live = self.predictor.models.get(name)
+                if live is None:
+                    continue
+                self._compare(name, live, candidate, features, live_malignant.get(name), timed)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _compare(self, name: str, live, candidate, features: np.ndarray,
+                 live_malignant: Optional[np.ndarray], timed: bool):
+        """
+        Candidate labels against the live ones from the request; the live
+        model only runs here when timed (or the request has no labels for it,
+        e.g. it was skipped under overload, in which case the batch is left out)
+        """
+        if live_malignant is None and not timed:
+            return
+        record = {'timestamp': datetime.now().isoformat(), 'model': name,
+                  'candidate': self.candidate_paths[name], 'rows': len(features)}
+        live_ms = None
+        try:
+            if timed:
+                start = time.perf_counter()
+                live_scores = self.predictor._score_model(name, live, features)
+                live_ms = (time.perf_counter() - start) * 1000
+                if live_malignant is None and live_scores is not None:
+                    live_malignant = live_scores[0]
+            start = time.perf_counter()
+            candidate_scores = self.predictor._score_model(
+                name, candidate, features, n_features=self.feature_counts[name]
+            )
+            candidate_ms = (time.perf_counter() - start) * 1000
+        except Exception as e:
+            record['error'] = str(e)
+            with self._lock:
+                self.totals[name]['errors'] += 1
+            self._log(record)
+            return
+        if live_malignant is None or candidate_scores is None:
+            return
+
+        candidate_malignant = candidate_scores[0]
+        agreements = int((live_malignant == candidate_malignant).sum())
+        record.update({'agreements': agreements, 'candidate_ms': round(candidate_ms, 3)})
+        if live_ms is not None:
+            record['live_ms'] = round(live_ms, 3)
+        if len(features) <= SHADOW_LOG_ROWS:
+            record['live_malignant'] = live_malignant.tolist()
+            record['candidate_malignant'] = candidate_malignant.tolist()
+        with self._lock:
+            totals = self.totals[name]
+            totals['batches'] += 1
+            totals['rows'] += len(features)
+            totals['agreements'] += agreements
+            totals['candidate_ms'] += candidate_ms
+            if live_ms is not None:
+                totals['timed_batches'] += 1
+                totals['live_ms'] += live_ms
+        self._log(record)
+
+    def _log(self, record: Dict):
+        with open(self.log_path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+    def stats(self) -> Dict:
+        with self._lock:
+            models = {}
+            for name, t in self.totals.items():
+                batches = max(t['batches'], 1)
+                models[name] = {
+                    'candidate': self.candidate_paths[name],
+                    'batches': t['batches'],
+                    'rows': t['rows'],
+                    'errors': t['errors'],
+                    'agreement': round(t['agreements'] / t['rows'], 4) if t['rows'] else None,
+                    'timed_batches': t['timed_batches'],
+                    'live_ms_per_batch': round(t['live_ms'] / max(t['timed_batches'], 1), 3),
+                    'candidate_ms_per_batch': round(t['candidate_ms'] / batches, 3)
+                }
+            return {'models': models, 'pending': self._pending, 'dropped': self.dropped,
+                    'log_path': self.log_path, 'pid': os.getpid()}
+
+
+def load_shadow_scorer(predictor):
+    """ShadowScorer for the candidates in SHADOW_MODELS, or None"""
+    paths = shadow_candidates()
+    if not paths:
+        return None
+    from utils.predictions import MODEL_BACKENDS
+
+    candidates, loaded_paths = {}, {}
+    for name, path in paths.items():
+        if name not in predictor.models:
+            print(f"[!] Shadow candidate for unknown model {name!r} ignored")
+            continue
+        try:
+            candidates[name] = predictor._load_tabular_model(path, MODEL_BACKENDS.get(name, 'sklearn'))
+            loaded_paths[name] = path
+            print(f"[OK] Shadow candidate for {name}: {path}")
+        except Exception as e:
+            print(f"[X] Error loading shadow candidate for {name}: {e}")
+    return ShadowScorer(predictor, candidates, loaded_paths) if candidates else None
@@ -0,0 +1,175 @@
+"""
+Nearest-neighbour index of reference cases ("similar cases")
+
+The 569 cases of data/data.csv, plus labelled cases added at runtime, are
+kept as one contiguous matrix in the scaled 30-feature space of scaler.pkl.
+A query is a brute-force GEMM against that matrix followed by a partial
+sort; at this size that beats any tree and takes well under a millisecond,
+for one row or a batch.
+
+Labelled cases are appended to CASES_PATH (one CSV line each). Every index
+reads the lines it has not seen yet before answering a query, so cases added
+through any worker process show up everywhere without a rebuild.
+"""
+
+import io
+import os
+import csv
+import fcntl
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REFERENCE_DATA_PATH = os.path.join(BASE_PATH, 'data', 'data.csv')
+CASES_PATH = os.environ.get('CASES_PATH', os.path.join(BASE_PATH, 'var', 'labelled_cases.csv'))
+
+# Largest k accepted by the API
+MAX_NEIGHBOURS = 20
+
+DIAGNOSES = {'M': 'Malignant', 'B': 'Benign'}
+
+
+class SimilarCaseIndex:
+    """Brute-force k-nearest-neighbour index with append-only growth"""
+
+    def __init__(self, reference: np.ndarray, case_ids: List[str], diagnoses: List[str],
+                 scaler=None, cases_path: str = CASES_PATH):
+        # StandardScaler.transform costs more than the search itself for one
+        # row, so its affine map is applied directly
+        if scaler is not None:
+            self.center = np.asarray(scaler.mean_, dtype=np.float64)
+            self.scale = np.asarray(scaler.scale_, dtype=np.float64)
+        else:
+            self.center = reference.mean(axis=0)
+            self.scale = reference.std(axis=0)
+
+        self._lock = threading.Lock()
+        self.cases_path = cases_path
+        self._cases_offset = 0
+        self.size = 0
+        self._vectors = np.empty((max(2 * len(reference), 64), reference.shape[1]))
+        self._sq_norms = np.empty(len(self._vectors))
+        self.case_ids: List[str] = []
+        self.diagnoses: List[str] = []
+        self._append(reference, case_ids, diagnoses)
+
+    @classmethod
+    def from_csv(cls, scaler=None, path: str = REFERENCE_DATA_PATH) -> 'SimilarCaseIndex':
+        df = pd.read_csv(path)
+        return cls(
+            reference=df.iloc[:, 2:32].to_numpy(dtype=np.float64),
+            case_ids=df['id'].astype(str).tolist(),
+            diagnoses=[DIAGNOSES.get(d, d) for d in df['diagnosis']],
+            scaler=scaler
+        )
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        return (np.asarray(X, dtype=np.float64) - self.center) / self.scale
+
+    def _append(self, X: np.ndarray, case_ids: List[str], diagnoses: List[str]):
+        """Add raw-feature rows; the buffer doubles when full (amortised O(1))"""
+        vectors = self.transform(X)
+        with self._lock:
+            needed = self.size + len(vectors)
+            if needed > len(self._vectors):
+                capacity = max(needed, 2 * len(self._vectors))
+                grown = np.empty((capacity, self._vectors.shape[1]))
+                grown[:self.size] = self._vectors[:self.size]
+                norms = np.empty(capacity)
+                norms[:self.size] = self._sq_norms[:self.size]
+                self._vectors, self._sq_norms = grown, norms
+            self._vectors[self.size:needed] = vectors
+            self._sq_norms[self.size:needed] = np.einsum('ij,ij->i', vectors, vectors)
+            self.case_ids.extend(case_ids)
+            self.diagnoses.extend(diagnoses)
+            self.size = needed
+
+    def add_case(self, features: np.ndarray, diagnosis: str, case_id: str):
+        """Record a labelled case; every index picks it up on its next query"""
+        os.makedirs(os.path.dirname(self.cases_path), exist_ok=True)
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator='\n').writerow(
+            [case_id, diagnosis] + [repr(float(v)) for v in np.ravel(features)]
+        )
+        line = buffer.getvalue()
+        if line.count('\n') != 1:
+            raise ValueError("case_id and diagnosis must not contain line breaks")
+        with open(self.cases_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.write(line)
+        self.refresh()
+
+    def refresh(self):
+        """Load cases appended to CASES_PATH since the last refresh"""
+        try:
+            if os.path.getsize(self.cases_path) <= self._cases_offset:
+                return
+        except OSError:
+            return
+        with self._lock, open(self.cases_path) as f:
+            f.seek(self._cases_offset)
+            chunk = f.read()
+            # Only complete lines; a concurrent writer may be mid-line
+            complete = chunk[:chunk.rfind('\n') + 1]
+            self._cases_offset += len(complete.encode())
+        values, case_ids, diagnoses = [], [], []
+        for row in csv.reader(complete.splitlines()):
+            # A bad line must not break the index for every worker
+            try:
+                features = [float(v) for v in row[2:]]
+            except ValueError:
+                features = []
+            if len(features) != self._vectors.shape[1]:
+                print(f"[!] Skipping malformed labelled case in {self.cases_path}: {row[:2]}")
+                continue
+            values.append(features)
+            case_ids.append(row[0])
+            diagnoses.append(row[1])
+        if values:
+            self._append(np.array(values, dtype=np.float64), case_ids, diagnoses)
+
+    def query(self, X: np.ndarray, k: int = 5) -> List[List[Dict]]:
+        """The k nearest cases of every row of X (raw features), closest first"""
+        self.refresh()
+        queries = self.transform(np.atleast_2d(X))
+        with self._lock:
+            size = self.size
+            vectors = self._vectors[:size]
+            sq_norms = self._sq_norms[:size]
+            case_ids, diagnoses = self.case_ids[:size], self.diagnoses[:size]
+
+        k = min(k, size)
+        sq_dist = sq_norms - 2.0 * (queries @ vectors.T)
+        nearest = np.argpartition(sq_dist, k - 1, axis=1)[:, :k]
+        rows = np.arange(len(queries))[:, None]
+        order = np.argsort(sq_dist[rows, nearest], axis=1)
+        nearest = nearest[rows, order]
+        # Add back ||q||^2, dropped above since it does not change the ranking
+        distances = np.sqrt(np.maximum(
+            sq_dist[rows, nearest] + np.einsum('ij,ij->i', queries, queries)[:, None], 0.0
+        ))
+        return [
+            [
+                {'case_id': case_ids[i], 'diagnosis': diagnoses[i], 'distance': round(float(d), 4)}
+                for i, d in zip(row_idx, row_dist)
+            ]
+            for row_idx, row_dist in zip(nearest.tolist(), distances.tolist())
+        ]
+
+
+def create_similar_case_index(scaler=None) -> Optional[SimilarCaseIndex]:
+    """Index over data.csv, or None when the reference data is missing"""
+    if not os.path.exists(REFERENCE_DATA_PATH):
+        print(f"[X] Reference data not found: {REFERENCE_DATA_PATH}")
+        return None
+    index = SimilarCaseIndex.from_csv(scaler)
+    index.refresh()
+    print(f"[OK] Similar-case index: {index.size} cases")
+    return index
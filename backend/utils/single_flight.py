@@ -0,0 +1,127 @@
+"""
+Single-flight deduplication of identical in-flight requests
+
+Double submits and client retries send the same payload again while the
+first request is still computing. Routes hand their expensive step (model
+inference, heatmap rendering, PDF generation) to SingleFlight.run with a
+hash of the request content: the first request runs it on the default
+executor, and identical requests arriving before it finishes await the same
+future instead of running the models again. Once it completes the key is
+released, so later requests compute afresh. Only the shared step is
+deduplicated; each caller still builds its own response (prediction_id,
+history entry) from the result.
+
+State is per worker process; GET /monitoring/single-flight reports how much
+work was shared. SINGLE_FLIGHT=0 runs every request on its own, on the
+event loop as before.
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+from typing import Callable, Dict
+
+import numpy as np
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+SINGLE_FLIGHT_ENABLED = os.environ.get('SINGLE_FLIGHT', '1') == '1'
+
+
+def content_key(kind: str, *parts) -> str:
+    """Hash of a route name and the request content that determines the result"""
+    digest = hashlib.blake2b(kind.encode(), digest_size=16)
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            part = np.ascontiguousarray(part, dtype=np.float64)
+            digest.update(repr(part.shape).encode())
+            digest.update(part.tobytes())
+        elif isinstance(part, (bytes, bytearray, memoryview)):
+            digest.update(part)
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class _Flight:
+    """One shared computation and how long it took"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.waiters = 0
+
+    def timed(self, fn: Callable, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.seconds = time.perf_counter() - start
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution"""
+
+    def __init__(self, enabled: bool = SINGLE_FLIGHT_ENABLED):
+        self.enabled = enabled
+        self._flights: Dict[str, tuple] = {}
+        self.requests = 0
+        self.computed = 0
+        self.shared = 0
+        self.errors = 0
+        self.saved_seconds = 0.0
+        self.max_waiters = 0
+
+    async def run(self, key: str, fn: Callable, *args, inline: bool = False):
+        """
+        Result of fn(*args), computed once for all concurrent callers with key
+        inline=True runs a new computation on the calling thread (profiled
+        requests): it neither joins a flight, whose work would be missing
+        from the profile, nor can be joined, as the event loop is busy with it.
+        """
+        self.requests += 1
+        entry = None if inline else self._flights.get(key)
+        if entry is not None:
+            flight, future = entry
+            flight.waiters += 1
+            self.shared += 1
+            self.max_waiters = max(self.max_waiters, flight.waiters)
+            result = await asyncio.shield(future)
+            self.saved_seconds += flight.seconds
+            return result
+
+        self.computed += 1
+        if inline or not self.enabled:
+            try:
+                return fn(*args)
+            except Exception:
+                self.errors += 1
+                raise
+
+        flight = _Flight()
+        future = asyncio.get_running_loop().run_in_executor(None, flight.timed, fn, *args)
+        self._flights[key] = (flight, future)
+        future.add_done_callback(lambda done: self._finish(key, done))
+        # Shielded, so a disconnecting first caller does not cancel the
+        # computation the others are waiting for
+        return await asyncio.shield(future)
+
+    def _finish(self, key: str, future: asyncio.Future):
+        self._flights.pop(key, None)
+        if not future.cancelled() and future.exception() is not None:
+            self.errors += 1
+
+    def stats(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'computed': self.computed,
+            'shared': self.shared,
+            'shared_rate': round(self.shared / self.requests, 4) if self.requests else 0.0,
+            'saved_seconds': round(self.saved_seconds, 3),
+            'errors': self.errors,
+            'in_flight': len(self._flights),
+            'max_waiters': self.max_waiters
+        }
@@ -0,0 +1,137 @@
+"""
+Thread-pool governor for the numeric backends
+
+NumPy's BLAS, OpenMP (sklearn, PyTorch), PyTorch and TensorFlow each size
+their intra-op thread pools to every core of the machine. Behind gunicorn
+that is multiplied by WEB_CONCURRENCY workers, IMAGE_JOB_WORKERS job
+processes and the MODEL_THREADS models each request runs concurrently, so
+the CPU ends up heavily oversubscribed. The governor gives every backend
+
+    INTRA_OP_THREADS = cores // (processes * MODEL_THREADS), at least 1
+
+unless INTRA_OP_THREADS is set explicitly:
+- the OMP/OpenBLAS/MKL/... variables are set before NumPy is imported
+  (configure_thread_environment, called first thing in main.py and by
+  gunicorn.conf.py), so every thread started later inherits the limit
+- threadpoolctl re-applies it to the BLAS/OpenMP libraries already loaded
+- torch.set_num_threads and TensorFlow's intra/inter-op settings are applied
+  when the GRU extractor is created
+- sklearn estimators with n_jobs run single-threaded (the models already run
+  in parallel with each other)
+
+GET /system/threads reports the effective settings of a worker;
+tools/bench_threads.py measures throughput over a range of limits.
+
+This module must not import NumPy at import time.
+"""
+
+import os
+import sys
+from typing import Dict
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+# Environment variables read by the BLAS/OpenMP runtimes at load time
+THREAD_ENV_VARS = (
+    'OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+    'BLIS_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS'
+)
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, str(default)))
+
+
+def thread_budget() -> Dict[str, int]:
+    """Cores, the processes and executor threads sharing them, and the per-op limit"""
+    cores = available_cores()
+    processes = _env_int('WEB_CONCURRENCY', 1) + _env_int('IMAGE_JOB_WORKERS', 2)
+    model_threads = _env_int('MODEL_THREADS', 4) if os.environ.get('PARALLEL_MODELS', '1') == '1' else 1
+    intra_op = _env_int('INTRA_OP_THREADS', max(1, cores // (processes * model_threads)))
+    return {
+        'cores': cores,
+        'processes': processes,
+        'model_threads': model_threads,
+        'intra_op_threads': intra_op
+    }
+
+
+def intra_op_threads() -> int:
+    return thread_budget()['intra_op_threads']
+
+
+def configure_thread_environment():
+    """
+    Export the limit to the BLAS/OpenMP runtimes; takes effect for libraries
+    loaded afterwards, so call it before NumPy is imported. Values already
+    set in the environment win.
+    """
+    limit = str(intra_op_threads())
+    for name in THREAD_ENV_VARS:
+        os.environ.setdefault(name, limit)
+    os.environ.setdefault('TF_NUM_INTRAOP_THREADS', limit)
+    os.environ.setdefault('TF_NUM_INTEROP_THREADS', '1')
+
+
+def apply_thread_limits():
+    """Enforce the limit on every backend that is already loaded"""
+    limit = intra_op_threads()
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=limit)
+    except ImportError:
+        pass
+    if 'torch' in sys.modules:
+        import torch
+        torch.set_num_threads(limit)
+    if 'tensorflow' in sys.modules:
+        import tensorflow as tf
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(limit)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        except RuntimeError:
+            # Fixed once the TF runtime has started; TF_NUM_*_THREADS covered it
+            pass
+
+
+def limit_estimator(model):
+    """Run an sklearn estimator's own parallel loops single-threaded"""
+    if hasattr(model, 'n_jobs') and hasattr(model, 'set_params'):
+        model.set_params(n_jobs=1)
+    return model
+
+
+def thread_settings() -> Dict:
+    """Effective limits of this process, per backend"""
+    settings = {
+        **thread_budget(),
+        'environment': {name: os.environ.get(name) for name in
+                        THREAD_ENV_VARS + ('TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS')},
+        'pid': os.getpid()
+    }
+    try:
+        from threadpoolctl import threadpool_info
+        settings['native_pools'] = [
+            {key: pool.get(key) for key in ('user_api', 'internal_api', 'num_threads', 'version')}
+            for pool in threadpool_info()
+        ]
+    except ImportError:
+        settings['native_pools'] = None
+    if 'torch' in sys.modules:
+        settings['torch_threads'] = sys.modules['torch'].get_num_threads()
+    if 'tensorflow' in sys.modules:
+        threading = sys.modules['tensorflow'].config.threading
+        settings['tensorflow_threads'] = {
+            'intra_op': threading.get_intra_op_parallelism_threads(),
+            'inter_op': threading.get_inter_op_parallelism_threads()
+        }
+    return settings